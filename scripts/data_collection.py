@@ -13,6 +13,8 @@ from utilities.feature_extractors import (
     extract_single_channel_features,
     plot_orb_keypoints,
 )
+from utilities.hand_analyzer import get_card_type_image
+from utilities.models import Scenes
 from utilities.utilities import (
     capture_hand_image,
     capture_window,
@@ -20,7 +22,6 @@ from utilities.utilities import (
     determine_relative_coordinates,
     display_image,
     get_card_interior_image,
-    get_card_type_image,
     get_hand_cards,
 )
 
@@ -272,6 +273,27 @@ class GroundDataCollector(DataCollector):
         return data, labels
 
 
+class SceneCollector(DataCollector):
+    """Label entire screenshots with the game screen they show, to train the `SceneClassifier`.
+    Screenshots come from `capture_window`, so they can be labeled from a recording by setting a `ReplayFrameSource`.
+    """
+
+    def collect_hand_data(self, previous_labels: np.ndarray | None = None) -> list[np.ndarray]:
+        screenshot, _ = capture_window()
+
+        # The scene features only need a tiny thumbnail, store a downsampled screenshot to keep the datasets small
+        screenshot = cv2.resize(screenshot, None, fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA)
+
+        # Let's plot the image for debugging
+        # display_image(screenshot)
+
+        scene_names = ", ".join(f"{scene.value}/{scene.name}" for scene in Scenes)
+        scene_label = input(f"What scene is this? {scene_names}: ")
+        scene = Scenes(int(scene_label)) if scene_label.isdigit() else Scenes[scene_label.upper()]
+
+        return screenshot[np.newaxis, ...], np.array([scene.value])
+
+
 def save_data(dataset: np.ndarray, all_labels: np.ndarray, filename: str):
     """Creates a dictionary with the data and saves it under 'data/'"""
 
@@ -319,6 +341,8 @@ def main():
 
     # collect_data(GroundDataCollector, filename="ground_data")
 
+    # collect_data(SceneCollector, filename="scenes_data")
+
 
 if __name__ == "__main__":
 
@@ -14,6 +14,7 @@ from utilities.feature_extractors import (
     extract_color_features,
     extract_color_histograms_features,
     extract_difference_of_histograms_features,
+    extract_scene_features,
 )
 from utilities.utilities import display_image, load_dataset, save_model
 
@@ -118,6 +119,21 @@ def load_ground_cards_features() -> list[np.ndarray]:
     return features_reduced, all_labels, pca_model
 
 
+def load_scene_features() -> list[np.ndarray]:
+    """Load the labeled screenshots of the game scenes, and extract their features"""
+    dataset, all_labels = load_dataset("data/scenes_data*")
+
+    # Extract the features
+    features = extract_scene_features(images=dataset)
+
+    # Apply PCA for dimensionality reduction
+    pca_model = PCA(n_components=30)
+    # Fit the PCA
+    features_reduced = pca_model.fit_transform(features)
+
+    return features_reduced, all_labels, pca_model
+
+
 def explore_features(features, labels: list[CardTypes], label_type: CardTypes):
     """Explore the features for specific labels, for debugging..."""
 
@@ -302,6 +318,17 @@ def train_ground_cards_classifier():
     save_model(pca_model, filename="pca_ground_cards_model.pca")
 
 
+def train_scene_classifier():
+    """Train a model that identifies the game scene from an entire screenshot. Logistic regression gives us a
+    probability, for the farmers to only trust confident predictions.
+    """
+
+    features, labels, pca_model = load_scene_features()
+    model = train_logistic_regressor(X=features, labels=labels)
+    save_model(model, filename="scene_classifier.lr")
+    save_model(pca_model, filename="pca_scenes_model.pca")
+
+
 def main():
 
     ### For card types
@@ -325,6 +352,9 @@ def main():
     ### Train a model that identifies GROUND cards
     # train_ground_cards_classifier()
 
+    ### Train a model that identifies the game scenes
+    # train_scene_classifier()
+
     return
 
 
@@ -0,0 +1,23 @@
+import argparse
+import time
+
+from utilities.frame_recorder import RECORDINGS_DIR, FrameRecorder
+
+
+def main():
+    """Export the frames recorded while farming as a recording that can be replayed (see `ReplayFrameSource`),
+    e.g., to look at what the screen looked like right before a crash.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output", type=str, help="Where to write the recording, as a zip archive if it ends in '.zip'")
+    parser.add_argument("--recordings", type=str, default=RECORDINGS_DIR, help="Directory of the recorded frames")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    num_frames = FrameRecorder.export(args.output, args.recordings)
+    print(f"Exported {num_frames} frames into '{args.output}' in {time.time() - start_time:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
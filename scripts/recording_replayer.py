@@ -0,0 +1,36 @@
+import argparse
+import runpy
+import sys
+import time
+
+from utilities.frame_source import FrameSource, ReplayFrameSource
+
+
+def main():
+    """Run a farmer script on a recording (see `recording_exporter.py`) instead of the game, e.g., to reproduce what went
+    wrong or to benchmark the vision and the decisions offline. No input is sent to the game.
+    Example: `python recording_replayer.py recording.zip BirdFarmer -- --clears 1`
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("recording", type=str, help="Recording to replay, a directory or a zip archive")
+    parser.add_argument("farmer", type=str, help="Farmer script to run on the recording, e.g., 'BirdFarmer'")
+    parser.add_argument("--realtime", action="store_true", help="Serve the frames at the recorded pace")
+    parser.add_argument("--speed", type=float, default=1.0, help="Speed-up of the recorded pace, with '--realtime'")
+    parser.add_argument("farmer_args", nargs=argparse.REMAINDER, help="Arguments of the farmer script, after '--'")
+    args = parser.parse_args()
+
+    replay = ReplayFrameSource(args.recording, realtime=args.realtime, speed=args.speed)
+    FrameSource.set_active(replay)
+
+    # The farmer script parses its own arguments
+    farmer_args = args.farmer_args[1:] if args.farmer_args[:1] == ["--"] else args.farmer_args
+    sys.argv = [f"{args.farmer}.py", *farmer_args]
+
+    start_time = time.time()
+    runpy.run_module(args.farmer, run_name="__main__")
+    print(f"Replayed {len(replay)} frames in {time.time() - start_time:.2f}s, {replay.skipped_inputs} inputs skipped.")
+
+
+if __name__ == "__main__":
+    main()
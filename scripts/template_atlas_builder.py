@@ -0,0 +1,22 @@
+import argparse
+import time
+
+from utilities.template_atlas import ATLAS_PATH, TemplateAtlas
+
+
+def main():
+    """Pack all the images in 'images/' into a template atlas, for the farmers to start faster.
+    Needs to be re-run after updating the images, although outdated needles are read from their image file anyway.
+    """
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", type=str, default=ATLAS_PATH, help="Where to write the template atlas")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    num_needles = TemplateAtlas.build(args.output)
+    print(f"Packed {num_needles} needles into '{args.output}' in {time.time() - start_time:.2f}s.")
+
+
+if __name__ == "__main__":
+    main()
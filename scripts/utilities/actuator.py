@@ -0,0 +1,209 @@
+"""Mouse and keyboard input performed on a background thread, so that the farmers keep analyzing frames meanwhile.
+
+Clicking on a button used to block the thread that decided to click for the whole time the game takes to react to it
+(0.5s after every `find_and_click`, more with `click_and_sleep`). Once started, the actuator thread performs all the
+input instead, in the order it's requested by any thread, and waits for the game to settle in the background: the
+farmer goes on to capture and analyze the next frame right away. Capture (`FrameBus`), analysis (the farmer, fighter and
+dailies threads) and actuation thus run as a pipeline.
+
+Frames captured before the game had time to react to the latest click still show the screen before that click, so
+`capture_window` waits for the game to settle before returning a frame, and clicks decided on a frame that another click
+made outdated are refused (`find_and_click` then looks for its needle again on a new frame), instead of clicking twice
+on the same button. Clicks decided on the same frame are still performed one after the other, and any action waits for
+the game to settle after the previous one.
+"""
+
+import collections
+import functools
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import numpy as np
+from utilities.clock import Clock
+from utilities.frame import Frame
+from utilities.frame_cache import FrameCache
+from utilities.frame_source import FrameSource
+from utilities.tracing import Tracer
+
+
+@dataclass
+class QueuedAction:
+    action: Callable[[], Any]
+    # Seconds for the game to react after the action, `None` for the actions whose caller waits for them
+    settle_time: float | None = None
+    # Set once performed, for the callers that wait for the action
+    done: threading.Event | None = None
+    result: Any = None
+    error: BaseException | None = field(default=None, repr=False)
+
+
+class Actuator:
+    """Namespace-like class that performs the input of all the threads on a background thread, once started"""
+
+    _condition = threading.Condition()
+    _thread: threading.Thread | None = None
+    _queue: collections.deque[QueuedAction] = collections.deque()
+    # Actions that don't block their caller, either queued or being performed
+    _pending_actions = 0
+    # When the game is done reacting to the latest action that didn't block its caller
+    _settled_at = 0.0
+    # Frame the latest action that didn't block its caller was decided on
+    _latest_frame: Frame | None = None
+    # Error raised by an action that didn't block its caller, raised in the next thread requesting an action
+    _error: BaseException | None = None
+
+    # Counters, to know how much waiting we're overlapping with the analysis
+    performed_actions = 0
+    refused_actions = 0
+    settle_time = 0.0
+
+    @staticmethod
+    def start():
+        """Start the actuator thread, if not started already"""
+        with Actuator._condition:
+            if Actuator._thread is not None:
+                return
+            Actuator._thread = threading.Thread(target=Actuator._perform_actions, name="actuator", daemon=True)
+            Actuator._thread.start()
+
+    @staticmethod
+    def stop():
+        """Perform the queued actions and stop the actuator thread, input is performed by its callers again"""
+        with Actuator._condition:
+            thread = Actuator._thread
+            Actuator._thread = None
+            Actuator._condition.notify_all()
+        if thread is not None:
+            thread.join()
+
+    @staticmethod
+    def is_running() -> bool:
+        return Actuator._thread is not None
+
+    @staticmethod
+    def perform(action: Callable[[], Any], screenshot: np.ndarray | None = None, settle_time: float = 0.5) -> bool:
+        """Perform the action decided on the given screenshot, then wait `settle_time` seconds for the game to react.
+        Returns right away if the actuator is running, and returns whether the action will be performed: it's refused,
+        without performing it, if the screenshot was captured before the game reacted to an action decided on another
+        frame. The caller then has to decide again on a new frame.
+        """
+        if not Actuator.is_running():
+            Actuator._send(action)
+            with Tracer.span("sleep:settle"):
+                Clock.sleep(settle_time)
+            return True
+
+        # Only captured frames can be outdated
+        frame = Frame.of(screenshot) if screenshot is not None and FrameCache.is_frame(screenshot) else None
+
+        with Actuator._condition:
+            Actuator._raise_error()
+            if frame is not None and frame is not Actuator._latest_frame:
+                if Actuator._pending_actions or frame.capture_time < Actuator._settled_at:
+                    Actuator.refused_actions += 1
+                    return False
+                Actuator._latest_frame = frame
+
+            Actuator._pending_actions += 1
+            Actuator._queue.append(QueuedAction(action, settle_time=settle_time))
+            Actuator._condition.notify_all()
+        return True
+
+    @staticmethod
+    def wait_until_settled() -> float:
+        """Wait for the game to react to all the actions that didn't block their caller, and return when it did"""
+        with Actuator._condition:
+            while Actuator._pending_actions and Actuator.is_running():
+                Actuator._condition.wait()
+            settled_at = Actuator._settled_at
+
+        with Tracer.span("sleep:settle"):
+            Clock.sleep(settled_at - Clock.now())
+        return settled_at
+
+    @staticmethod
+    def perform_and_wait(action: Callable[[], Any]) -> Any:
+        """Perform the action in order with the actions of the other threads, and return its result once performed.
+        The caller is in charge of waiting for the game to react.
+        """
+        if not Actuator.is_running() or threading.current_thread() is Actuator._thread:
+            return Actuator._send(action)
+
+        queued_action = QueuedAction(action, done=threading.Event())
+        with Actuator._condition:
+            Actuator._raise_error()
+            Actuator._queue.append(queued_action)
+            Actuator._condition.notify_all()
+
+        queued_action.done.wait()
+        if queued_action.error is not None:
+            raise queued_action.error
+        return queued_action.result
+
+    @staticmethod
+    def serialized(function: Callable) -> Callable:
+        """Decorator for the functions sending input to the game, for their input to go through the actuator"""
+
+        traced_function = Tracer.traced(f"input:{function.__name__}")(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return Actuator.perform_and_wait(functools.partial(traced_function, *args, **kwargs))
+
+        return wrapper
+
+    @staticmethod
+    def stats() -> str:
+        """Summary of the performed and dropped actions"""
+        return (
+            f"Actuator: {Actuator.performed_actions} actions performed in the background, "
+            f"{Actuator.refused_actions} refused as decided on outdated frames, "
+            f"{Actuator.settle_time:.1f}s of settling overlapped with the analysis."
+        )
+
+    @staticmethod
+    def _send(action: Callable[[], Any]) -> Any:
+        """Perform the action through the active `FrameSource`, which doesn't send any input to the game when replaying"""
+        return FrameSource.get_active().send_input(action)
+
+    @staticmethod
+    def _raise_error():
+        """Raise the error of a previous action in the calling thread, as if it had performed the action itself"""
+        if (error := Actuator._error) is not None:
+            Actuator._error = None
+            raise error
+
+    @staticmethod
+    def _perform_actions():
+        """Body of the actuator thread"""
+        while True:
+            with Actuator._condition:
+                while not Actuator._queue and Actuator._thread is threading.current_thread():
+                    Actuator._condition.wait()
+                if not Actuator._queue:
+                    return
+                queued_action = Actuator._queue.popleft()
+                settled_at = Actuator._settled_at
+
+            # Give the game time to react to the previous action, like its caller used to do after clicking
+            Clock.sleep(settled_at - Clock.now())
+
+            try:
+                queued_action.result = Actuator._send(queued_action.action)
+            except BaseException as e:
+                # E.g., the fail-safe of `pyautogui`, which has to stop the farmer
+                queued_action.error = e
+
+            with Actuator._condition:
+                if queued_action.done is not None:
+                    queued_action.done.set()
+                else:
+                    Actuator._settled_at = Clock.now() + queued_action.settle_time
+                    Actuator._pending_actions -= 1
+                    Actuator.performed_actions += 1
+                    Actuator.settle_time += queued_action.settle_time
+                    if queued_action.error is not None:
+                        Actuator._error = queued_action.error
+                    # For the threads waiting for the game to settle
+                    Actuator._condition.notify_all()
@@ -1,11 +1,10 @@
-import time
-
 import numpy as np
 import utilities.vision_images as vio
 from utilities.card_data import Card, CardTypes
 from utilities.coordinates import Coordinates
 from utilities.general_fighter_interface import FightingStates, IFighter
-from utilities.utilities import capture_window, find, find_and_click, get_hand_cards
+from utilities.tick_scheduler import TickScheduler
+from utilities.utilities import capture_window, find, find_and_click, find_first, get_hand_cards
 
 
 class BirdFighter(IFighter):
@@ -61,16 +60,12 @@ class BirdFighter(IFighter):
 
     def _identify_phase(self, screenshot: np.ndarray):
         """Read the screenshot and identify the phase we're currently in"""
-        if find(vio.phase_4, screenshot, threshold=0.8):
-            # Phase 4 first, because it can be misread as a 1
-            return 4
-        elif find(vio.phase_2, screenshot, threshold=0.8):
-            return 2
-        elif find(vio.phase_3, screenshot, threshold=0.8):
-            return 3
+        # Phase 4 first, because it can be misread as a 1
+        phases = [4, 2, 3]
+        phase_index, _ = find_first([(vio.phase_4, 0.8), (vio.phase_2, 0.8), (vio.phase_3, 0.8)], screenshot)
 
         # Default to phase 1 in case we don't see anything
-        return 1
+        return phases[phase_index] if phase_index is not None else 1
 
     def my_turn_state(self):
         """State in which the 4 cards will be picked and clicked. Overrides the parent method."""
@@ -179,6 +174,9 @@ class BirdFighter(IFighter):
 
         print(f"Fighting very hard on floor {BirdFighter.current_floor}...")
 
+        # Fast ticks while the fight moves on, slower ones while waiting on a static screen
+        tick_scheduler = TickScheduler(min_interval=0.3, max_interval=1.5)
+
         while True:
 
             if self.current_state == FightingStates.FIGHTING:
@@ -200,4 +198,4 @@ class BirdFighter(IFighter):
                 print("Closing Fighter thread!")
                 return
 
-            time.sleep(0.7)
+            tick_scheduler.wait(self.current_state)
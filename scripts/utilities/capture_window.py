@@ -1,55 +1,47 @@
 import numpy as np
-import win32con
-import win32gui
-import win32ui
+from utilities.actuator import Actuator
+from utilities.coordinates import Coordinates
+from utilities.frame import Frame
+from utilities.frame_bus import FrameBus
+from utilities.frame_recorder import FrameRecorder
+from utilities.frame_source import FrameSource
+from utilities.tracing import Tracer
 
 
+@Tracer.traced()
 def capture_window() -> tuple[np.ndarray, tuple[int, int]]:
-    """Make a screenshot of the 7DS window.
+    """Make a screenshot of the 7DS window, or get the next frame of the active `FrameSource` (e.g., a replay).
+    If the `FrameBus` is running, the latest frame it captured is returned instead, if recent enough.
+    Waits for the game to react to the latest click first, so that the frame never shows the screen before that click.
+    The image is read-only, like its crops and conversions, since it's shared by the threads and the caches: copy it
+    before drawing on it or modifying it (e.g., `draw_rectangles`).
     Returns:
         tuple[np.ndarray, list[float]]: The image as a numpy array, and a list of the top-left corner of the window as [x,y]
     """
-    hwnd_target = win32gui.FindWindow(None, r"7DS")
-    window_rect = win32gui.GetWindowRect(hwnd_target)
-    w = window_rect[2] - window_rect[0]
-    h = window_rect[3] - window_rect[1]
-    window_location = [window_rect[0], window_rect[1]]
+    frame, window_location = capture_frame(wait_until_settled=True)
 
-    # Remove border pixels -- TODO: Necessary?
-    border_pixels = 2
-    w = w - (border_pixels * 2)
-    h = h - 20
+    # Any vision result cached on the previous frame of this thread is now obsolete
+    img = Frame.register(frame)
+    # Only recomputes the coordinate transforms if the window has been resized
+    Coordinates.set_window_size(img.shape[1], img.shape[0])
 
-    # Whatever this is?
-    hdesktop = win32gui.GetDesktopWindow()
-    hwndDC = win32gui.GetWindowDC(hdesktop)
-    mfcDC = win32ui.CreateDCFromHandle(hwndDC)
-    saveDC = mfcDC.CreateCompatibleDC()
-
-    saveBitMap = win32ui.CreateBitmap()
-    saveBitMap.CreateCompatibleBitmap(mfcDC, w, h)
-
-    saveDC.SelectObject(saveBitMap)
-    saveDC.BitBlt((0, 0), (w, h), mfcDC, (window_rect[0], window_rect[1]), win32con.SRCCOPY)
-
-    # bmpinfo = saveBitMap.GetInfo()
-    bmpstr = saveBitMap.GetBitmapBits(True)
-
-    # convert the raw data into a format opencv can read
-    img = np.frombuffer(bmpstr, dtype="uint8")
-    # Reshape the array
-    img = img.reshape(h, w, 4)
-
-    # free resources
-    win32gui.DeleteObject(saveBitMap.GetHandle())
-    saveDC.DeleteDC()
-    mfcDC.DeleteDC()
-    win32gui.ReleaseDC(hdesktop, hwndDC)
-    img = img[..., :3]
+    return img, window_location
 
-    img = np.ascontiguousarray(img)
-    # get updated window location
-    window_rect = win32gui.GetWindowRect(hwnd_target)
-    window_location = [window_rect[0], window_rect[1]]
 
-    return img, window_location
+def capture_frame(max_age: float = FrameBus.MAX_AGE, wait_until_settled: bool = False) -> tuple[Frame, list[int]]:
+    """Same as `capture_window`, but the frame is neither converted to BGR nor registered in the `FrameCache`, for the
+    consumers that don't need the BGR image (e.g., to watch the screen for changes).
+    Frames of the `FrameBus` are reused if they're at most `max_age` seconds old.
+    """
+    settled_at = Actuator.wait_until_settled() if wait_until_settled else 0.0
+    if FrameBus.is_running():
+        # The bus records the frames it captures
+        published_frame = FrameBus.get_frame(max_age=max_age, captured_after=settled_at)
+        return published_frame.frame, list(published_frame.window_location)
+
+    frame, window_location = FrameSource.get_active().capture()
+    # Same as the frames of the bus, whatever the frame source
+    frame.raw_image.flags.writeable = False
+    # Keep a trace of what the screen looked like, in the background
+    FrameRecorder.record(frame, window_location)
+    return frame, window_location
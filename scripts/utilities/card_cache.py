@@ -0,0 +1,127 @@
+"""Memoization of what the models and needles tell about a card, across frames and turns.
+
+Most cards of the hand stay the same from one `pick_cards` call to the next, and from one turn to the next, yet they
+used to be classified from scratch every time. Cards are identified by a perceptual hash of their image instead: a small
+color thumbnail, one pixel per few pixels of the card. Two card images are the same card if no pixel of their thumbnails
+differs by more than `THRESHOLD`, which pixel noise doesn't reach, but a different unit, rank, or a grayed out (disabled)
+card does. Reading a card that was read before only costs a thumbnail and a lookup.
+
+The latest cards are kept in a bounded LRU cache, shared by all the threads.
+"""
+
+import functools
+import threading
+from typing import Any, Callable, Hashable
+
+import cv2
+import numpy as np
+from utilities.card_data import Card
+
+
+class CardCache:
+    """Namespace-like class that caches results per card, identified by a perceptual hash of its image"""
+
+    # There are a few dozens of different cards in a team, counting all ranks
+    MAX_CARDS = 128
+    # Size (width, height) of the thumbnail, cards are about twice as tall as they're wide
+    THUMBNAIL_SIZE = (8, 16)
+    # In color levels, the same card differs less than this between frames
+    THRESHOLD = 4
+
+    _lock = threading.Lock()
+    # Thumbnails of the cached cards, one per row, their results, and when they were last used (for the LRU)
+    _thumbnails = np.zeros((MAX_CARDS, THUMBNAIL_SIZE[0] * THUMBNAIL_SIZE[1] * 3), dtype=np.int16)
+    _results: list[dict[Hashable, Any]] = []
+    _last_used = np.zeros(MAX_CARDS, dtype=np.int64)
+    _clock = 0
+
+    # Counters, to know how much work we're saving
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def get_thumbnail(card_image: np.ndarray) -> np.ndarray:
+        """Perceptual hash of the card image, close for the same card in different frames"""
+        if card_image.ndim == 2:
+            card_image = cv2.cvtColor(card_image, cv2.COLOR_GRAY2BGR)
+        thumbnail = cv2.resize(card_image, CardCache.THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        return thumbnail.astype(np.int16).ravel()
+
+    @staticmethod
+    def get_card_results(card_image: np.ndarray) -> dict[Hashable, Any]:
+        """The results cached for the card (to use with `lookup` and `store`), adding the card if it's not cached"""
+        thumbnail = CardCache.get_thumbnail(card_image)
+        with CardCache._lock:
+            CardCache._clock += 1
+            num_cards = len(CardCache._results)
+
+            if num_cards:
+                differences = np.abs(CardCache._thumbnails[:num_cards] - thumbnail).max(axis=1)
+                index = int(differences.argmin())
+                if differences[index] <= CardCache.THRESHOLD:
+                    CardCache._last_used[index] = CardCache._clock
+                    return CardCache._results[index]
+
+            # A new card, replacing the least recently used one if full
+            if num_cards < CardCache.MAX_CARDS:
+                index = num_cards
+                CardCache._results.append({})
+            else:
+                index = int(CardCache._last_used.argmin())
+                # Whoever still holds the results of the replaced card keeps a dictionary that is no longer cached
+                CardCache._results[index] = {}
+            CardCache._thumbnails[index] = thumbnail
+            CardCache._last_used[index] = CardCache._clock
+            return CardCache._results[index]
+
+    @staticmethod
+    def lookup(card_results: dict[Hashable, Any], key: Hashable) -> tuple[bool, Any]:
+        """Return whether the result of `key` is cached for the card, and the result if so"""
+        if key not in card_results:
+            return False, None
+        CardCache.hits += 1
+        return True, card_results[key]
+
+    @staticmethod
+    def store(card_results: dict[Hashable, Any], key: Hashable, result: Any):
+        """Cache a result computed for the card, e.g., in a batch with other cards"""
+        CardCache.misses += 1
+        card_results[key] = result
+
+    @staticmethod
+    def get_or_compute(card_image: np.ndarray, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached result of `key` for the card, computing it if the card wasn't seen recently"""
+        card_results = CardCache.get_card_results(card_image)
+        found, result = CardCache.lookup(card_results, key)
+        if not found:
+            result = compute()
+            CardCache.store(card_results, key, result)
+        return result
+
+    @staticmethod
+    def cached(function: Callable[[Card], Any]) -> Callable[[Card], Any]:
+        """Decorator for the functions that only depend on the card (its image, type and rank), e.g., `is_Thor_card`"""
+        key_name = f"{function.__module__}.{function.__qualname__}"
+
+        @functools.wraps(function)
+        def wrapper(card: Card) -> Any:
+            if card.card_image is None:
+                return function(card)
+            # The strategies may change the type of a card (e.g., once played), which may change the result
+            return CardCache.get_or_compute(
+                card.card_image, (key_name, card.card_type, card.card_rank), lambda: function(card)
+            )
+
+        return wrapper
+
+    @staticmethod
+    def stats() -> str:
+        """Summary of the cache hits and misses"""
+        total = CardCache.hits + CardCache.misses
+        hit_rate = 100 * CardCache.hits / total if total else 0
+        return f"Card cache: {CardCache.hits} hits, {CardCache.misses} misses ({hit_rate:.1f}% hits)."
+
+    @staticmethod
+    def clear():
+        with CardCache._lock:
+            CardCache._results.clear()
@@ -0,0 +1,220 @@
+"""Which unit and skill a card is, in a single query over the skill templates of all the units.
+
+Telling the unit of a card used to take a chain of `find` calls, one per skill template (up to 15 for a green card in
+Deer), repeated by every helper asking about the same card. `CardIdentifier` keeps an index of all the skill templates,
+downscaled by `COARSE_SCALE`: a card is compared to all of them at that resolution, which takes a tiny fraction of
+matching a single template at full resolution, and only the `NUM_CANDIDATES` nearest templates are matched at full
+resolution, to get the same score as `find` would.
+
+The identity of a card is cached in the `CardCache`, and the helpers (unit, color, skill flags...) answer from it through
+the `UNIT_COLORS` and `SKILL_FLAGS` tables, so asking about a card already read is just a few lookups. Only the cards
+the index can't identify confidently are matched against the relevant templates at full resolution, like `find` on
+each of them, and those scores are cached too.
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable
+
+import cv2
+import numpy as np
+import utilities.vision_images as vio
+from utilities.card_cache import CardCache
+from utilities.card_data import Card
+from utilities.coordinates import Coordinates
+from utilities.tracing import Tracer
+from utilities.vision import Vision
+
+
+@dataclass(frozen=True)
+class CardIdentity:
+    unit: str | None = None
+    skill: str | None = None
+    # Template matching score of the skill template on the card
+    confidence: float = 0.0
+    vision: Vision | None = field(default=None, compare=False, repr=False)
+
+
+class CardIdentifier:
+    """Namespace-like class that identifies the unit and skill of the cards"""
+
+    # Skills of every unit, whose templates are `vision_images.<unit>_<skill>`
+    UNIT_SKILLS = {
+        # Deer
+        "lv": ("st", "aoe", "ult"),
+        "jorm": ("1", "2", "ult"),
+        "roxy": ("st", "aoe", "ult"),
+        "escanor": ("st", "aoe", "ult"),
+        "albedo": ("1", "ult"),
+        "lolimerl": ("st", "aoe", "ult"),
+        "thor": ("1", "2", "ult"),
+        "freyr": ("1", "2", "ult"),
+        "meg": ("1", "2", "ult"),
+        "hel": ("1", "2", "ult"),
+        "tyr": ("1", "2", "ult"),
+        # Dogs
+        "ghel": ("aoe1", "aoe2", "ult"),
+        "milim": ("st", "aoe", "ult"),
+        # Snake
+        "mael": ("st", "aoe", "ult"),
+        "margaret": ("st",),
+        "freyja": ("st", "aoe", "ult"),
+        "lr_liz": ("aoe",),
+        # Demonic beasts
+        "meli": ("aoe", "ult", "ampli"),
+    }
+    # Color of the Deer units
+    UNIT_COLORS = {
+        "lv": "red",
+        "freyr": "red",
+        "meg": "red",
+        "lolimerl": "green",
+        "jorm": "green",
+        "escanor": "green",
+        "hel": "green",
+        "tyr": "green",
+        "albedo": "blue",
+        "roxy": "blue",
+        "thor": "blue",
+    }
+    # What the strategies need to know about some skills
+    SKILL_FLAGS = {
+        ("jorm", "2"): ("buff_removal",),
+        ("tyr", "1"): ("buff_removal",),
+        ("tyr", "2"): ("buff_removal",),
+        ("freyja", "st"): ("stance_cancel", "hard_hitting_snake"),
+        ("freyja", "aoe"): ("hard_hitting_snake",),
+        ("margaret", "st"): ("stance_cancel",),
+        ("mael", "st"): ("hard_hitting_snake",),
+        ("mael", "aoe"): ("hard_hitting_snake",),
+    }
+    # Same threshold as `find`
+    MIN_CONFIDENCE = 0.7
+    COARSE_SCALE = 4
+    NUM_CANDIDATES = 3
+
+    # Template scale -> the downscaled skill templates, in the order of `_get_skills`
+    _coarse_templates: dict[float, list[np.ndarray]] = {}
+
+    @staticmethod
+    def identify(card: Card) -> CardIdentity:
+        """The unit and skill of the card, or an empty identity if it's none of the known skills"""
+        if card.card_image is None:
+            return CardIdentity()
+        return CardCache.get_or_compute(
+            card.card_image, "card_identity", lambda: CardIdentifier.identify_image(card.card_image)
+        )
+
+    @staticmethod
+    def is_unit(card: Card, *units: str) -> bool:
+        """Whether the card is a skill of any of the given units"""
+        return CardIdentifier._is_any_skill(card, lambda unit, _: unit in units)
+
+    @staticmethod
+    def is_color(card: Card, color: str) -> bool:
+        """Whether the card is a skill of a unit of the given color, see `UNIT_COLORS`"""
+        return CardIdentifier._is_any_skill(card, lambda unit, _: CardIdentifier.UNIT_COLORS.get(unit) == color)
+
+    @staticmethod
+    def is_skill(card: Card, unit: str, *skills: str) -> bool:
+        """Whether the card is any of the given skills of the unit, e.g., `is_skill(card, "jorm", "1")`"""
+        return CardIdentifier._is_any_skill(card, lambda card_unit, skill: card_unit == unit and skill in skills)
+
+    @staticmethod
+    def has_flag(card: Card, flag: str) -> bool:
+        """Whether the card is a skill with the given flag, see `SKILL_FLAGS`"""
+        return CardIdentifier._is_any_skill(
+            card, lambda unit, skill: flag in CardIdentifier.SKILL_FLAGS.get((unit, skill), ())
+        )
+
+    @staticmethod
+    def get_score(card: Card, vision: Vision) -> float:
+        """Template matching score of the skill template on the card, at full resolution"""
+        if card.card_image is None or vision.needle_img is None:
+            return -1.0
+        # The Visions live as long as the program, their IDs are never reused
+        return CardCache.get_or_compute(
+            card.card_image,
+            ("skill_score", id(vision)),
+            lambda: CardIdentifier._match_score(vision.color_mode.convert(card.card_image), vision.search_needle_img),
+        )
+
+    @staticmethod
+    @Tracer.traced()
+    def identify_image(card_image: np.ndarray) -> CardIdentity:
+        """Identify the card image, without caching"""
+        skills = CardIdentifier._get_skills()
+        coarse_templates = CardIdentifier._get_coarse_templates()
+
+        # Nearest templates at coarse resolution
+        scale = CardIdentifier.COARSE_SCALE
+        coarse_card = cv2.resize(card_image, None, fx=1 / scale, fy=1 / scale, interpolation=cv2.INTER_AREA)
+        coarse_scores = np.array(
+            [CardIdentifier._match_score(coarse_card, coarse_template) for coarse_template in coarse_templates]
+        )
+        candidates = np.argsort(coarse_scores)[::-1][: CardIdentifier.NUM_CANDIDATES]
+
+        # Only the candidates are matched at full resolution
+        best_identity = CardIdentity()
+        for candidate in candidates:
+            unit, skill, vision = skills[candidate]
+            score = CardIdentifier._match_score(vision.color_mode.convert(card_image), vision.search_needle_img)
+            if score > best_identity.confidence:
+                best_identity = CardIdentity(unit, skill, score, vision)
+
+        if best_identity.confidence < CardIdentifier.MIN_CONFIDENCE:
+            return CardIdentity(confidence=best_identity.confidence)
+        return best_identity
+
+    @staticmethod
+    def _is_any_skill(card: Card, is_wanted: Callable[[str, str], bool]) -> bool:
+        """Whether the card is any of the (unit, skill) pairs accepted by `is_wanted`"""
+        if card.card_image is None:
+            return False
+
+        identity = CardIdentifier.identify(card)
+        if identity.confidence >= CardIdentifier.MIN_CONFIDENCE:
+            return is_wanted(identity.unit, identity.skill)
+
+        # The coarse ranking may have missed it, check the wanted templates like `find` would
+        return any(
+            CardIdentifier.get_score(card, vision) >= CardIdentifier.MIN_CONFIDENCE
+            for unit, skill, vision in CardIdentifier._get_skills()
+            if is_wanted(unit, skill)
+        )
+
+    @staticmethod
+    def _get_skills() -> list[tuple[str, str, Vision]]:
+        """All the skill templates that can be loaded, as (unit, skill, template)"""
+        return [
+            (unit, skill, vision)
+            for unit, skills in CardIdentifier.UNIT_SKILLS.items()
+            for skill in skills
+            if (vision := getattr(vio, f"{unit}_{skill}")).needle_img is not None
+        ]
+
+    @staticmethod
+    def _get_coarse_templates() -> list[np.ndarray]:
+        """The skill templates downscaled (in color, like the cards), computed once per window scale"""
+        template_scale = Coordinates.get_template_scale()
+        if (coarse_templates := CardIdentifier._coarse_templates.get(template_scale)) is None:
+            scale = CardIdentifier.COARSE_SCALE
+            coarse_templates = CardIdentifier._coarse_templates[template_scale] = [
+                cv2.resize(
+                    Coordinates.scale_template(vision.needle_img),
+                    None,
+                    fx=1 / scale,
+                    fy=1 / scale,
+                    interpolation=cv2.INTER_AREA,
+                )
+                for _, _, vision in CardIdentifier._get_skills()
+            ]
+        return coarse_templates
+
+    @staticmethod
+    def _match_score(image: np.ndarray, template: np.ndarray) -> float:
+        """Best `TM_CCOEFF_NORMED` score of the template on the image"""
+        if template.shape[0] > image.shape[0] or template.shape[1] > image.shape[1]:
+            return -1.0
+        match_result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+        # Flat windows have no defined score
+        return float(np.nan_to_num(match_result, nan=-1.0).max())
@@ -0,0 +1,31 @@
+"""Time as the farmers see it: the wall clock when playing live, the recorded time of the frames when replaying.
+
+The capture times of the frames, the pacing of the loops (`TickScheduler`), the waits for the game to react to the input
+(`Actuator`) and the time spent in each state (`Tracer`) all read and wait on `Clock`, which follows the active
+`FrameSource`. A replay can thus run as fast as the frames are analyzed, and decide the same way on every run.
+"""
+
+import time
+from typing import Callable
+
+
+class Clock:
+    """Namespace-like class giving the current time (in seconds) and waiting on it"""
+
+    _now: Callable[[], float] = time.perf_counter
+    _sleep: Callable[[float], None] = time.sleep
+
+    @staticmethod
+    def now() -> float:
+        return Clock._now()
+
+    @staticmethod
+    def sleep(seconds: float):
+        if seconds > 0:
+            Clock._sleep(seconds)
+
+    @staticmethod
+    def set(now: Callable[[], float] | None = None, sleep: Callable[[float], None] | None = None):
+        """Use the given clock, e.g., the one of the active `FrameSource`. `None` goes back to the wall clock."""
+        Clock._now = now or time.perf_counter
+        Clock._sleep = sleep or time.sleep
@@ -1,11 +1,27 @@
-"""This file should be improved in the future to account for a variable game window."""
+"""Hardcoded coordinates of the game window, and their transform to the actual size of the window.
 
-from utilities.capture_window import capture_window
+All the coordinates are measured on a `REFERENCE_SIZE` window. The size of the window is measured on every captured
+frame (see `capture_window`, which calls `set_window_size`), and when it changes, the scale and offset transforms are
+computed once. Scaled coordinates and regions are then served from a cache, so that a lookup never costs a capture.
+The game keeps its aspect ratio when the window is resized, any extra space being letterboxed, so the same scale
+applies to both axes.
+"""
+
+import cv2
+import numpy as np
 
 
 class Coordinates:
     """Namespace-like class to group all the hardcoded coordinates"""
 
+    # (width, height) of the window the coordinates were measured on, which is also the size of the needle images
+    REFERENCE_SIZE = (552, 948)
+
+    _window_size = REFERENCE_SIZE
+    # Transform from reference coordinates to window coordinates (scaled, then offset), along with the coordinates and
+    # regions already transformed. Replaced at once when the window is resized, for all the threads to see a whole one.
+    _transform: tuple[float, tuple[float, float], dict[tuple[str, str], tuple]] = (1.0, (0.0, 0.0), {})
+
     # Screen coordinates for each floor
     __coordinates = {
         # General
@@ -54,12 +70,79 @@ class Coordinates:
         "first_stamp": (83, 762),
     }
 
+    # Regions of the window where some images can only appear, as (top-left, bottom-right) corners.
+    # `Vision` instances declared with a `region` only search inside it.
+    __regions = {
+        # Boss HP bar, where the phase, stance and buff icons are
+        "boss_status": ((0, 0), (552, 520)),
+        # Card slots and hand of cards, where the battle messages also show up
+        "battle_controls": ((0, 400), (552, 948)),
+        "card_slots": ((150, 690), (410, 800)),
+        # Floor number in the Demonic Beast screen
+        "db_floor": ((344, 122), (459, 165)),
+    }
+
+    @staticmethod
+    def set_window_size(width: int, height: int):
+        """Update the transform if the window has been resized. Cheap enough to be called on every frame."""
+        if (width, height) == Coordinates._window_size:
+            return
+
+        reference_width, reference_height = Coordinates.REFERENCE_SIZE
+        scale = min(width / reference_width, height / reference_height)
+        offset = ((width - reference_width * scale) / 2, (height - reference_height * scale) / 2)
+        Coordinates._transform = (scale, offset, {})
+        Coordinates._window_size = (width, height)
+        print(f"Game window is now {width}x{height}, scaling coordinates and images by {scale:.3f}.")
+
+    @staticmethod
+    def get_window_size() -> tuple[int, int]:
+        """(width, height) of the latest captured frame"""
+        return Coordinates._window_size
+
+    @staticmethod
+    def get_template_scale() -> float:
+        """Factor to resize the images measured on the reference window by, to match them on the current window"""
+        return Coordinates._transform[0]
+
+    @staticmethod
+    def scale_point(point: tuple[float, float]) -> tuple[int, int]:
+        """Transform a point measured on the reference window to the current window"""
+        scale, offset, _ = Coordinates._transform
+        return Coordinates._scale_point(point, scale, offset)
+
+    @staticmethod
+    def scale_template(image: np.ndarray) -> np.ndarray:
+        """Resize an image measured on the reference window to the current window"""
+        scale = Coordinates.get_template_scale()
+        if scale == 1:
+            return image
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        return cv2.resize(image, None, fx=scale, fy=scale, interpolation=interpolation)
+
+    @staticmethod
+    def get_region(region) -> tuple[tuple[int, int], tuple[int, int]]:
+        """(top-left, bottom-right) corners of the region in the current window"""
+        scale, offset, cache = Coordinates._transform
+        key = ("region", region)
+        if (scaled_region := cache.get(key)) is None:
+            top_left, bottom_right = Coordinates.__regions[region]
+            scaled_region = cache[key] = (
+                Coordinates._scale_point(top_left, scale, offset),
+                Coordinates._scale_point(bottom_right, scale, offset),
+            )
+        return scaled_region
+
+    @staticmethod
+    def get_coordinates(event) -> tuple[int, int]:
+        """Coordinates of the event in the current window"""
+        scale, offset, cache = Coordinates._transform
+        key = ("coordinates", event)
+        if (scaled_coordinates := cache.get(key)) is None:
+            scaled_coordinates = cache[key] = Coordinates._scale_point(Coordinates.__coordinates[event], scale, offset)
+        return scaled_coordinates
+
     @staticmethod
-    def get_coordinates(event):
-        x, y = Coordinates.__coordinates[event]
-        return x, y
-
-        # # Adjust their size based on the window!
-        # screenshot, _ = capture_window()
-        # y_ref, x_ref = screenshot.shape[:2]
-        # return int(x / 552 * x_ref), int(y / 948 * y_ref)
+    def _scale_point(point: tuple[float, float], scale: float, offset: tuple[float, float]) -> tuple[int, int]:
+        (x, y), (offset_x, offset_y) = point, offset
+        return round(x * scale + offset_x), round(y * scale + offset_y)
@@ -4,19 +4,20 @@ from threading import Lock
 from typing import Callable
 
 import numpy as np
-import pyautogui as pyautogui
 
 # Import all images
 import utilities.vision_images as vio
 from utilities.coordinates import Coordinates
 from utilities.general_fighter_interface import IBattleStrategy
 from utilities.logging_utils import LoggerWrapper
+from utilities.tick_scheduler import TickScheduler
 from utilities.utilities import (
     capture_window,
     click_and_sleep,
     crop_image,
     find,
     find_and_click,
+    find_first,
     press_key,
 )
 from utilities.vision import Vision
@@ -133,35 +134,37 @@ class DailyFarmer:
         """
         screenshot, window_location = capture_window()
 
-        # Get rewards
-        if find(vio.daily_complete, screenshot):
+        # The missions we know how to do, in order of preference, with the state that takes care of each of them
+        missions = [
+            (vio.daily_pvp, 0.89, States.PVP_STATE),
+            (vio.daily_boss_battle, 0.89, States.BOSS_STATE),
+            (vio.daily_patrol, 0.85, States.PATROL_STATE),
+            (vio.daily_vanya_ale, 0.89, States.VANYA_ALE_STATE),
+            (vio.daily_friendship_coins, 0.89, States.FRIENDSHIP_COINS_STATE),
+            (vio.daily_fort_solgress, 0.89, States.FORT_SOLGRESS_STATE),
+        ]
+        if not self.do_daily_pvp:
+            missions = missions[1:]
+
+        # Getting the rewards goes first
+        found_index, _ = find_first(
+            [(vio.daily_complete, 0.7)] + [(vision, threshold) for vision, threshold, _ in missions], screenshot
+        )
+
+        if found_index == 0:
             find_and_click(vio.take_all_rewards, screenshot, window_location, threshold=0.89)
             print("We have complete rewards, let's take them.")
             return
 
-        if self.do_daily_pvp and find(vio.daily_pvp, screenshot, threshold=0.89):
-            print("Going to PVP_STATE")
-            return States.PVP_STATE
-        if find(vio.daily_boss_battle, screenshot, threshold=0.89):
-            print("Going to BOSS_STATE")
-            return States.BOSS_STATE
-        if find(vio.daily_patrol, screenshot, threshold=0.85):
-            print("Going to PATROL_STATE")
-            return States.PATROL_STATE
-        if find(vio.daily_vanya_ale, screenshot, threshold=0.89):
-            print("Going to VANYA_ALE_STATE")
-            return States.VANYA_ALE_STATE
-        if find(vio.daily_friendship_coins, screenshot, threshold=0.89):
-            print("Going to FRIENDSHIP_COINS_STATE")
-            return States.FRIENDSHIP_COINS_STATE
-        if find(vio.daily_fort_solgress, screenshot, threshold=0.89):
+        if found_index is not None:
+            vision, _, next_state = missions[found_index - 1]
             # Here, we may have wrongly clicked on death match
-            mission_rectangle = self.extract_mission_rectangle(vio.daily_fort_solgress, screenshot)
-            if not find(vio.blue_stone, mission_rectangle, threshold=0.8):
-                print("Going to FORT_SOLGRESS_STATE")
-                return States.FORT_SOLGRESS_STATE
-            else:
-                print("We WRONGLY want to click on death match thinking it's FORT SOLGRESS!")
+            if next_state != States.FORT_SOLGRESS_STATE or not find(
+                vio.blue_stone, self.extract_mission_rectangle(vision, screenshot), threshold=0.8
+            ):
+                print(f"Going to {next_state.name}")
+                return next_state
+            print("We WRONGLY want to click on death match thinking it's FORT SOLGRESS!")
 
         # If there's no 'go now', means we're done with the missions
         if not find(vio.go_now, screenshot):
@@ -544,6 +547,9 @@ class DailyFarmer:
 
         self.logger.info("Doing dailies!")
 
+        # Fast ticks while the screens change, slower ones while waiting on a static screen
+        tick_scheduler = TickScheduler(min_interval=0.3, max_interval=2)
+
         while True:
 
             self.check_for_essette_shop()
@@ -595,4 +601,4 @@ class DailyFarmer:
                 if self.exit_farmer_state():
                     return
 
-            time.sleep(1)
+            tick_scheduler.wait(DailyFarmer.current_state)
@@ -1,4 +1,3 @@
-import pyautogui as pyautogui
 import utilities.vision_images as vio
 from utilities.deer_fighter import DeerFighter, IFighter
 from utilities.demonic_beast_farming_logic import DemonicBeastFarmer, States
@@ -1,4 +1,3 @@
-import time
 from typing import Callable
 
 import cv2
@@ -8,12 +7,14 @@ from utilities.card_data import Card
 from utilities.coordinates import Coordinates
 from utilities.fighting_strategies import IBattleStrategy
 from utilities.general_fighter_interface import FightingStates, IFighter
+from utilities.tick_scheduler import TickScheduler
 from utilities.utilities import (
     capture_window,
     click_im,
     draw_rectangles,
     find,
     find_and_click,
+    find_first,
     get_card_slot_region_image,
 )
 from utilities.vision import Vision
@@ -121,16 +122,12 @@ class DeerFighter(IFighter):
 
     def _identify_phase(self, screenshot: np.ndarray):
         """Read the screenshot and identify the phase we're currently in"""
-        if find(vio.phase_4, screenshot, threshold=0.8):
-            # Phase 4 first, because it can be misread as a 1
-            return 4
-        elif find(vio.phase_2, screenshot, threshold=0.8):
-            return 2
-        elif find(vio.phase_3, screenshot, threshold=0.8):
-            return 3
+        # Phase 4 first, because it can be misread as a 1
+        phases = [4, 2, 3]
+        phase_index, _ = find_first([(vio.phase_4, 0.8), (vio.phase_2, 0.8), (vio.phase_3, 0.8)], screenshot)
 
         # Default to phase 1 in case we don't see anything
-        return 1
+        return phases[phase_index] if phase_index is not None else 1
 
     def fight_complete_state(self):
 
@@ -167,6 +164,9 @@ class DeerFighter(IFighter):
 
         print(f"Fighting very hard on floor {DeerFighter.current_floor}...")
 
+        # Fast ticks while the fight moves on, slower ones while waiting on a static screen
+        tick_scheduler = TickScheduler(min_interval=0.3, max_interval=1.5)
+
         while True:
 
             if self.current_state == FightingStates.FIGHTING:
@@ -185,4 +185,4 @@ class DeerFighter(IFighter):
                 print("Closing Fighter thread!")
                 return
 
-            time.sleep(0.7)
+            tick_scheduler.wait(self.current_state)
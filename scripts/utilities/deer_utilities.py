@@ -1,75 +1,38 @@
 from typing import Callable
 
 import numpy as np
-import utilities.vision_images as vio
 from utilities.card_data import Card, CardRanks, CardTypes
-from utilities.utilities import find
+from utilities.card_identity import CardIdentifier
 
 # TODO Add cards from new team
 
 
 def is_red_card(card: Card) -> bool:
-    return card.card_type != CardTypes.DISABLED and (
-        find(vio.lv_st, card.card_image)
-        or find(vio.lv_aoe, card.card_image)
-        or find(vio.lv_ult, card.card_image)
-        or find(vio.freyr_2, card.card_image)
-        or find(vio.freyr_1, card.card_image)
-        or find(vio.freyr_ult, card.card_image)
-        or find(vio.meg_1, card.card_image)
-        or find(vio.meg_ult, card.card_image)
-    )
+    return card.card_type != CardTypes.DISABLED and CardIdentifier.is_color(card, "red")
 
 
 def is_green_card(card: Card) -> bool:
-    return card.card_type != CardTypes.DISABLED and (
-        find(vio.lolimerl_st, card.card_image)
-        or find(vio.lolimerl_aoe, card.card_image)
-        or find(vio.lolimerl_ult, card.card_image)
-        or find(vio.jorm_1, card.card_image)
-        or find(vio.jorm_2, card.card_image)
-        or find(vio.jorm_ult, card.card_image)
-        or find(vio.escanor_st, card.card_image)
-        or find(vio.escanor_aoe, card.card_image)
-        or find(vio.escanor_ult, card.card_image)
-        or find(vio.hel_1, card.card_image)
-        or find(vio.hel_2, card.card_image)
-        or find(vio.hel_ult, card.card_image)
-        or find(vio.tyr_1, card.card_image)
-        or find(vio.tyr_2, card.card_image)
-        or find(vio.tyr_ult, card.card_image)
-    )
+    return card.card_type != CardTypes.DISABLED and CardIdentifier.is_color(card, "green")
 
 
 def is_blue_card(card: Card) -> bool:
-    return card.card_type != CardTypes.DISABLED and (
-        find(vio.albedo_1, card.card_image)
-        or find(vio.albedo_ult, card.card_image)
-        or find(vio.roxy_st, card.card_image)
-        or find(vio.roxy_aoe, card.card_image)
-        or find(vio.roxy_ult, card.card_image)
-        or find(vio.thor_1, card.card_image)
-        or find(vio.thor_2, card.card_image)
-        or find(vio.thor_ult, card.card_image)
-    )
+    return card.card_type != CardTypes.DISABLED and CardIdentifier.is_color(card, "blue")
 
 
 def is_Hel_card(card: Card) -> bool:
-    return find(vio.hel_1, card.card_image) or find(vio.hel_2, card.card_image) or find(vio.hel_ult, card.card_image)
+    return CardIdentifier.is_unit(card, "hel")
 
 
 def is_Freyr_card(card: Card) -> bool:
-    return (
-        find(vio.freyr_1, card.card_image) or find(vio.freyr_2, card.card_image) or find(vio.freyr_ult, card.card_image)
-    )
+    return CardIdentifier.is_unit(card, "freyr")
 
 
 def is_Jorm_card(card: Card) -> bool:
-    return find(vio.jorm_1, card.card_image) or find(vio.jorm_2, card.card_image) or find(vio.jorm_ult, card.card_image)
+    return CardIdentifier.is_unit(card, "jorm")
 
 
 def is_Tyr_card(card: Card) -> bool:
-    return find(vio.tyr_1, card.card_image) or find(vio.tyr_2, card.card_image) or find(vio.tyr_ult, card.card_image)
+    return CardIdentifier.is_unit(card, "tyr")
 
 
 # Helper to check for multiple cards of a type
@@ -79,12 +42,12 @@ def count_cards(hand_of_cards: list[Card], check_func: Callable[[Card], bool]) -
 
 
 def is_Thor_card(card: Card) -> bool:
-    return find(vio.thor_1, card.card_image) or find(vio.thor_2, card.card_image) or find(vio.thor_ult, card.card_image)
+    return CardIdentifier.is_unit(card, "thor")
 
 
 def is_buff_removal_card(card: Card):
     """Whether this is Jorm's or Tyr's buff removal card"""
-    return find(vio.jorm_2, card.card_image) or find(vio.tyr_1, card.card_image) or find(vio.tyr_2, card.card_image)
+    return CardIdentifier.has_flag(card, "buff_removal")
 
 
 def reorder_buff_removal_card(hand_of_cards: list[Card], green_card_ids: list[int]) -> list[int]:
@@ -107,7 +70,7 @@ def reorder_jorms_heal(hand_of_cards: list[Card], green_card_ids: list[int]) ->
     # Add the buff removal ID to the beginning of the list
     card_ranks = [card.card_rank.value for card in hand_of_cards]
     heal_ids = sorted(
-        np.where([find(vio.jorm_1, hand_of_cards[idx].card_image) for idx in green_card_ids])[0],
+        np.where([CardIdentifier.is_skill(hand_of_cards[idx], "jorm", "1") for idx in green_card_ids])[0],
         key=lambda idx: card_ranks[idx],
     )
     if len(heal_ids):
@@ -118,5 +81,4 @@ def reorder_jorms_heal(hand_of_cards: list[Card], green_card_ids: list[int]) ->
 
 def has_ult(unit: str, hand_of_cards: list[Card]) -> bool:
     """Returns if said unit has the ult enabled"""
-    ult_img = getattr(vio, f"{unit}_ult")
-    return next((True for card in hand_of_cards if find(ult_img, card.card_image)), False)
+    return next((True for card in hand_of_cards if CardIdentifier.is_skill(card, unit, "ult")), False)
@@ -5,7 +5,6 @@ from utilities.deer_utilities import is_blue_card, is_green_card, is_red_card, c
 from utilities.fighting_strategies import IBattleStrategy, SmarterBattleStrategy
 from utilities.utilities import capture_window, find
 import time
-import pyautogui
 
 class DeerBattleStrategy(IBattleStrategy):
     """The logic behind the AI for Deer based on custom strategy"""
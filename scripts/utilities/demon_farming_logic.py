@@ -3,7 +3,6 @@ from datetime import datetime
 from enum import Enum
 
 import numpy as np
-import pyautogui as pyautogui
 import utilities.vision_images as vio
 from utilities.coordinates import Coordinates
 from utilities.general_farmer_interface import (
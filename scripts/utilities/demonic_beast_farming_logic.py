@@ -1,9 +1,7 @@
 import abc
 import threading
-import time
 from enum import Enum
 
-import pyautogui as pyautogui
 import utilities.vision_images as vio
 from utilities.coordinates import Coordinates
 from utilities.general_farmer_interface import (
@@ -13,6 +11,8 @@ from utilities.general_farmer_interface import (
 )
 from utilities.general_farmer_interface import States as GlobalStates
 from utilities.logging_utils import LoggerWrapper
+from utilities.models import SceneClassifier, Scenes
+from utilities.tick_scheduler import TickScheduler
 from utilities.utilities import (
     capture_window,
     check_for_reconnect,
@@ -210,14 +210,16 @@ class DemonicBeastFarmer(IFarmer, abc.ABC):
 
         screenshot, window_location = capture_window()
 
-        # Skip the Demonic Beast screen
-        find_and_click(vio.skip_bird, screenshot, window_location, threshold=0.6)
+        # None of these screens show up in the middle of the fight
+        if not SceneClassifier.is_scene(screenshot, Scenes.FIGHTING):
+            # Skip the Demonic Beast screen
+            find_and_click(vio.skip_bird, screenshot, window_location, threshold=0.6)
 
-        # In case we see a 'Close' pop-up
-        find_and_click(vio.close, screenshot, window_location, threshold=0.8)
+            # In case we see a 'Close' pop-up
+            find_and_click(vio.close, screenshot, window_location, threshold=0.8)
 
-        # If first reward
-        find_and_click(vio.first_reward, screenshot, window_location)
+            # If first reward
+            find_and_click(vio.first_reward, screenshot, window_location)
 
         # Set the fight thread ONLY if we haven't changed the current state (due to a callback, for instance!)
         if (self.fight_thread is None or not self.fight_thread.is_alive()) and (
@@ -297,6 +299,14 @@ class DemonicBeastFarmer(IFarmer, abc.ABC):
 
     def run(self):
 
+        # Fast ticks while the screens change, slower ones while waiting on a static screen
+        tick_scheduler = TickScheduler(
+            min_interval=0.3,
+            max_interval=2,
+            # The fight and the dailies run in their own thread, which ends them with a callback the screen doesn't show
+            state_deadlines={States.FIGHTING_FLOOR: 0.5, GlobalStates.DAILIES_STATE: 0.5},
+        )
+
         while True:
 
             check_for_reconnect()
@@ -337,4 +347,4 @@ class DemonicBeastFarmer(IFarmer, abc.ABC):
             elif self.current_floor == States.EXIT_FARMER:
                 self.exit_farmer_state()
 
-            time.sleep(0.8)
+            tick_scheduler.wait(self.current_state)
@@ -1,5 +1,3 @@
-import pyautogui as pyautogui
-
 # Import all images
 import utilities.vision_images as vio
 from utilities.demonic_beast_farming_logic import DemonicBeastFarmer, States
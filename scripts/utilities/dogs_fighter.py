@@ -1,4 +1,3 @@
-import time
 from typing import Callable
 
 import cv2
@@ -8,6 +7,8 @@ from utilities.card_data import Card
 from utilities.coordinates import Coordinates
 from utilities.fighting_strategies import IBattleStrategy
 from utilities.general_fighter_interface import FightingStates, IFighter
+from utilities.pattern_match_strategies import BatchTemplateMatchingStrategy
+from utilities.tick_scheduler import TickScheduler
 from utilities.utilities import (
     capture_window,
     click_im,
@@ -70,15 +71,24 @@ class DogsFighter(IFighter):
     def count_empty_card_slots(screenshot, threshold=0.6, plot=False):
         """Count how many empty card slots are there for DOGS"""
         card_slot_image = get_card_slot_region_image(screenshot)
-        rectangles = []
+        empty_slot_visions: list[Vision] = []
         for i in range(1, 25):
             vio_image: Vision = getattr(vio, f"empty_slot_{i}", None)
             if vio_image is not None and vio_image.needle_img is not None:
-                temp_rectangles, _ = vio_image.find_all_rectangles(
-                    card_slot_image, threshold=threshold, method=cv2.TM_CCOEFF_NORMED
-                )
-                rectangles.extend(temp_rectangles)
-                rectangles.extend(temp_rectangles)
+                empty_slot_visions.append(vio_image)
+
+        # Match all the empty slot images in a single pass over the card slots region, scaled to the game window like
+        # any other needle. They all share the same color mode.
+        rectangles = []
+        for temp_rectangles, _ in BatchTemplateMatchingStrategy.find_all_rectangles(
+            vio.empty_slot_1.color_mode.convert(card_slot_image),
+            [vision.search_needle_img for vision in empty_slot_visions],
+            threshold=threshold,
+            cv_method=cv2.TM_CCOEFF_NORMED,
+            needle_statistics=[vision.needle_statistics for vision in empty_slot_visions],
+        ):
+            rectangles.extend(temp_rectangles)
+            rectangles.extend(temp_rectangles)
 
         # Group all rectangles
         grouped_rectangles, _ = cv2.groupRectangles(rectangles, groupThreshold=1, eps=0.5)
@@ -185,6 +195,9 @@ class DogsFighter(IFighter):
         print(f"Fighting very hard on floor {floor}...")
         DogsFighter.current_floor = floor
 
+        # Fast ticks while the fight moves on, slower ones while waiting on a static screen
+        tick_scheduler = TickScheduler(min_interval=0.3, max_interval=1.5)
+
         while True:
 
             if self.current_state == FightingStates.FIGHTING:
@@ -203,4 +216,4 @@ class DogsFighter(IFighter):
                 print("Closing Fighter thread!")
                 return
 
-            time.sleep(0.7)
+            tick_scheduler.wait(self.current_state)
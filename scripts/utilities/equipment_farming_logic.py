@@ -1,13 +1,13 @@
 from enum import Enum
 from time import sleep
 
-import pyautogui as pyautogui
 import utilities.vision_images as vio
 
 # Import all images
 from utilities.coordinates import Coordinates
 from utilities.general_farmer_interface import IFarmer
 from utilities.logging_utils import LoggerWrapper
+from utilities.tick_scheduler import TickScheduler
 from utilities.utilities import (
     capture_window,
     check_for_reconnect,
@@ -229,6 +229,9 @@ class EquipmentFarmer(IFarmer):
 
         print(f"Farming... starting from {self.current_state}")
 
+        # Fast ticks while the screens change, slower ones while waiting on a static screen
+        tick_scheduler = TickScheduler(min_interval=0.3, max_interval=2)
+
         while True:
             # Try to reconnect first
             check_for_reconnect()
@@ -254,5 +257,4 @@ class EquipmentFarmer(IFarmer):
             elif self.current_state == States.DAILY_RESET:
                 self.daily_reset_state()
 
-            # Run loop at 1 Hz, except when in the farming state
-            sleep(1)
+            tick_scheduler.wait(self.current_state)
@@ -1,6 +1,10 @@
 import sys
 
+from utilities.actuator import Actuator
 from utilities.fighting_strategies import IBattleStrategy
+from utilities.frame_bus import FrameBus
+from utilities.frame_recorder import RECORDINGS_DIR, FrameRecorder
+from utilities.frame_source import EndOfReplay
 from utilities.general_farmer_interface import IFarmer
 
 
@@ -13,8 +17,26 @@ class FarmingFactory:
     """
 
     @staticmethod
-    def main_loop(farmer: IFarmer, starting_state, battle_strategy: IBattleStrategy | None = None, **kwargs):
-        """Defined for any subclass of the interface IFarmer, and any subclass of the interface IBattleStrategy"""
+    def main_loop(
+        farmer: IFarmer,
+        starting_state,
+        battle_strategy: IBattleStrategy | None = None,
+        record_frames: bool = False,
+        recordings_dir: str = RECORDINGS_DIR,
+        max_recording_bytes: int = FrameRecorder.MAX_BYTES,
+        **kwargs,
+    ):
+        """Defined for any subclass of the interface IFarmer, and any subclass of the interface IBattleStrategy.
+        With `record_frames`, the latest frames are kept in `recordings_dir`, in at most `max_recording_bytes`.
+        """
+
+        if record_frames:
+            # Keep the latest frames on disk, to know what happened if something goes wrong
+            FrameRecorder.start(recordings_dir, max_recording_bytes)
+        # A single capture per tick, shared by the farmer, fighter and dailies threads
+        FrameBus.start()
+        # Clicks are performed in the background, while the next frames are analyzed
+        Actuator.start()
 
         while True:
             try:
@@ -25,12 +47,21 @@ class FarmingFactory:
                 )
                 farmer_instance.run()
 
+            except EndOfReplay as e:
+                # Not an error to recover from, the replay is over
+                print(e)
+                return
+
             except KeyboardInterrupt as e:
                 print("Exiting the program.")
                 sys.exit(0)
 
             except Exception as e:
                 print(f"An error occurred:\n{e}")
+                if record_frames:
+                    # Make sure the frames that led to the error are on disk
+                    FrameRecorder.flush()
+                    print(f"The latest frames are recorded in '{recordings_dir}', see 'recording_exporter.py'.")
                 # Recover the current state the bird farmer was in, and restart from there
                 starting_state = farmer_instance.current_state
 
@@ -8,6 +8,8 @@ import os
 
 import cv2
 import numpy as np
+from utilities.frame import Frame
+from utilities.frame_cache import FrameCache
 
 os.environ["LOKY_MAX_CPU_COUNT"] = "1"  # Replace '4' with the number of cores you want to use
 
@@ -69,9 +71,12 @@ def extract_color_histograms_features(
 
     histograms = []
 
+    # Only the threads capturing frames can get crops of them, e.g., not the training of the models
+    has_frames = FrameCache.get_latest_frame() is not None
+
     for image in images:
-        # Convert the image to HSV color space
-        hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        # Convert the image to HSV color space, only once per frame if it's a crop of a captured frame
+        hsv_image = Frame.of(image).hsv if has_frames else cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
 
         # Compute the histogram and normalize it
         hist = cv2.calcHist([hsv_image], [0, 1, 2], None, bins, [0, 180, 0, 256, 0, 256])
@@ -162,3 +167,33 @@ def extract_single_channel_features(images: np.ndarray, type="median") -> np.nda
     feature = feature_func(images, axis=(1, 2))
 
     return feature[..., np.newaxis]  # Add the feature dimension
+
+
+def extract_scene_features(images: list[np.ndarray] | np.ndarray, size: tuple[int, int] = (18, 32)) -> np.ndarray:
+    """Downsample entire screenshots into tiny color thumbnails, enough to tell the game screens apart.
+
+    Args:
+        images (np.ndarray): A list of BGR screenshots, or an array with 'batch' as the first dimension.
+        size (tuple): (width, height) of the thumbnails, keeping the aspect ratio of the game window.
+
+    Returns:
+        np.ndarray: A 2D array where each row is the flattened thumbnail of a screenshot, in [0, 1].
+    """
+
+    if isinstance(images, np.ndarray) and images.ndim == 3:
+        # It's a single image, let's make a batch off of it
+        images = images[np.newaxis, ...]
+
+    # Averaging the pixels of each thumbnail cell makes the features robust to small animations and text changes.
+    # Averaging entire screenshots is slow though, so average a linear downsampling of them instead (~10x faster)
+    width, height = size
+    thumbnails = [
+        cv2.resize(
+            cv2.resize(image, (4 * width, 4 * height), interpolation=cv2.INTER_LINEAR),
+            size,
+            interpolation=cv2.INTER_AREA,
+        )
+        for image in images
+    ]
+
+    return np.array(thumbnails, dtype=np.float32).reshape(len(thumbnails), -1) / 255
@@ -10,6 +10,7 @@ import utilities.vision_images as vio
 from utilities.battle_utilities import process_card_move, process_card_play
 from utilities.card_data import Card, CardTypes
 from utilities.logging_utils import LoggerWrapper
+from utilities.tracing import Tracer
 from utilities.utilities import (
     capture_window,
     determine_card_merge,
@@ -30,6 +31,7 @@ class IBattleStrategy(abc.ABC):
     # In case the fighter dies!
     picked_cards = []
 
+    @Tracer.traced("IBattleStrategy.pick_cards")
     def pick_cards(self, cards_to_play=4, **kwargs) -> tuple[list[Card], list[int]]:
         """**kwargs just for compatibility across classes and subclasses. Probably not the best coding..."""
 
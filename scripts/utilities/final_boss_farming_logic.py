@@ -2,19 +2,19 @@ import sys
 import time
 from enum import Enum
 
-import pyautogui as pyautogui
-
 # Import all images
 import utilities.vision_images as vio
 from utilities.coordinates import Coordinates
 from utilities.fighting_strategies import IBattleStrategy
 from utilities.general_farmer_interface import IFarmer
+from utilities.tick_scheduler import TickScheduler
 from utilities.utilities import (
     capture_window,
     check_for_reconnect,
     drag_im,
     find,
     find_and_click,
+    find_first,
 )
 
 
@@ -138,46 +138,57 @@ class FinalBossFarmer(IFarmer):
 
         screenshot, window_location = capture_window()
 
-        # If we've ended the fight...
-        find_and_click(vio.boss_destroyed, screenshot, window_location, threshold=0.6)
-        find_and_click(vio.episode_clear, screenshot, window_location)
-        find_and_click(vio.boss_results, screenshot, window_location)
-        find_and_click(vio.boss_mission, screenshot, window_location)
-        if find_and_click(
-            vio.showdown, screenshot, window_location, point_coordinates=Coordinates.get_coordinates("showdown")
-        ):
-            FinalBossFarmer.num_fights += 1
-            print(f"FB cleared! {FinalBossFarmer.num_fights} times so far.")
-
-            # Now, exit the fight if we've reached the desired number of runs
-            if FinalBossFarmer.num_fights >= self.max_num_runs:
-                print("Reached the desired number of runs, exiting the farmer...")
-                self.current_state = States.EXIT_FARMER
-                return
-
-        # We may need to restore stamina
-        if find_and_click(vio.restore_stamina, screenshot, window_location):
-            IFarmer.stamina_pots += 1
+        # These screens show up one at a time, so act on the first one found, following the order of the fight
+        screens = [
+            (vio.boss_destroyed, 0.6),
+            (vio.episode_clear, 0.7),
+            (vio.boss_results, 0.7),
+            (vio.boss_mission, 0.7),
+            (vio.showdown, 0.7),
+            # We may need to restore stamina
+            (vio.restore_stamina, 0.7),
+            (vio.again, 0.7),
+            # Skip to the fight
+            (vio.skip_bird, 0.6),
+            # Ensure AUTO is on
+            (vio.fb_aut_off, 0.9),
+            (vio.failed, 0.7),
+        ]
+        found_index, _ = find_first(screens, screenshot)
+        if found_index is None:
             return
+        found_vision, threshold = screens[found_index]
 
-        # Click 'again'
-        if find_and_click(vio.again, screenshot, window_location):
+        if found_vision is vio.failed:
+            print("Oh no, we have lost :( Retrying...")
+            self.current_state = States.IN_FINAL_BOSS_MENU
             return
 
-        # Skip to the fight
-        find_and_click(vio.skip_bird, screenshot, window_location, threshold=0.6)
-
-        # Ensure AUTO is on
-        find_and_click(vio.fb_aut_off, screenshot, window_location, threshold=0.9)
+        if found_vision is vio.showdown:
+            if find_and_click(
+                vio.showdown, screenshot, window_location, point_coordinates=Coordinates.get_coordinates("showdown")
+            ):
+                FinalBossFarmer.num_fights += 1
+                print(f"FB cleared! {FinalBossFarmer.num_fights} times so far.")
+
+                # Now, exit the fight if we've reached the desired number of runs
+                if FinalBossFarmer.num_fights >= self.max_num_runs:
+                    print("Reached the desired number of runs, exiting the farmer...")
+                    self.current_state = States.EXIT_FARMER
+            return
 
-        if find(vio.failed, screenshot):
-            print("Oh no, we have lost :( Retrying...")
-            self.current_state = States.IN_FINAL_BOSS_MENU
+        # The match is already cached for this screenshot, clicking on it doesn't search for it again
+        if find_and_click(found_vision, screenshot, window_location, threshold=threshold):
+            if found_vision is vio.restore_stamina:
+                IFarmer.stamina_pots += 1
 
     def run(self):
 
         print(f"Farming {self.difficulty} Final Boss, starting from state {self.current_state}.")
 
+        # Fast ticks while the screens change, slower ones while waiting on a static screen
+        tick_scheduler = TickScheduler(min_interval=0.3, max_interval=2)
+
         while True:
 
             check_for_reconnect()
@@ -197,4 +208,4 @@ class FinalBossFarmer(IFarmer):
             elif self.current_state == States.EXIT_FARMER:
                 self.exit_farmer_state()
 
-            time.sleep(0.8)
+            tick_scheduler.wait(self.current_state)
@@ -5,7 +5,6 @@ import time
 from collections import defaultdict
 from enum import Enum
 
-import pyautogui as pyautogui
 import tqdm
 
 # Import all images
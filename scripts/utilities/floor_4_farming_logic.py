@@ -1,12 +1,9 @@
 import os
 import threading
-import time
 from collections import defaultdict
 from datetime import datetime
 from enum import Enum
 
-import pyautogui as pyautogui
-
 # Import all images
 import utilities.vision_images as vio
 from utilities.coordinates import Coordinates
@@ -19,6 +16,8 @@ from utilities.general_farmer_interface import (
 )
 from utilities.general_farmer_interface import States as GlobalStates
 from utilities.logging_utils import LoggerWrapper
+from utilities.models import SceneClassifier, Scenes
+from utilities.tick_scheduler import TickScheduler
 from utilities.utilities import (
     capture_window,
     check_for_reconnect,
@@ -178,7 +177,9 @@ class IFloor4Farmer(IFarmer):
 
         screenshot, window_location = capture_window()
 
-        find_and_click(vio.skip_bird, screenshot, window_location)
+        # The skip button doesn't show up in the middle of the fight
+        if not SceneClassifier.is_scene(screenshot, Scenes.FIGHTING):
+            find_and_click(vio.skip_bird, screenshot, window_location)
 
         # Set the fighter thread
         if (self.fight_thread is None or not self.fight_thread.is_alive()) and self.current_state == States.FIGHTING:
@@ -228,6 +229,14 @@ class IFloor4Farmer(IFarmer):
 
         print(f"Fighting Floor 4 hard, starting in state {self.current_state}.")
 
+        # Fast ticks while the screens change, slower ones while waiting on a static screen
+        tick_scheduler = TickScheduler(
+            min_interval=0.3,
+            max_interval=2,
+            # The fight and the dailies run in their own thread, which ends them with a callback the screen doesn't show
+            state_deadlines={States.FIGHTING: 0.5, GlobalStates.DAILIES_STATE: 0.5},
+        )
+
         while True:
 
             check_for_reconnect()
@@ -265,4 +274,4 @@ class IFloor4Farmer(IFarmer):
             elif self.current_state == States.EXIT_FARMER:
                 self.exit_farmer_state()
 
-            time.sleep(0.8)
+            tick_scheduler.wait(self.current_state)
@@ -0,0 +1,142 @@
+"""A captured frame, keeping the raw buffer it was captured into and converting it lazily.
+
+The live capture gets a BGRA buffer from the GDI. Instead of copying it into a BGR image right away, `Frame` keeps it as
+is and materializes the BGR, gray and HSV versions of the frame the first time they're needed, each one at most once per
+frame. Crops of a frame are frames themselves, made of views of the converted versions of their parent when available,
+so that cropping never copies anything, and converting a crop never converts more than the crop.
+
+`Frame.of` finds the frame an image belongs to, e.g., the frame of a screenshot returned by `capture_window`, or the
+frame of a card cropped from it, so that any code getting an image can share the conversions of its frame.
+"""
+
+import functools
+
+import cv2
+import numpy as np
+from utilities.clock import Clock
+from utilities.coordinates import Coordinates
+from utilities.frame_cache import FrameCache
+
+
+class Frame:
+    """A BGR or BGRA image, with its conversions to other color spaces cached"""
+
+    def __init__(self, raw_image: np.ndarray, parent: "Frame | None" = None, offset: tuple[int, int] = (0, 0)):
+        """`raw_image` is kept as is, without copying it. Crops also get their parent frame and their (x,y) offset in
+        it, to reuse its conversions.
+        """
+        self.raw_image = raw_image
+        self.parent = parent
+        self.offset = offset
+        # Frames are created as soon as they're captured, crops share the capture time of their frame
+        self.capture_time = parent.capture_time if parent is not None else Clock.now()
+        self._crops: dict[tuple[int, int, int, int], Frame] = {}
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """Height and width of the frame"""
+        return self.raw_image.shape[:2]
+
+    @functools.cached_property
+    def bgr(self) -> np.ndarray:
+        """The frame as a BGR image, only contiguous if it's not a crop"""
+        if (parent_bgr := self._parent_view("bgr")) is not None:
+            return parent_bgr
+        if self.raw_image.ndim == 3 and self.raw_image.shape[2] == 4:
+            # Much faster than slicing the channels and copying them
+            return self._as_shared(cv2.cvtColor(self.raw_image, cv2.COLOR_BGRA2BGR))
+        return self.raw_image
+
+    @functools.cached_property
+    def gray(self) -> np.ndarray:
+        """The frame in grayscale, straight from the raw buffer"""
+        if (parent_gray := self._parent_view("gray")) is not None:
+            return parent_gray
+        if self.raw_image.ndim == 2:
+            return self.raw_image
+        code = cv2.COLOR_BGRA2GRAY if self.raw_image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        return self._as_shared(cv2.cvtColor(self.raw_image, code))
+
+    @functools.cached_property
+    def hsv(self) -> np.ndarray:
+        """The frame in the HSV color space"""
+        if (parent_hsv := self._parent_view("hsv")) is not None:
+            return parent_hsv
+        return self._as_shared(cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV))
+
+    def crop(self, top_left: tuple[int, int], bottom_right: tuple[int, int]) -> "Frame":
+        """The frame of the given crop, created once per crop"""
+        (x1, y1), (x2, y2) = top_left, bottom_right
+        # Same clipping as NumPy slicing
+        height, width = self.shape
+        x1, x2 = (min(max(x, 0), width) for x in (x1, x2))
+        y1, y2 = (min(max(y, 0), height) for y in (y1, y2))
+        key = (x1, y1, x2, y2)
+        if key not in self._crops:
+            self._crops[key] = Frame(self.raw_image[y1:y2, x1:x2], parent=self, offset=(x1, y1))
+        return self._crops[key]
+
+    def region(self, region_name: str) -> "Frame":
+        """The frame of a named region, see `Coordinates.get_region`"""
+        return self.crop(*Coordinates.get_region(region_name))
+
+    def _parent_view(self, attribute: str) -> np.ndarray | None:
+        """A crop of the given conversion of the parent frame, if the parent has it already"""
+        if self.parent is None or attribute not in self.parent.__dict__:
+            return None
+        (x, y), (height, width) = self.offset, self.shape
+        return getattr(self.parent, attribute)[y : y + height, x : x + width]
+
+    def _as_shared(self, image: np.ndarray) -> np.ndarray:
+        """Conversions of a read-only frame (e.g., shared by all the threads) are read-only too"""
+        if not self.raw_image.flags.writeable:
+            image.flags.writeable = False
+        return image
+
+    @staticmethod
+    def register(frame: "Frame") -> np.ndarray:
+        """Register a newly captured frame in the `FrameCache`, returning its BGR image for `Frame.of` to find it.
+        Only meant for the consumers asking for the BGR image, since it's materialized here.
+        """
+        image = frame.bgr
+        FrameCache.new_frame(image)
+        FrameCache.get_or_compute(image, ("frame",), lambda: frame)
+        return image
+
+    @staticmethod
+    def of(image: np.ndarray) -> "Frame":
+        """The frame of a BGR image: the registered frame it is, or a crop of it if the image is a view into it.
+        Images that don't belong to any registered frame get a new frame, with nothing shared.
+        """
+        if FrameCache.is_frame(image):
+            return FrameCache.get_or_compute(image, ("frame",), lambda: Frame(image))
+
+        for frame_image in FrameCache.get_frames():
+            if (offset := Frame._get_view_offset(image, frame_image)) is not None:
+                (x, y), (height, width) = offset, image.shape[:2]
+                frame = FrameCache.get_or_compute(frame_image, ("frame",), lambda: Frame(frame_image))
+                return frame.crop((x, y), (x + width, y + height))
+
+        return Frame(image)
+
+    @staticmethod
+    def _get_view_offset(image: np.ndarray, frame_image: np.ndarray) -> tuple[int, int] | None:
+        """The (x,y) offset of `image` in `frame_image` if it's a 2D crop of it, `None` otherwise"""
+        if (
+            image.ndim != frame_image.ndim
+            or image.strides != frame_image.strides
+            or image.shape[2:] != frame_image.shape[2:]
+            or image.dtype != frame_image.dtype
+            or not image.size
+        ):
+            return None
+
+        start = image.__array_interface__["data"][0] - frame_image.__array_interface__["data"][0]
+        if not 0 <= start < frame_image.nbytes:
+            return None
+
+        y, remainder = divmod(start, frame_image.strides[0])
+        x, remainder = divmod(remainder, frame_image.strides[1])
+        if remainder or y + image.shape[0] > frame_image.shape[0] or x + image.shape[1] > frame_image.shape[1]:
+            return None
+        return x, y
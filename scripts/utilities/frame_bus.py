@@ -0,0 +1,146 @@
+"""Single capture of the 7DS window shared by the farmer, fighter and dailies threads.
+
+Once started, a capture thread owns the `FrameSource` and publishes the latest frame with a sequence number. Every
+`capture_window` call of any thread reads that shared frame, and a new one is only captured when the latest is older
+than `max_age`. The threads thus capture far less often, and all the decisions made within a tick see the same screen.
+Published frames are read-only, since they're shared by all the threads.
+"""
+
+import threading
+from dataclasses import dataclass
+
+from utilities.clock import Clock
+from utilities.frame import Frame
+from utilities.frame_recorder import FrameRecorder
+from utilities.frame_source import FrameSource
+
+
+@dataclass(frozen=True)
+class PublishedFrame:
+    frame: Frame
+    window_location: list[int]
+    # Increases by one with every capture, failed captures use up a number too
+    sequence_number: int
+    # When the capture started, the frame shows the screen from then on
+    capture_time: float
+
+
+class FrameBus:
+    """Namespace-like class that shares the latest captured frame among all the threads, once started"""
+
+    # Frames are reused for this long (in seconds), a farmer tick easily fits in it
+    MAX_AGE = 0.15
+
+    _condition = threading.Condition()
+    _thread: threading.Thread | None = None
+    _latest: PublishedFrame | None = None
+    # A consumer is waiting for a new frame
+    _requested = False
+    # Sequence number of the next capture to complete, and the latest failed capture with its sequence number
+    _next_sequence_number = 0
+    _error: tuple[int, BaseException] | None = None
+
+    # Counters, to know how many captures we're saving
+    captures = 0
+    reads = 0
+
+    @staticmethod
+    def start():
+        """Start the capture thread, if not started already"""
+        with FrameBus._condition:
+            if FrameBus._thread is not None:
+                return
+            FrameBus._thread = threading.Thread(target=FrameBus._capture_frames, name="frame_bus", daemon=True)
+            FrameBus._thread.start()
+
+    @staticmethod
+    def stop():
+        """Stop the capture thread, `capture_window` captures by itself again"""
+        with FrameBus._condition:
+            thread = FrameBus._thread
+            FrameBus._thread = None
+            FrameBus._latest = None
+            FrameBus._condition.notify_all()
+        if thread is not None:
+            thread.join()
+
+    @staticmethod
+    def is_running() -> bool:
+        return FrameBus._thread is not None
+
+    @staticmethod
+    def get_frame(max_age: float = MAX_AGE, captured_after: float = 0.0) -> PublishedFrame:
+        """The latest frame, waiting for a new capture if it's older than `max_age` seconds, or if it was captured
+        before `captured_after` (e.g., before the game reacted to the latest click)
+        """
+        with FrameBus._condition:
+            FrameBus.reads += 1
+            while True:
+                latest = FrameBus._latest
+                if (
+                    latest is not None
+                    and Clock.now() - latest.capture_time <= max_age
+                    and latest.capture_time >= captured_after
+                ):
+                    return latest
+
+                # Wait for the next capture, whatever thread asked for it first
+                next_sequence_number = FrameBus._next_sequence_number
+                FrameBus._requested = True
+                FrameBus._condition.notify_all()
+                while FrameBus._next_sequence_number <= next_sequence_number:
+                    if FrameBus._thread is None:
+                        raise RuntimeError("The frame bus has been stopped.")
+                    FrameBus._condition.wait()
+
+                # A capture already started when we asked for the next frame may still predate `captured_after`
+                latest = FrameBus._latest
+                if (
+                    latest is not None
+                    and latest.sequence_number >= next_sequence_number
+                    and latest.capture_time >= captured_after
+                ):
+                    return latest
+                # Only the captures we waited for can fail on us, not the ones that failed on previous readers
+                if FrameBus._error is not None and FrameBus._error[0] >= next_sequence_number:
+                    raise FrameBus._error[1]
+
+    @staticmethod
+    def stats() -> str:
+        """Summary of the captures and reads"""
+        return f"Frame bus: {FrameBus.captures} captures for {FrameBus.reads} reads."
+
+    @staticmethod
+    def _capture_frames():
+        """Body of the capture thread, capturing frames on demand only"""
+        while True:
+            with FrameBus._condition:
+                while not FrameBus._requested and FrameBus._thread is threading.current_thread():
+                    FrameBus._condition.wait()
+                if FrameBus._thread is not threading.current_thread():
+                    return
+                FrameBus._requested = False
+
+            try:
+                capture_time = Clock.now()
+                frame, window_location = FrameSource.get_active().capture()
+                error = None
+            except BaseException as e:
+                # Raised in the threads waiting for the frame, as if they had captured it themselves (e.g., the
+                # `EndOfReplay` of a replay)
+                error = e
+
+            with FrameBus._condition:
+                sequence_number = FrameBus._next_sequence_number
+                if error is None:
+                    # Shared by all the threads, nobody can modify it (nor its conversions, see `Frame`)
+                    frame.raw_image.flags.writeable = False
+                    FrameBus._latest = PublishedFrame(frame, window_location, sequence_number, capture_time)
+                    FrameBus.captures += 1
+                else:
+                    FrameBus._error = (sequence_number, error)
+                FrameBus._next_sequence_number += 1
+                FrameBus._condition.notify_all()
+
+            if error is None:
+                FrameRecorder.record(frame, window_location)
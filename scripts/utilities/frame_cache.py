@@ -0,0 +1,101 @@
+"""Frame-scoped memoization of the vision work done on a screenshot.
+
+Every screenshot returned by `capture_window` is registered here as the latest frame of the thread that captured it.
+Results computed on that exact screenshot (e.g., pattern matches) are cached until the thread captures a new frame,
+so that looking for the same needle more than once on the same screenshot only costs a dictionary lookup.
+Images that are not registered frames (crops, card images...) are never cached. Threads reading the same frame (see
+`FrameBus`) share its cached results.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+import numpy as np
+
+
+class FrameCache:
+    """Namespace-like class that keeps the cached results of the latest frame of each thread"""
+
+    # Farmer, fighter and dailies threads capture their own frames, and fighter threads come and go
+    MAX_FRAMES = 4
+
+    _lock = threading.Lock()
+    # Thread ID -> (frame, cached results). The frame reference keeps its `id()` from being reused
+    _frames: OrderedDict[int, tuple[np.ndarray, dict[Hashable, Any]]] = OrderedDict()
+
+    # Counters, to know how much work we're saving
+    hits = 0
+    misses = 0
+
+    @staticmethod
+    def new_frame(frame: np.ndarray):
+        """Register a newly captured frame, invalidating the previous frame of the current thread"""
+        thread_id = threading.get_ident()
+        with FrameCache._lock:
+            # Another thread may have registered the same frame already
+            cached_results = FrameCache._get_cached_results(frame)
+            FrameCache._frames[thread_id] = (frame, cached_results if cached_results is not None else {})
+            FrameCache._frames.move_to_end(thread_id)
+            while len(FrameCache._frames) > FrameCache.MAX_FRAMES:
+                FrameCache._frames.popitem(last=False)
+
+    @staticmethod
+    def get_or_compute(frame: np.ndarray, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached result of `key` for the given frame, computing it if needed.
+        If `frame` is not a registered frame, simply return `compute()`.
+        """
+        with FrameCache._lock:
+            cached_results = FrameCache._get_cached_results(frame)
+            if cached_results is not None and key in cached_results:
+                FrameCache.hits += 1
+                return cached_results[key]
+
+        result = compute()
+
+        if cached_results is not None:
+            with FrameCache._lock:
+                FrameCache.misses += 1
+                cached_results[key] = result
+
+        return result
+
+    @staticmethod
+    def is_frame(image: np.ndarray) -> bool:
+        """Whether the image is a registered frame, i.e., whether anything computed on it can be cached"""
+        with FrameCache._lock:
+            return FrameCache._get_cached_results(image) is not None
+
+    @staticmethod
+    def get_latest_frame() -> np.ndarray | None:
+        """The latest frame captured by the current thread, if any"""
+        with FrameCache._lock:
+            frame_and_results = FrameCache._frames.get(threading.get_ident())
+            return frame_and_results[0] if frame_and_results is not None else None
+
+    @staticmethod
+    def get_frames() -> list[np.ndarray]:
+        """All the registered frames, latest first"""
+        with FrameCache._lock:
+            return [frame for frame, _ in reversed(FrameCache._frames.values())]
+
+    @staticmethod
+    def _get_cached_results(frame: np.ndarray) -> dict[Hashable, Any] | None:
+        """Find the results dictionary of a registered frame. Needs to be called with the lock acquired."""
+        return next(
+            (cached_results for cached_frame, cached_results in FrameCache._frames.values() if cached_frame is frame),
+            None,
+        )
+
+    @staticmethod
+    def clear():
+        """Forget all the registered frames"""
+        with FrameCache._lock:
+            FrameCache._frames.clear()
+
+    @staticmethod
+    def stats() -> str:
+        """Summary of the cache hits and misses"""
+        total = FrameCache.hits + FrameCache.misses
+        hit_rate = 100 * FrameCache.hits / total if total else 0
+        return f"Frame cache: {FrameCache.hits} hits, {FrameCache.misses} misses ({hit_rate:.1f}% hit rate)."
@@ -0,0 +1,133 @@
+"""Cheap detection of what changed between two captured frames, to skip vision work on static screens.
+
+Each frame is summarized by a small color thumbnail, one pixel per `TILE_SIZE`x`TILE_SIZE` tile of the frame. A tile
+changed if the mean level of any of its color channels moved by more than `THRESHOLD`, so that hue-only changes count
+too. Computing the thumbnail and comparing two of them takes a fraction of a millisecond, way less than a single template
+match.
+
+The `Vision` instances created with `reuse_unchanged=True` rely on it to reuse the result of a search on a later frame
+when nothing changed in the searched region since the search was done, so that loops waiting on a static screen (loading
+screens, demon waits...) barely do any work. Changes smaller than a tile can go unnoticed, so it's only meant for
+needles whose appearance changes a large part of the screen.
+"""
+
+import math
+import threading
+from typing import Any, Callable, Hashable
+
+import cv2
+import numpy as np
+from utilities.frame_cache import FrameCache
+
+
+class FrameChangeDetector:
+    """Namespace-like class to compare frames tile by tile"""
+
+    TILE_SIZE = 8
+    # In color levels, a full-contrast pixel changing in a tile is enough to exceed it
+    THRESHOLD = 2
+
+    _lock = threading.Lock()
+    # Cache key -> (thumbnail of the searched region when the result was computed, result)
+    _results: dict[Hashable, tuple[np.ndarray, Any]] = {}
+
+    # Counters, to know how much work we're skipping
+    reused = 0
+    computed = 0
+
+    @staticmethod
+    def get_thumbnail(image: np.ndarray) -> np.ndarray:
+        """Mean level of every color channel of every tile of the image, computed once per captured frame"""
+
+        def compute_thumbnail() -> np.ndarray:
+            tile_size = FrameChangeDetector.TILE_SIZE
+            height, width = image.shape[:2]
+            # Pad the frame to whole tiles, so that every tile maps exactly to a pixel of the thumbnail
+            tiles_y, tiles_x = math.ceil(height / tile_size), math.ceil(width / tile_size)
+            padded_img = cv2.copyMakeBorder(
+                image,
+                0,
+                tiles_y * tile_size - height,
+                0,
+                tiles_x * tile_size - width,
+                cv2.BORDER_REPLICATE,
+            )
+            thumbnail = cv2.resize(padded_img, (tiles_x, tiles_y), interpolation=cv2.INTER_AREA)
+            # Raw BGRA captures get the same thumbnail as their BGR image
+            return thumbnail.astype(np.int16).reshape(tiles_y, tiles_x, -1)[..., :3]
+
+        return FrameCache.get_or_compute(image, ("thumbnail",), compute_thumbnail)
+
+    @staticmethod
+    def changed_tiles(image: np.ndarray, previous_image: np.ndarray) -> np.ndarray:
+        """Boolean map of the tiles that changed between both frames. All of them changed if the sizes differ."""
+        thumbnail = FrameChangeDetector.get_thumbnail(image)
+        previous_thumbnail = FrameChangeDetector.get_thumbnail(previous_image)
+        if thumbnail.shape != previous_thumbnail.shape:
+            return np.ones(thumbnail.shape[:2], dtype=bool)
+        return FrameChangeDetector._changed_tiles(thumbnail, previous_thumbnail)
+
+    @staticmethod
+    def has_changed(
+        image: np.ndarray, previous_image: np.ndarray, rectangle: tuple[int, int, int, int] | None = None
+    ) -> bool:
+        """Whether anything changed between both frames, only within the (x,y,w,h) `rectangle` if given"""
+        changed_tiles = FrameChangeDetector.changed_tiles(image, previous_image)
+        if rectangle is not None:
+            changed_tiles = changed_tiles[FrameChangeDetector._get_tile_slices(rectangle)]
+        return bool(changed_tiles.any())
+
+    @staticmethod
+    def reuse_if_unchanged(
+        image: np.ndarray, key: Hashable, rectangle: tuple[int, int, int, int] | None, compute: Callable[[], Any]
+    ) -> Any:
+        """Return the result of `compute` on `image`, or its latest result on a previous frame if nothing changed within
+        the (x,y,w,h) `rectangle` (the whole frame if `None`) since then.
+        Only captured frames are compared, anything else is simply computed.
+        """
+        if not FrameCache.is_frame(image):
+            return compute()
+
+        thumbnail = FrameChangeDetector.get_thumbnail(image)
+        if rectangle is not None:
+            thumbnail = thumbnail[FrameChangeDetector._get_tile_slices(rectangle)]
+
+        with FrameChangeDetector._lock:
+            previous = FrameChangeDetector._results.get(key)
+        if (
+            previous is not None
+            and previous[0].shape == thumbnail.shape
+            and not FrameChangeDetector._changed_tiles(thumbnail, previous[0]).any()
+        ):
+            FrameChangeDetector.reused += 1
+            return previous[1]
+
+        result = compute()
+        FrameChangeDetector.computed += 1
+        with FrameChangeDetector._lock:
+            FrameChangeDetector._results[key] = (thumbnail, result)
+        return result
+
+    @staticmethod
+    def stats() -> str:
+        """Summary of the reused and computed results"""
+        total = FrameChangeDetector.reused + FrameChangeDetector.computed
+        reuse_rate = 100 * FrameChangeDetector.reused / total if total else 0
+        return (
+            f"Frame change detector: {FrameChangeDetector.reused} results reused on unchanged regions, "
+            f"{FrameChangeDetector.computed} computed ({reuse_rate:.1f}% reused)."
+        )
+
+    @staticmethod
+    def _changed_tiles(thumbnail: np.ndarray, previous_thumbnail: np.ndarray) -> np.ndarray:
+        """Tiles where any channel moved by more than the threshold between both thumbnails of the same shape"""
+        return (np.abs(thumbnail - previous_thumbnail) > FrameChangeDetector.THRESHOLD).any(axis=2)
+
+    @staticmethod
+    def _get_tile_slices(rectangle: tuple[int, int, int, int]) -> tuple[slice, slice]:
+        """The tiles covering the (x,y,w,h) rectangle, even partially"""
+        x, y, w, h = rectangle
+        tile_size = FrameChangeDetector.TILE_SIZE
+        return slice(y // tile_size, math.ceil((y + h) / tile_size)), slice(
+            x // tile_size, math.ceil((x + w) / tile_size)
+        )
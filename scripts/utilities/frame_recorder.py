@@ -0,0 +1,243 @@
+"""Black-box recorder of the captured frames, to know what the screen looked like when something went wrong.
+
+Recording is opt-in, see `record_frames` in `FarmingFactory.main_loop`. Once started, every frame captured by
+`capture_window` is handed over to a background thread, together with its timestamp, window location and the current
+state of the farmer, so that capturing never waits on compression or disk I/O. Frames are recorded as captured (e.g.,
+the BGRA buffer of the live capture), without converting nor copying them. If the recorder falls behind, frames are
+dropped instead.
+
+Frames are written to segment files in a ring buffer: when the recordings directory grows over its size cap, the oldest
+segments are deleted. Each segment starts with a keyframe, and the following frames only store their XOR difference
+with the previous frame, which is mostly zeros and compresses to almost nothing on the static screens of the game.
+
+Segment layout: a sequence of records, each one made of the length of its JSON metadata and of its payload (two
+little-endian uint32), the metadata (`time`, `window_location`, `state`, `thread`, `shape` and `keyframe`) and the
+zlib-compressed payload.
+"""
+
+import atexit
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Iterator
+
+import numpy as np
+from utilities.frame import Frame
+from utilities.frame_source import ReplayFrameSource
+
+RECORDINGS_DIR = "recordings"
+SEGMENT_EXTENSION = ".frames"
+
+
+class FrameRecorder:
+    """Namespace-like class that records the captured frames on a background thread, once started"""
+
+    # Default disk footprint of all the recordings, plenty for the latest minutes before something goes wrong
+    MAX_BYTES = 256 * 1024**2
+    # A new segment (and keyframe) every this many frames, which is also the granularity of the ring buffer
+    KEYFRAME_INTERVAL = 500
+    # Frames waiting to be written, at ~2MB each
+    QUEUE_SIZE = 32
+    # Fast compression, the deltas are mostly zeros anyway
+    COMPRESSION_LEVEL = 1
+
+    _lock = threading.Lock()
+    _queue: queue.Queue | None = None
+    _thread: threading.Thread | None = None
+
+    # Latest state set by the farmer, recorded along with every frame
+    current_state: str | None = None
+    # Counters, to know whether the recorder keeps up
+    recorded_frames = 0
+    dropped_frames = 0
+
+    @staticmethod
+    def start(recordings_dir: str = RECORDINGS_DIR, max_bytes: int = MAX_BYTES):
+        """Start recording the captured frames into the given directory, if not recording already"""
+        with FrameRecorder._lock:
+            if FrameRecorder._thread is not None:
+                return
+
+            os.makedirs(recordings_dir, exist_ok=True)
+            FrameRecorder._queue = queue.Queue(maxsize=FrameRecorder.QUEUE_SIZE)
+            FrameRecorder._thread = threading.Thread(
+                target=FrameRecorder._write_frames,
+                args=(FrameRecorder._queue, recordings_dir, max_bytes),
+                name="frame_recorder",
+                daemon=True,
+            )
+            FrameRecorder._thread.start()
+
+        # Don't lose the latest frames when the program exits
+        atexit.register(FrameRecorder.stop)
+
+    @staticmethod
+    def record(frame: Frame, window_location: list[int]):
+        """Queue a captured frame to be written, without ever blocking. Does nothing if the recorder isn't started."""
+        frame_queue = FrameRecorder._queue
+        if frame_queue is None:
+            return
+
+        metadata = {
+            "time": time.time(),
+            "window_location": [int(coordinate) for coordinate in window_location],
+            "state": FrameRecorder.current_state,
+            "thread": threading.current_thread().name,
+        }
+        try:
+            # Frames are never modified after being captured, no need to copy them
+            frame_queue.put_nowait((frame.raw_image, metadata))
+        except queue.Full:
+            FrameRecorder.dropped_frames += 1
+
+    @staticmethod
+    def set_state(state: Any):
+        """Set the state recorded along with the next frames"""
+        FrameRecorder.current_state = getattr(state, "name", None) or str(state)
+
+    @staticmethod
+    def flush():
+        """Wait until all the queued frames are written to disk, e.g., right after a crash"""
+        frame_queue = FrameRecorder._queue
+        if frame_queue is not None:
+            frame_queue.join()
+
+    @staticmethod
+    def stop():
+        """Write the queued frames and stop recording"""
+        with FrameRecorder._lock:
+            frame_queue, thread = FrameRecorder._queue, FrameRecorder._thread
+            FrameRecorder._queue = FrameRecorder._thread = None
+
+        if thread is not None:
+            # Blocking put, the sentinel must not be dropped
+            frame_queue.put(None)
+            thread.join()
+
+    @staticmethod
+    def stats() -> str:
+        """Summary of the recorded and dropped frames"""
+        return (
+            f"Frame recorder: {FrameRecorder.recorded_frames} frames recorded, {FrameRecorder.dropped_frames} dropped."
+        )
+
+    @staticmethod
+    def read_frames(recordings_dir: str = RECORDINGS_DIR) -> Iterator[tuple[np.ndarray, dict]]:
+        """Decode all the recorded frames as BGR images, oldest first, with their metadata.
+        A truncated record at the end of a segment (e.g., if the program got killed) is ignored.
+        """
+        for segment_path in FrameRecorder._list_segments(recordings_dir):
+            previous_frame = None
+            with open(segment_path, "rb") as segment_file:
+                while len(lengths := segment_file.read(8)) == 8:
+                    metadata_length, payload_length = struct.unpack("<II", lengths)
+                    metadata_bytes = segment_file.read(metadata_length)
+                    payload = segment_file.read(payload_length)
+                    if len(metadata_bytes) < metadata_length or len(payload) < payload_length:
+                        break
+
+                    metadata = json.loads(metadata_bytes)
+                    frame = np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(metadata["shape"])
+                    if not metadata["keyframe"]:
+                        frame = np.bitwise_xor(frame, previous_frame)
+                    previous_frame = frame
+                    yield Frame(frame).bgr, metadata
+
+    @staticmethod
+    def export(recording_path: str, recordings_dir: str = RECORDINGS_DIR) -> int:
+        """Export the recorded frames as a recording that `ReplayFrameSource` can replay.
+        Returns the number of frames exported.
+        """
+        return ReplayFrameSource.write_recording(
+            recording_path,
+            (
+                (frame, metadata["window_location"], metadata["time"])
+                for frame, metadata in FrameRecorder.read_frames(recordings_dir)
+            ),
+        )
+
+    @staticmethod
+    def _write_frames(frame_queue: queue.Queue, recordings_dir: str, max_bytes: int):
+        """Body of the recorder thread"""
+        segment_file = None
+        segment_frames = 0
+        previous_frame = None
+        try:
+            while (item := frame_queue.get()) is not None:
+                try:
+                    frame, metadata = item
+                    # Keyframes start the segments, and whenever the window size changes
+                    keyframe = (
+                        segment_file is None
+                        or segment_frames >= FrameRecorder.KEYFRAME_INTERVAL
+                        or previous_frame.shape != frame.shape
+                    )
+                    if keyframe:
+                        if segment_file is not None:
+                            segment_file.close()
+                        FrameRecorder._enforce_size_cap(recordings_dir, max_bytes)
+                        segment_file = FrameRecorder._open_segment(recordings_dir)
+                        segment_frames = 0
+
+                    data = frame if keyframe else np.bitwise_xor(frame, previous_frame)
+                    payload = zlib.compress(np.ascontiguousarray(data), FrameRecorder.COMPRESSION_LEVEL)
+                    metadata_bytes = json.dumps({**metadata, "shape": frame.shape, "keyframe": keyframe}).encode()
+
+                    segment_file.write(struct.pack("<II", len(metadata_bytes), len(payload)))
+                    segment_file.write(metadata_bytes)
+                    segment_file.write(payload)
+                    # Hand it over to the OS, so that it survives a crash of the program
+                    segment_file.flush()
+
+                    previous_frame = frame
+                    segment_frames += 1
+                    FrameRecorder.recorded_frames += 1
+                except Exception as e:
+                    # Recording must never take the farmer down, start over with a new segment
+                    print(f"Could not record a frame: {e}")
+                    if segment_file is not None:
+                        # A partial record at the end of the segment is ignored when reading it
+                        try:
+                            segment_file.close()
+                        except OSError:
+                            pass
+                    segment_file = None
+                finally:
+                    frame_queue.task_done()
+        finally:
+            if segment_file is not None:
+                segment_file.close()
+
+        # The sentinel
+        frame_queue.task_done()
+
+    @staticmethod
+    def _open_segment(recordings_dir: str):
+        """Segment names sort chronologically, across runs of the program too"""
+        return open(os.path.join(recordings_dir, f"{time.time_ns():020d}{SEGMENT_EXTENSION}"), "wb")
+
+    @staticmethod
+    def _enforce_size_cap(recordings_dir: str, max_bytes: int):
+        """Delete the oldest segments until the recordings fit in the given size"""
+        segment_paths = FrameRecorder._list_segments(recordings_dir)
+        total_bytes = sum(os.path.getsize(segment_path) for segment_path in segment_paths)
+        for segment_path in segment_paths:
+            if total_bytes <= max_bytes:
+                break
+            total_bytes -= os.path.getsize(segment_path)
+            os.remove(segment_path)
+
+    @staticmethod
+    def _list_segments(recordings_dir: str) -> list[str]:
+        """Paths of the segments, oldest first"""
+        if not os.path.isdir(recordings_dir):
+            return []
+        return [
+            os.path.join(recordings_dir, filename)
+            for filename in sorted(os.listdir(recordings_dir))
+            if filename.endswith(SEGMENT_EXTENSION)
+        ]
@@ -0,0 +1,244 @@
+"""Where the frames returned by `capture_window` come from.
+
+By default, frames are captured live from the 7DS window (`LiveFrameSource`). A `ReplayFrameSource` can be used instead
+to serve recorded frames, with their window locations, from a directory or a zip archive, so that the whole
+vision/decision stack can run offline (e.g., for benchmarks or regression tests) without a game client, see
+`recording_replayer.py`. The active frame source also gives the `Clock`, and receives the input of the `Actuator`: a
+replay runs on the recorded time, and never sends any input.
+
+Recording layout: an `index.json` file with a list of `frames`, each one with the `file` name of its PNG image
+(relative to the recording), the `time` at which it was captured (in seconds) and the `window_location` [x, y].
+"""
+
+import abc
+import json
+import os
+import threading
+import time
+import zipfile
+from typing import Any, Callable, Iterable
+
+import cv2
+import numpy as np
+from utilities.clock import Clock
+from utilities.frame import Frame
+
+INDEX_FILENAME = "index.json"
+
+
+class EndOfReplay(Exception):
+    """All the recorded frames have been served"""
+
+
+class FrameSource(abc.ABC):
+    """Anything that can provide the frames of the 7DS window"""
+
+    _lock = threading.Lock()
+    _active: "FrameSource | None" = None
+
+    @abc.abstractmethod
+    def capture(self) -> tuple[Frame, list[int]]:
+        """Return the next frame, and the top-left corner of the window as [x,y]"""
+
+    def clock(self) -> float:
+        """Current time of the frames, in seconds"""
+        return time.perf_counter()
+
+    def sleep(self, seconds: float):
+        """Wait for the given time to pass on the clock of the frames"""
+        time.sleep(seconds)
+
+    def send_input(self, action: Callable[[], Any]) -> Any:
+        """Send the mouse or keyboard input performed by the action to the game, returning the result of the action"""
+        return action()
+
+    @staticmethod
+    def get_active() -> "FrameSource":
+        """The frame source used by `capture_window`, live capture unless another one has been set"""
+        with FrameSource._lock:
+            if FrameSource._active is None:
+                FrameSource._active = LiveFrameSource()
+            return FrameSource._active
+
+    @staticmethod
+    def set_active(frame_source: "FrameSource | None"):
+        """Make `capture_window` use the given frame source, and its clock. `None` goes back to live capture."""
+        with FrameSource._lock:
+            FrameSource._active = frame_source
+            if frame_source is not None:
+                Clock.set(frame_source.clock, frame_source.sleep)
+            else:
+                Clock.set()
+
+
+class LiveFrameSource(FrameSource):
+    """Capture the 7DS window through the win32 GDI"""
+
+    def __init__(self, window_name: str = "7DS"):
+        self.window_name = window_name
+
+    def capture(self) -> tuple[Frame, list[int]]:
+        # Only imported when capturing live, so that replays work on any platform
+        import win32con
+        import win32gui
+        import win32ui
+
+        hwnd_target = win32gui.FindWindow(None, self.window_name)
+        window_rect = win32gui.GetWindowRect(hwnd_target)
+        w = window_rect[2] - window_rect[0]
+        h = window_rect[3] - window_rect[1]
+
+        # Remove border pixels -- TODO: Necessary?
+        border_pixels = 2
+        w = w - (border_pixels * 2)
+        h = h - 20
+
+        # Whatever this is?
+        hdesktop = win32gui.GetDesktopWindow()
+        hwndDC = win32gui.GetWindowDC(hdesktop)
+        mfcDC = win32ui.CreateDCFromHandle(hwndDC)
+        saveDC = mfcDC.CreateCompatibleDC()
+
+        saveBitMap = win32ui.CreateBitmap()
+        saveBitMap.CreateCompatibleBitmap(mfcDC, w, h)
+
+        saveDC.SelectObject(saveBitMap)
+        saveDC.BitBlt((0, 0), (w, h), mfcDC, (window_rect[0], window_rect[1]), win32con.SRCCOPY)
+
+        # bmpinfo = saveBitMap.GetInfo()
+        bmpstr = saveBitMap.GetBitmapBits(True)
+
+        # View the raw BGRA data as an image, without copying it
+        img = np.frombuffer(bmpstr, dtype="uint8")
+        # Reshape the array
+        img = img.reshape(h, w, 4)
+
+        # free resources
+        win32gui.DeleteObject(saveBitMap.GetHandle())
+        saveDC.DeleteDC()
+        mfcDC.DeleteDC()
+        win32gui.ReleaseDC(hdesktop, hwndDC)
+
+        # get updated window location
+        window_rect = win32gui.GetWindowRect(hwnd_target)
+        window_location = [window_rect[0], window_rect[1]]
+
+        # The BGR image is only materialized when needed
+        return Frame(img), window_location
+
+
+class ReplayFrameSource(FrameSource):
+    """Serve the frames of a recording, one per capture, in the recorded order.
+
+    Timing is deterministic: by default frames are served as fast as they're requested, and `clock()` is a virtual clock
+    starting at the recorded time of the first frame, which only moves forward with `sleep()` and with the recorded time
+    of the frames served. With `realtime=True`, captures wait so that the frames are served at the recorded pace (scaled
+    by `speed`), on the wall clock.
+    The input sent during the replay is skipped, the recorded frames already show how the game reacted to it.
+    """
+
+    def __init__(self, recording_path: str, realtime: bool = False, speed: float = 1.0, loop: bool = False):
+        self.recording_path = recording_path
+        self.realtime = realtime
+        self.speed = speed
+        self.loop = loop
+
+        self._archive = zipfile.ZipFile(recording_path) if zipfile.is_zipfile(recording_path) else None
+        self._frames: list[dict] = json.loads(self._read(INDEX_FILENAME))["frames"]
+        self._next_index = 0
+        self._last_time: float | None = None
+        self._last_capture_time: float | None = None
+        self._clock_lock = threading.Lock()
+        self._now = self._frames[0]["time"] if self._frames else 0.0
+
+        # Counter, to know how much input the farmers tried to send
+        self.skipped_inputs = 0
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def capture(self) -> tuple[Frame, list[int]]:
+        if self._next_index >= len(self._frames):
+            if not self.loop or not self._frames:
+                raise EndOfReplay(f"Replay of '{self.recording_path}' finished after {len(self._frames)} frames.")
+            self.seek(0)
+
+        frame = self._frames[self._next_index]
+        img = cv2.imdecode(np.frombuffer(self._read(frame["file"]), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+        if self.realtime and self._last_time is not None:
+            # Wait for the recorded interval between both frames, minus the time spent since the last capture
+            interval = max(0.0, frame["time"] - self._last_time) / self.speed
+            time.sleep(max(0.0, interval - (time.perf_counter() - self._last_capture_time)))
+
+        self._next_index += 1
+        self._last_time = frame["time"]
+        self._last_capture_time = time.perf_counter()
+        with self._clock_lock:
+            self._now = max(self._now, frame["time"])
+
+        return Frame(img), list(frame["window_location"])
+
+    def clock(self) -> float:
+        if self.realtime:
+            return super().clock()
+        with self._clock_lock:
+            return self._now
+
+    def sleep(self, seconds: float):
+        if self.realtime:
+            super().sleep(seconds)
+            return
+        with self._clock_lock:
+            self._now += seconds
+        # Still let the other threads run
+        time.sleep(0)
+
+    def send_input(self, action: Callable[[], Any]) -> Any:
+        self.skipped_inputs += 1
+
+    def seek(self, index: int):
+        """Serve the frame at the given index next"""
+        self._next_index = index
+        self._last_time = None
+
+    def _read(self, filename: str) -> bytes:
+        if self._archive is not None:
+            return self._archive.read(filename)
+        with open(os.path.join(self.recording_path, filename), "rb") as f:
+            return f.read()
+
+    @staticmethod
+    def write_recording(recording_path: str, frames: Iterable[tuple[np.ndarray, list[int], float]]) -> int:
+        """Write the (image, window location, capture time) frames as a recording that can be replayed.
+        It's written as a zip archive if the path ends with ".zip", as a directory otherwise.
+        Returns the number of frames written.
+        """
+        index = []
+        archive = zipfile.ZipFile(recording_path, "w") if recording_path.endswith(".zip") else None
+        if archive is None:
+            os.makedirs(recording_path, exist_ok=True)
+
+        try:
+            for i, (img, window_location, capture_time) in enumerate(frames):
+                filename = f"frame_{i:06d}.png"
+                encoded_img = cv2.imencode(".png", img)[1].tobytes()
+                if archive is not None:
+                    # PNG is already compressed
+                    archive.writestr(filename, encoded_img, compress_type=zipfile.ZIP_STORED)
+                else:
+                    with open(os.path.join(recording_path, filename), "wb") as f:
+                        f.write(encoded_img)
+                index.append({"file": filename, "time": capture_time, "window_location": list(window_location)})
+
+            encoded_index = json.dumps({"frames": index})
+            if archive is not None:
+                archive.writestr(INDEX_FILENAME, encoded_index, compress_type=zipfile.ZIP_DEFLATED)
+            else:
+                with open(os.path.join(recording_path, INDEX_FILENAME), "w") as f:
+                    f.write(encoded_index)
+        finally:
+            if archive is not None:
+                archive.close()
+
+        return len(index)
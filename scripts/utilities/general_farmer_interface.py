@@ -7,16 +7,25 @@ from enum import Enum
 
 import pytz
 import utilities.vision_images as vio
+from utilities.actuator import Actuator
 from utilities.capture_window import capture_window
+from utilities.card_cache import CardCache
 from utilities.coordinates import Coordinates
 from utilities.daily_farming_logic import DailyFarmer
 from utilities.daily_farming_logic import States as DailyFarmerStates
+from utilities.frame_bus import FrameBus
+from utilities.frame_cache import FrameCache
+from utilities.frame_change import FrameChangeDetector
+from utilities.frame_recorder import FrameRecorder
 from utilities.general_fighter_interface import IFighter
+from utilities.models import SceneClassifier, Scenes
+from utilities.tracing import Tracer
 from utilities.utilities import (
     click_and_sleep,
     drag_im,
     find,
     find_and_click,
+    find_first,
     press_key,
     type_word,
 )
@@ -43,7 +52,6 @@ class IFarmer:
     _lock = threading.Lock()
 
     # For type helping
-    current_state: int
     fighter: IFighter
     stamina_pots: int = 0
 
@@ -71,6 +79,18 @@ class IFarmer:
     # Whether we want to do dailies
     do_dailies: bool = False
 
+    @property
+    def current_state(self):
+        return self._current_state
+
+    @current_state.setter
+    def current_state(self, state):
+        self._current_state = state
+        # Recorded along with the captured frames
+        FrameRecorder.set_state(state)
+        # To know how long each state takes
+        Tracer.set_state(self, state)
+
     def stop_fighter_thread(self):
         """Send a STOP signal to the IFighter thread"""
         if hasattr(self, "fighter") and isinstance(self.fighter, IFighter):
@@ -80,6 +100,13 @@ class IFarmer:
     def exit_message(self):
         """Final message to display on the screen when CTRL+C happens"""
         print(f"We used {IFarmer.stamina_pots} stamina pots.")
+        print(FrameBus.stats())
+        print(Actuator.stats())
+        print(FrameCache.stats())
+        print(CardCache.stats())
+        print(FrameChangeDetector.stats())
+        print(FrameRecorder.stats())
+        print(Tracer.stats())
 
     def print_defeats(self):
         """Print on-screen the defeats"""
@@ -121,33 +148,48 @@ class IFarmer:
         # Flag to indicate if a successful login branch was detected
         login_attempted = False
 
-        if find(vio.tavern, screenshot):
+        # All these screens exclude each other, search for them at once in order of priority
+        login_screens = [
+            (vio.tavern, 0.7),
+            (vio.skip, 0.6),
+            (vio.fortune_card, 0.8),
+            (vio.yes, 0.7),
+            (vio.global_server, 0.7),
+            (vio.password, 0.7),
+        ]
+        found_index, _ = find_first(login_screens, screenshot)
+        found_vision = login_screens[found_index][0] if found_index is not None else None
+
+        if found_vision is vio.tavern:
             print("Logged in successfully! Going back to the previous state...")
             self.current_state = initial_state
             login_attempted = True
 
-        elif find(vio.skip, screenshot, threshold=0.6) or find(vio.fortune_card, screenshot, threshold=0.8):
+        elif found_vision is vio.skip or found_vision is vio.fortune_card:
             print("We're seeing a daily reset!")
             self.current_state = States.DAILY_RESET
             login_attempted = True
 
         # In case the game needs to update
-        elif find_and_click(vio.yes, screenshot, window_location):
-            print("Downloading update...")
-
-        elif find_and_click(
-            vio.global_server,
-            screenshot,
-            window_location,
-            point_coordinates=Coordinates.get_coordinates("center_screen"),
-        ):
-            print("Trying to log back in...")
+        elif found_vision is vio.yes:
+            if find_and_click(vio.yes, screenshot, window_location):
+                print("Downloading update...")
+
+        elif found_vision is vio.global_server:
+            if find_and_click(
+                vio.global_server,
+                screenshot,
+                window_location,
+                point_coordinates=Coordinates.get_coordinates("center_screen"),
+            ):
+                print("Trying to log back in...")
 
         # Click on the password field
-        elif find_and_click(vio.password, screenshot, window_location):
-            # Type the password and press enter
-            type_word(IFarmer.password)
-            press_key("enter")
+        elif found_vision is vio.password:
+            if find_and_click(vio.password, screenshot, window_location):
+                # Type the password and press enter
+                type_word(IFarmer.password)
+                press_key("enter")
 
         # Update first_login flag only once if a successful login/reset was detected
         if login_attempted and IFarmer.first_login:
@@ -167,7 +209,12 @@ class IFarmer:
             print("Duplicate connection detected!")
             find_and_click(vio.ok_main_button, screenshot, window_location)
 
-        elif find(vio.password, screenshot) and self.current_state != States.LOGIN_SCREEN:
+        # The password field only shows up on the login screen
+        elif (
+            not SceneClassifier.rules_out(screenshot, Scenes.LOGIN)
+            and find(vio.password, screenshot)
+            and self.current_state != States.LOGIN_SCREEN
+        ):
             self.current_state = States.LOGIN_SCREEN
             IFarmer.logged_out_time = time.time()
             print(f"We've been logged out! Waiting {MINUTES_TO_WAIT_BEFORE_LOGIN} mins to log back in...")
@@ -10,6 +10,7 @@ import numpy as np
 from utilities.card_data import Card
 from utilities.fighting_strategies import IBattleStrategy
 from utilities.logging_utils import LoggerWrapper
+from utilities.tracing import Tracer
 from utilities.utilities import (
     capture_hand_image,
     capture_window,
@@ -51,6 +52,16 @@ class IFighter(abc.ABC):
 
         self._reset_instance_variables()
 
+    @property
+    def current_state(self):
+        return self._current_state
+
+    @current_state.setter
+    def current_state(self, state):
+        self._current_state = state
+        # To know how long each state takes, e.g., a whole turn in MY_TURN
+        Tracer.set_state(self, state)
+
     def _reset_instance_variables(self):
         self.exit_thread = False
         self.current_state = FightingStates.FIGHTING
@@ -63,6 +74,7 @@ class IFighter(abc.ABC):
             print("An error occurred, closing the fighter thread!")
             self.exit_thread = True
 
+    @Tracer.traced("IFighter.play_cards")
     def play_cards(self, selected_cards: tuple[list[Card], list[int | tuple[int, int]]]):
         """Click on the cards from the picked cards to play.
 
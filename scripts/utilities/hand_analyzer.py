@@ -0,0 +1,159 @@
+"""Reading the whole hand of cards in a single pass.
+
+Reading the hand card by card ran both card models once per card, and up to three template matches per card to find its
+rank. `HandAnalyzer` crops the 8 cards at once, extracts the features of all of them together, and calls each model once
+with the batch of 8 cards. The rank needles are matched once against the whole hand, each card getting the best score
+within its own column, which is exactly the score it would get if matched on its own. Only the cards that aren't in the
+`CardCache` are read, usually the few cards drawn since the previous turn.
+"""
+
+import numpy as np
+import utilities.vision_images as vio
+from utilities.card_cache import CardCache
+from utilities.card_data import Card, CardRanks, CardTypes
+from utilities.coordinates import Coordinates
+from utilities.frame_cache import FrameCache
+from utilities.models import CardTypePredictor, GroundCardPredictor
+from utilities.pattern_match_strategies import BatchTemplateMatchingStrategy
+from utilities.tracing import Tracer
+
+
+def get_card_type_image(card: np.ndarray) -> np.ndarray:
+    """Extract the card type image from the card"""
+    w = card.shape[-2]
+    scale = Coordinates.get_template_scale()
+    return card[0 : round(20 * scale), round(40 * scale) : w]
+
+
+def get_card_interior_image(card_image: np.ndarray) -> np.ndarray:
+    """Get the inside of the card, without the border.
+    TODO: Very hardcoded, fix in the future for other resolution."""
+    scale = Coordinates.get_template_scale()
+    border = round(8 * scale)
+    return card_image[
+        border + round(4 * scale) : card_image.shape[0] - border - round(12 * scale),
+        border : card_image.shape[1] - border,
+    ]
+
+
+class HandAnalyzer:
+    """Namespace-like class that reads all the cards of the hand at once"""
+
+    NUM_CARDS = 8
+    # Card ranks, in the order their needles are checked
+    RANK_NEEDLES = (
+        (CardRanks.BRONZE, vio.bronze_card),
+        (CardRanks.SILVER, vio.silver_card),
+        (CardRanks.GOLD, vio.gold_card),
+    )
+    RANK_THRESHOLD = 0.7
+
+    @staticmethod
+    @Tracer.traced()
+    def get_hand_cards(screenshot: np.ndarray) -> list[Card]:
+        """Read the hand of the screenshot, only once per captured frame.
+        The cards are always new instances, since the strategies modify them.
+        """
+        top_left = Coordinates.get_coordinates("4_cards_top_left")
+        bottom_right = Coordinates.get_coordinates("4_cards_bottom_right")
+        hand_image = screenshot[top_left[1] : bottom_right[1], top_left[0] : bottom_right[0]]
+
+        # Split the image into 8 equal columns -- TODO: Not the best way to do it, doesn't work well
+        height, width = hand_image.shape[:2]
+        column_width = width // HandAnalyzer.NUM_CARDS
+        card_images = [hand_image[:, i * column_width : (i + 1) * column_width] for i in range(HandAnalyzer.NUM_CARDS)]
+
+        def read_hand() -> tuple[list[CardTypes], list[CardRanks]]:
+            # The cards seen in a previous frame or turn are not read again, see `CardCache`
+            cards_results = [CardCache.get_card_results(card_image) for card_image in card_images]
+            cached_cards = [CardCache.lookup(card_results, "hand_card") for card_results in cards_results]
+            card_types = [card[0] if found else None for found, card in cached_cards]
+            card_ranks = [card[1] if found else None for found, card in cached_cards]
+
+            new_cards = [i for i, (found, _) in enumerate(cached_cards) if not found]
+            if not new_cards:
+                return card_types, card_ranks
+
+            for i, card_type in zip(new_cards, HandAnalyzer.determine_card_types([card_images[i] for i in new_cards])):
+                card_types[i] = card_type
+
+            # Only match the rank needles on the columns spanning the new cards
+            first, last = new_cards[0], new_cards[-1]
+            span_ranks = HandAnalyzer.determine_card_ranks(
+                hand_image[:, first * column_width : (last + 1) * column_width], card_types[first : last + 1]
+            )
+            for i in new_cards:
+                card_ranks[i] = span_ranks[i - first]
+                CardCache.store(cards_results[i], "hand_card", (card_types[i], card_ranks[i]))
+            return card_types, card_ranks
+
+        card_types, card_ranks = FrameCache.get_or_compute(screenshot, ("hand_cards",), read_hand)
+
+        return [
+            Card(card_type, [top_left[0] + i * column_width, top_left[1], column_width, height], card_image, card_rank)
+            for i, (card_type, card_image, card_rank) in enumerate(zip(card_types, card_images, card_ranks))
+        ]
+
+    @staticmethod
+    def determine_card_types(card_images: list[np.ndarray]) -> list[CardTypes]:
+        """Predict the type of all the cards, calling each model once"""
+
+        # First, use the ground predictor. The cards it finds GROUND need no further exploration
+        are_ground_cards = GroundCardPredictor.are_ground_cards(
+            [get_card_interior_image(card_image) for card_image in card_images]
+        )
+        if all(are_ground_cards):
+            return [CardTypes.GROUND] * len(card_images)
+
+        # This logic allows for backwards compatibility (with Bird, for instance)
+        predicted_types = CardTypePredictor.predict_card_types(
+            np.stack([get_card_type_image(card_image) for card_image in card_images])
+        )
+
+        card_types = []
+        for is_ground_card, card_type in zip(are_ground_cards, predicted_types):
+            if is_ground_card:
+                card_type = CardTypes.GROUND
+            elif card_type == CardTypes.GROUND:
+                # If we predict GROUND, assume it's an ULTIMATE, therefore relying entirely on the GroundCardPredictor
+                print("Detecting GROUND, but setting ULTIMATE instead. Is this correct?")
+                card_type = CardTypes.ULTIMATE
+            card_types.append(card_type)
+        return card_types
+
+    @staticmethod
+    def determine_card_ranks(hand_image: np.ndarray, card_types: list[CardTypes]) -> list[CardRanks]:
+        """Predict the rank of all the cards of the hand, given their types, matching each rank needle once"""
+        needles = [vision for _, vision in HandAnalyzer.RANK_NEEDLES]
+        # The needles, the match results and the columns of the cards are all in the resolution of the color mode
+        converted_hand_image = needles[0].color_mode.convert(hand_image)
+        num_cards = len(card_types)
+        column_width = converted_hand_image.shape[1] // num_cards
+
+        match_results = BatchTemplateMatchingStrategy.match_templates(
+            converted_hand_image,
+            [needle.search_needle_img for needle in needles],
+            needle_statistics=[needle.needle_statistics for needle in needles],
+        )
+
+        # Best score of every needle within every card: positions where the needle fits entirely in the card's column
+        card_scores = np.full((len(needles), num_cards), -np.inf)
+        for i, (match_result, needle) in enumerate(zip(match_results, needles)):
+            needle_width = needle.search_needle_img.shape[1]
+            for j in range(num_cards):
+                positions = match_result[:, j * column_width : (j + 1) * column_width - needle_width + 1]
+                if positions.size:
+                    card_scores[i, j] = positions.max()
+
+        card_ranks = []
+        for j, card_type in enumerate(card_types):
+            found_ranks = [
+                rank
+                for i, (rank, _) in enumerate(HandAnalyzer.RANK_NEEDLES)
+                if card_scores[i, j] >= HandAnalyzer.RANK_THRESHOLD
+            ]
+            if found_ranks:
+                card_ranks.append(found_ranks[0])
+            else:
+                card_ranks.append(CardRanks.ULTIMATE if card_type == CardTypes.ULTIMATE else CardRanks.NONE)
+        return card_ranks
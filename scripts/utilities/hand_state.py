@@ -0,0 +1,167 @@
+"""Array-backed simulation of how the hand changes when cards are played or moved.
+
+Simulating a pick used to pop and insert `Card` objects in a list, and to ask the merge model about every pair of
+adjacent cards along the way. `HandState` describes the hand with a few small arrays instead: the type and rank of every
+card, and its ID, i.e., its index in the hand the state was built from. The merge predictions between all the cards of
+that hand are looked up once when the state is built (see `MergeOracle`), so the transitions never touch an image and a
+simulated play takes microseconds. States can be copied, which makes looking a few picks ahead affordable.
+
+The list-based functions of `battle_utilities` run on top of it, so the strategies keep working with lists of cards.
+"""
+
+import numpy as np
+from utilities.card_data import Card, CardRanks, CardTypes
+from utilities.merge_oracle import MergeOracle
+
+
+class HandState:
+    """Types, ranks and IDs of the cards of a hand, from left to right"""
+
+    # ID of the dummy cards inserted on the left of the hand by the transitions
+    DUMMY_ID = -1
+    # Cards of these types never merge
+    NO_MERGE_TYPES = (CardTypes.NONE.value, CardTypes.GROUND.value)
+    # Plain values, way faster to compare than the enums in the transitions
+    GROUND = CardTypes.GROUND.value
+    GOLD = CardRanks.GOLD.value
+
+    def __init__(
+        self,
+        card_types: np.ndarray,
+        card_ranks: np.ndarray,
+        card_ids: np.ndarray,
+        merges: np.ndarray,
+        verbose: bool = False,
+    ):
+        """`merges[a, b]` tells whether the model predicts that the cards with IDs `a` and `b` merge.
+        If `verbose`, the transitions print what happens to the hand.
+        """
+        self.card_types = card_types
+        self.card_ranks = card_ranks
+        self.card_ids = card_ids
+        self.merges = merges
+        self.verbose = verbose
+
+    @staticmethod
+    def from_cards(cards: list[Card], verbose: bool = False) -> "HandState":
+        """Build the state of the given cards, the ID of each card being its index in `cards`"""
+        return HandState(
+            np.array([card.card_type.value for card in cards], dtype=np.int16),
+            np.array([card.card_rank.value for card in cards], dtype=np.int16),
+            np.arange(len(cards), dtype=np.int16),
+            MergeOracle.predict_merges([card.card_image for card in cards]),
+            verbose=verbose,
+        )
+
+    def to_cards(self, cards: list[Card]) -> list[Card]:
+        """The cards of the state, given the cards it was built from. Cards are reused and their ranks updated in place,
+        only the dummy cards are new.
+        """
+        new_cards = []
+        for card_type, card_rank, card_id in zip(self.card_types, self.card_ranks, self.card_ids):
+            if card_id == HandState.DUMMY_ID:
+                new_cards.append(Card(CardTypes(int(card_type)), None, None))
+                continue
+            card = cards[card_id]
+            if card.card_rank.value != card_rank:
+                card.card_rank = CardRanks(int(card_rank))
+            new_cards.append(card)
+        return new_cards
+
+    def copy(self) -> "HandState":
+        """Independent copy of the state, sharing the (read-only) merge predictions"""
+        return HandState(
+            self.card_types.copy(), self.card_ranks.copy(), self.card_ids.copy(), self.merges, verbose=self.verbose
+        )
+
+    def can_merge(self, left_idx: int, right_idx: int) -> bool:
+        """Whether both cards merge, like `determine_card_merge` on the cards"""
+        # Python scalars: comparing NumPy scalars is an order of magnitude slower
+        left_type, left_rank, left_id = (array.item(left_idx) for array in self._arrays())
+        right_type, right_rank, right_id = (array.item(right_idx) for array in self._arrays())
+        return (
+            left_type not in HandState.NO_MERGE_TYPES
+            and right_type not in HandState.NO_MERGE_TYPES
+            and left_id != HandState.DUMMY_ID
+            and right_id != HandState.DUMMY_ID
+            and bool(self.merges.item(left_id, right_id))
+            and left_rank == right_rank
+            and left_rank != HandState.GOLD
+        )
+
+    def play(self, idx: int):
+        """Play the card, and merge the cards on both of its sides if needed"""
+        # The card leaves the hand, and a dummy card is added on the left
+        self._remove(idx, CardTypes.GROUND)
+
+        # If we're not at the beginning or end of the hand, let's handle the card merges
+        if idx > 0 and idx < len(self.card_ids) - 1:
+            self.merge_pair(idx, idx + 1)
+
+    def move(self, origin_idx: int, target_idx: int):
+        """Move the card onto the target, merging them if possible, and then process all the resulting merges"""
+        if self.can_merge(origin_idx, target_idx):
+            # The target card ranks up, and the origin card leaves the hand
+            self.card_ranks[target_idx] += 1
+            self._remove(origin_idx, CardTypes.NONE)
+        else:
+            if self.verbose:
+                print(f"We're moving a card from {origin_idx} to {target_idx}, but it's not generating a merge!")
+            order = list(range(len(self.card_ids)))
+            order.insert(target_idx, order.pop(origin_idx))
+            self._reorder(order)
+
+        self.merge_all()
+
+    def merge_pair(self, left_idx: int, right_idx: int):
+        """Merge both cards if possible, and then the merges this merge causes, recursively"""
+        if left_idx >= right_idx or right_idx >= len(self.card_ids) or not self.can_merge(left_idx, right_idx):
+            return
+
+        if self.verbose:
+            print(f"Card at idx {left_idx} will merge with idx {right_idx}!")
+        # The right card ranks up, and the left card leaves the hand
+        if self.card_ranks.item(right_idx) != HandState.GOLD:
+            self.card_ranks[right_idx] += 1
+        self._remove(left_idx, CardTypes.GROUND)
+
+        # Right merge, and then left merge
+        self.merge_pair(right_idx, right_idx + 1)
+        self.merge_pair(right_idx - 1, right_idx)
+
+    def merge_all(self):
+        """Loop over the hand iteratively to process all merges, until there's none left"""
+        merges_complete = False
+        while not merges_complete:
+            merges_complete = True
+            i = 0
+            while i < len(self.card_ids) - 1:
+                if self.can_merge(i, i + 1):
+                    if self.verbose:
+                        print(f"Card at idx {i} will merge with idx {i+1}!")
+                    # The left card ranks up, and the right card leaves the hand
+                    if self.card_ranks.item(i) in (CardRanks.BRONZE.value, CardRanks.SILVER.value):
+                        self.card_ranks[i] += 1
+                    self._remove(i + 1, CardTypes.GROUND)
+                    # We may need to do another pass
+                    merges_complete = False
+                else:
+                    # A GROUND card on the right is swapped with the current card
+                    if self.card_types.item(i + 1) == HandState.GROUND:
+                        self._reorder([*range(i), i + 1, i, *range(i + 2, len(self.card_ids))])
+                    i += 1
+
+    def _remove(self, idx: int, dummy_type: CardTypes):
+        """Remove the card, shifting the cards on its left to the right, and add a dummy card on the left"""
+        order = list(range(len(self.card_ids)))
+        order.pop(idx)
+        self._reorder([0] + order)
+        self.card_types[0] = dummy_type.value
+        self.card_ranks[0] = CardRanks.NONE.value
+        self.card_ids[0] = HandState.DUMMY_ID
+
+    def _arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.card_types, self.card_ranks, self.card_ids
+
+    def _reorder(self, order: list[int]):
+        self.card_types, self.card_ranks, self.card_ids = (array[order] for array in self._arrays())
@@ -0,0 +1,80 @@
+"""Which cards of the hand merge with each other, predicted once per hand.
+
+The strategies ask `determine_card_merge` about the same pairs of cards over and over within a turn: while looking for a
+card that generates a merge, and while simulating how the hand changes after every pick (`handle_card_merges_new` goes
+over the whole hand until no merge is left). Each call computed the histograms of both cards and called the model.
+
+`MergeOracle` computes the histogram of every card of the hand once, and the merge prediction of all the pairs in a
+single call to the model. Rows are tied to the card images rather than to their positions, so the matrix stays valid as
+simulated plays shift, remove and merge cards: a merge query is just a lookup. The ranks, which the simulation changes,
+are still checked by `determine_card_merge` on every query.
+"""
+
+import threading
+
+import numpy as np
+from utilities.hand_analyzer import get_card_interior_image
+from utilities.models import CardMergePredictor
+
+
+class MergeOracle:
+    """Merge predictions between all the cards of a hand, computed the first time they're needed"""
+
+    # Every thread (e.g., the fighter) has its own latest hand
+    _local = threading.local()
+
+    def __init__(self, card_images: list[np.ndarray]):
+        self.card_images = card_images
+        self._merge_matrix: np.ndarray | None = None
+
+    @staticmethod
+    def set_hand(card_images: list[np.ndarray]):
+        """Register the card images of the latest hand read by the current thread"""
+        MergeOracle._local.oracle = MergeOracle(card_images)
+
+    @staticmethod
+    def predict_merge(card_image_1: np.ndarray, card_image_2: np.ndarray) -> bool:
+        """Whether the model predicts both cards merge, looked up in the matrix of the latest hand if they're part of it"""
+        oracle: MergeOracle | None = getattr(MergeOracle._local, "oracle", None)
+        if oracle is not None:
+            i, j = oracle._get_index(card_image_1), oracle._get_index(card_image_2)
+            if i is not None and j is not None:
+                return bool(oracle.merge_matrix[i, j])
+
+        # E.g., a copy of a card
+        return CardMergePredictor.predict_card_merge(
+            get_card_interior_image(card_image_1), get_card_interior_image(card_image_2)
+        )
+
+    @staticmethod
+    def predict_merges(card_images: list[np.ndarray | None]) -> np.ndarray:
+        """Merge matrix between the given cards, taken from the matrix of the latest hand if they're all part of it.
+        Missing card images (e.g., the dummy cards) don't merge with anything.
+        """
+        merges = np.zeros((len(card_images), len(card_images)), dtype=bool)
+        ids = [i for i, card_image in enumerate(card_images) if card_image is not None]
+        if not ids:
+            return merges
+
+        oracle: MergeOracle | None = getattr(MergeOracle._local, "oracle", None)
+        rows = [oracle._get_index(card_images[i]) for i in ids] if oracle is not None else [None]
+        if None in rows:
+            card_merges = CardMergePredictor.predict_merge_matrix(
+                [get_card_interior_image(card_images[i]) for i in ids]
+            )
+        else:
+            card_merges = oracle.merge_matrix[np.ix_(rows, rows)]
+        merges[np.ix_(ids, ids)] = card_merges
+        return merges
+
+    @property
+    def merge_matrix(self) -> np.ndarray:
+        if self._merge_matrix is None:
+            self._merge_matrix = CardMergePredictor.predict_merge_matrix(
+                [get_card_interior_image(card_image) for card_image in self.card_images]
+            )
+        return self._merge_matrix
+
+    def _get_index(self, card_image: np.ndarray) -> int | None:
+        """Row of the card image in the matrix. Images are compared by identity, not by content"""
+        return next((i for i, image in enumerate(self.card_images) if image is card_image), None)
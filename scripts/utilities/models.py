@@ -1,4 +1,5 @@
 import os
+from enum import Enum
 
 import dill as pickle
 import numpy as np
@@ -10,7 +11,10 @@ from utilities.feature_extractors import (
     extract_color_features,
     extract_color_histograms_features,
     extract_difference_of_histograms_features,
+    extract_scene_features,
 )
+from utilities.frame_cache import FrameCache
+from utilities.tracing import Tracer
 
 os.environ["LOKY_MAX_CPU_COUNT"] = "1"  # Replace '4' with the number of cores you want to use
 
@@ -44,18 +48,24 @@ class CardTypePredictor(IModel):
     @staticmethod
     def predict_card_type(card_type_image: np.ndarray, feature_type: str = "median") -> CardTypes:
         """Extract the features from the card and predict its type"""
+        return CardTypePredictor.predict_card_types(card_type_image[np.newaxis, ...], feature_type=feature_type)[0]
+
+    @staticmethod
+    @Tracer.traced()
+    def predict_card_types(card_type_images: np.ndarray, feature_type: str = "median") -> list[CardTypes]:
+        """Predict the type of a batch of cards, of shape (batch, height, width, channels), in a single call"""
 
         # Ensure the model is properly loaded
         CardTypePredictor._load_model("card_type_predictor.knn")
 
-        features = extract_color_features(card_type_image[np.newaxis, ...], type=feature_type)
-        predicted_label = CardTypePredictor.model.predict(features).item()
-        return CardTypes(predicted_label)
+        features = extract_color_features(card_type_images, type=feature_type)
+        return [CardTypes(predicted_label) for predicted_label in CardTypePredictor.model.predict(features)]
 
 
 class CardMergePredictor(IModel):
 
     @staticmethod
+    @Tracer.traced()
     def predict_card_merge(card_1: np.ndarray, card_2: np.ndarray) -> bool:
         """Extract the features and use the model to predict whether two cards are going to merge"""
 
@@ -65,11 +75,28 @@ class CardMergePredictor(IModel):
         features = extract_difference_of_histograms_features((card_1, card_2))
         return int(CardMergePredictor.model.predict(features).item())
 
+    @staticmethod
+    @Tracer.traced()
+    def predict_merge_matrix(cards: list[np.ndarray]) -> np.ndarray:
+        """Predict whether every pair of cards is going to merge, computing each histogram once and calling the model
+        once. Returns a symmetric boolean matrix.
+        """
+
+        # Ensure the model is properly loaded
+        CardMergePredictor._load_model("card_merges_predictor.lr")
+
+        # Same feature as `extract_difference_of_histograms_features`, for all the pairs at once
+        histograms = extract_color_histograms_features(cards)
+        distances = np.linalg.norm(histograms[:, np.newaxis] - histograms[np.newaxis, :], axis=-1)
+        predictions = CardMergePredictor.model.predict(distances.reshape(-1, 1))
+        return predictions.reshape(distances.shape).astype(bool)
+
 
 class AmplifyCardPredictor(IModel):
     """Model that identifies if a card should be played in phase 3"""
 
     @staticmethod
+    @Tracer.traced()
     def is_amplify_card(card_1: np.ndarray | None) -> bool:
         """Predict if a card ia amplify or Thor's"""
 
@@ -93,6 +120,7 @@ class HAMCardPredictor(IModel):
     """Class that predicts whether a card is hard-hitting"""
 
     @staticmethod
+    @Tracer.traced()
     def is_HAM_card(card: np.ndarray | None) -> bool:
         """Predict if a card is hard-hitting"""
 
@@ -117,6 +145,7 @@ class ThorCardPredictor(IModel):
     """Class that identifies Thor cards"""
 
     @staticmethod
+    @Tracer.traced()
     def is_Thor_card(card: np.ndarray | None) -> bool:
         """Predict if a card is hard-hitting"""
 
@@ -143,15 +172,96 @@ class GroundCardPredictor(IModel):
     @staticmethod
     def is_ground_card(card: np.ndarray) -> bool:
         """Predict ground card"""
+        return GroundCardPredictor.are_ground_cards([card])[0]
+
+    @staticmethod
+    @Tracer.traced()
+    def are_ground_cards(cards: list[np.ndarray]) -> list[bool]:
+        """Predict whether each card of a batch is ground, in a single call"""
 
         # Ensure models are properly loaded
         GroundCardPredictor._load_feature_transform_model("pca_ground_cards_model.pca")
         GroundCardPredictor._load_model("ground_cards_predictor.svm")
 
         # Extract the features
-        features = extract_color_histograms_features(card, bins=(8, 8, 8))
+        features = extract_color_histograms_features(cards, bins=(8, 8, 8))
         # Transform the features
         features_reduced = GroundCardPredictor.feature_transform_model.transform(features)
 
-        # Predict if the card is ground
-        return int(GroundCardPredictor.model.predict(features_reduced).item())
+        # Predict if the cards are ground
+        return [int(prediction) for prediction in GroundCardPredictor.model.predict(features_reduced)]
+
+
+class Scenes(Enum):
+    """Game screens that the `SceneClassifier` tells apart"""
+
+    TAVERN = 0
+    BATTLE_MENU = 1
+    DB_MENU = 2
+    FLOOR_SELECT = 3
+    FIGHTING = 4
+    DEFEAT = 5
+    VICTORY = 6
+    LOADING = 7
+    LOGIN = 8
+    DAILY_RESET = 9
+
+
+class SceneClassifier(IModel):
+    """Tell which screen the game is on from a downsampled screenshot, way faster than a single template match.
+    Farmers can use it to skip the template matching that can't succeed on the current screen.
+    """
+
+    # Below this confidence, the prediction is not trusted
+    MIN_CONFIDENCE = 0.9
+
+    # The classifier needs to be trained on the user's screens first (see `model_trainer.py`)
+    _available: bool | None = None
+
+    @staticmethod
+    def is_available() -> bool:
+        """Whether a scene classifier has been trained"""
+        if SceneClassifier._available is None:
+            SceneClassifier._available = all(
+                os.path.exists(os.path.join("models", model_filename))
+                for model_filename in ("pca_scenes_model.pca", "scene_classifier.lr")
+            )
+        return SceneClassifier._available
+
+    @staticmethod
+    @Tracer.traced()
+    def predict_scene(screenshot: np.ndarray) -> tuple[Scenes | None, float]:
+        """Return the most likely scene of the screenshot and its probability, computed once per captured frame.
+        Returns `(None, 0)` if no scene classifier has been trained.
+        """
+        if not SceneClassifier.is_available():
+            return None, 0.0
+
+        def compute_scene() -> tuple[Scenes, float]:
+            # Ensure all models are properly loaded
+            SceneClassifier._load_feature_transform_model("pca_scenes_model.pca")
+            SceneClassifier._load_model("scene_classifier.lr")
+
+            # Extract the features and transform them with the PCA
+            features = extract_scene_features(screenshot)
+            features_reduced = SceneClassifier.feature_transform_model.transform(features)
+
+            probabilities = SceneClassifier.model.predict_proba(features_reduced)[0]
+            best_index = int(np.argmax(probabilities))
+            return Scenes(int(SceneClassifier.model.classes_[best_index])), float(probabilities[best_index])
+
+        return FrameCache.get_or_compute(screenshot, ("scene",), compute_scene)
+
+    @staticmethod
+    def is_scene(screenshot: np.ndarray, *scenes: Scenes) -> bool:
+        """Whether the screenshot is confidently one of the given scenes"""
+        scene, confidence = SceneClassifier.predict_scene(screenshot)
+        return scene in scenes and confidence >= SceneClassifier.MIN_CONFIDENCE
+
+    @staticmethod
+    def rules_out(screenshot: np.ndarray, *scenes: Scenes) -> bool:
+        """Whether the screenshot is confidently a scene other than the given ones, meaning that whatever only shows up
+        on those scenes can't be found on it. Never rules anything out without a trained classifier.
+        """
+        scene, confidence = SceneClassifier.predict_scene(screenshot)
+        return scene is not None and scene not in scenes and confidence >= SceneClassifier.MIN_CONFIDENCE
@@ -1,14 +1,20 @@
 """Ideally, this script implements different pattern match strategies to decouple them from the `Vision` class.
 The idea is that we can also implement scale-invariant pattern matching algorithms (such as SIFT or ORB).
 
-For now, we only implemented a naive pattern matching algorithm not invariant to scaling.
+For now, we only implemented a naive pattern matching algorithm not invariant to scaling, a variant of it that shares
+the normalization statistics across needles, and a coarse-to-fine variant of it for large needles.
 """
 
 import abc
+import threading
+from collections import Counter
+from dataclasses import dataclass
 
 import cv2
 import numpy as np
 
+from utilities.vision_executor import VisionExecutor
+
 
 class IMatchingStrategy(abc.ABC):
     @staticmethod
@@ -27,6 +33,9 @@ class IMatchingStrategy(abc.ABC):
 class TemplateMatchingStrategy:
     """Naive pattern matching algorithm"""
 
+    # Relative size difference under which two matches are grouped together
+    GROUP_EPS = 0.5
+
     @staticmethod
     def find_all_rectangles(image: np.ndarray, template: np.ndarray, **kwargs):
 
@@ -37,24 +46,68 @@ class TemplateMatchingStrategy:
         # Perform template matching
         match_result = cv2.matchTemplate(image, template, method)
 
+        return TemplateMatchingStrategy.rectangles_from_match_result(match_result, template.shape, match_threshold)
+
+    @staticmethod
+    def rectangles_from_match_result(
+        match_result: np.ndarray, template_shape: tuple, match_threshold: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Group the positions of a `cv2.matchTemplate` result that exceed the threshold into rectangles.
+        The result is exactly the one of `cv2.groupRectangles(..., groupThreshold=1, eps=0.5)` over every match point
+        (duplicated), but computed on the whole match map at once instead of on a list of Python rectangles.
+        """
+
         # Identify positions where matches exceed the threshold
-        match_locations = np.where(match_result >= match_threshold)
-        match_points = list(zip(*match_locations[::-1]))
+        ys, xs = np.nonzero(match_result >= match_threshold)
 
-        if not match_points:
+        if not ys.size:
             return np.empty(0), np.empty(0)
 
-        # Create rectangles based on the match points
-        detected_rectangles = []
-        for point in match_points:
-            rectangle = [int(point[0]), int(point[1]), template.shape[1], template.shape[0]]
-            detected_rectangles.extend((rectangle, rectangle))
+        h, w = template_shape[:2]
+
+        # Two points end up in the same group if they're closer than `delta` in both axes.
+        # Drawing a square of that size around each point on a grid of double resolution (so that squares of points
+        # that are further apart don't even touch), each group is a connected component of the squares
+        delta = int(TemplateMatchingStrategy.GROUP_EPS * (w + h) * 0.5)
+        top, left = ys.min(), xs.min()
+        grid = np.zeros((2 * (ys.max() - top + delta) + 1, 2 * (xs.max() - left + delta) + 1), dtype=np.uint8)
+        grid[2 * (ys - top + delta), 2 * (xs - left + delta)] = 1
+        grid = cv2.dilate(grid, np.ones((2 * delta + 1, 2 * delta + 1), np.uint8))
+        _, grid_labels = cv2.connectedComponents(grid, connectivity=4)
+        point_labels = grid_labels[2 * (ys - top + delta), 2 * (xs - left + delta)]
+
+        # Groups are numbered in the order of their first point (row by row)
+        _, first_points, point_groups = np.unique(point_labels, return_index=True, return_inverse=True)
+        group_order = np.argsort(np.argsort(first_points))
+        point_groups = group_order[point_groups.ravel()]
+        num_groups = first_points.size
 
-        # Use groupRectangles to refine results
-        # TODO: Also keep those rectangles that have no overlapping as well?
-        grouped_rectangles, confidence_weights = cv2.groupRectangles(detected_rectangles, groupThreshold=1, eps=0.5)
+        # Each point counts twice, as if the rectangles were duplicated. Average the same way OpenCV does (in float32)
+        weights = 2 * np.bincount(point_groups, minlength=num_groups)
+        rectangle_sums = np.column_stack(
+            (
+                2 * np.bincount(point_groups, weights=xs, minlength=num_groups).astype(np.int64),
+                2 * np.bincount(point_groups, weights=ys, minlength=num_groups).astype(np.int64),
+                w * weights,
+                h * weights,
+            )
+        )
+        inverse_weights = np.float32(1) / weights.astype(np.float32)
+        rectangles = np.rint(rectangle_sums.astype(np.float32) * inverse_weights[:, None]).astype(np.int32)
 
-        return grouped_rectangles, confidence_weights
+        # Drop the groups that lay inside a stronger one, as well as the single point groups inside any other one
+        dx, dy = round(w * TemplateMatchingStrategy.GROUP_EPS), round(h * TemplateMatchingStrategy.GROUP_EPS)
+        inside = (np.abs(rectangles[:, None, 0] - rectangles[None, :, 0]) <= dx) & (
+            np.abs(rectangles[:, None, 1] - rectangles[None, :, 1]) <= dy
+        )
+        np.fill_diagonal(inside, False)
+        weaker = (weights[None, :] > np.maximum(3, weights[:, None])) | (weights[:, None] < 3)
+        keep = ~np.any(inside & weaker, axis=1)
+
+        if not keep.any():
+            return np.empty(0), np.empty(0)
+
+        return rectangles[keep], weights[keep].astype(np.int32)
 
     @staticmethod
     def find(image: np.ndarray, template: np.ndarray, **kwargs):
@@ -71,3 +124,345 @@ class TemplateMatchingStrategy:
 
         # Return the single rectangle with the highest confidence
         return rectangles[best_index]
+
+
+class PyramidMatchingStrategy:
+    """Coarse-to-fine pattern matching, meant for large needles.
+    Needle and haystack are first matched downscaled, and then only small windows around the coarse candidates
+    are matched at full resolution. The result has the same format as `TemplateMatchingStrategy`.
+    """
+
+    # Don't downscale a needle below this size, it wouldn't have enough detail to be found
+    MIN_NEEDLE_SIZE = 8
+    # Each level halves the resolution. Text-heavy needles get unreliable quite fast beyond the first one
+    MAX_LEVELS = 1
+    # How much lower the score of a coarse candidate can be with respect to the final threshold
+    COARSE_THRESHOLD_MARGIN = 0.3
+    MAX_CANDIDATES = 32
+    # Candidates are the best coarse scores, so only the normalized methods where higher is better are supported
+    SUPPORTED_METHODS = (cv2.TM_CCOEFF_NORMED, cv2.TM_CCORR_NORMED)
+
+    @staticmethod
+    def find_all_rectangles(image: np.ndarray, template: np.ndarray, **kwargs):
+
+        # Extract the optional parameters with default values
+        match_threshold = kwargs.get("threshold", 0.5)
+        method = kwargs.get("cv_method", cv2.TM_CCOEFF_NORMED)
+        max_levels = kwargs.get("pyramid_levels", PyramidMatchingStrategy.MAX_LEVELS)
+
+        h, w = template.shape[:2]
+        if h > image.shape[0] or w > image.shape[1]:
+            return np.empty(0), np.empty(0)
+
+        num_levels = 0
+        while num_levels < max_levels and min(h, w) >> (num_levels + 1) >= PyramidMatchingStrategy.MIN_NEEDLE_SIZE:
+            num_levels += 1
+
+        if num_levels == 0 or method not in PyramidMatchingStrategy.SUPPORTED_METHODS:
+            # Too small to benefit from a coarse search, or a method whose scores can't be relaxed as a threshold
+            # (e.g., `TM_SQDIFF`, where lower is better)
+            return TemplateMatchingStrategy.find_all_rectangles(image, template, **kwargs)
+
+        # Coarse search. Area interpolation keeps the needle borders sharper than a Gaussian pyramid
+        scale = 2**num_levels
+        coarse_image = cv2.resize(image, None, fx=1 / scale, fy=1 / scale, interpolation=cv2.INTER_AREA)
+        coarse_template = cv2.resize(template, None, fx=1 / scale, fy=1 / scale, interpolation=cv2.INTER_AREA)
+        coarse_result = cv2.matchTemplate(coarse_image, coarse_template, method)
+
+        # Only keep the local maxima above the relaxed threshold as candidates
+        coarse_threshold = match_threshold - PyramidMatchingStrategy.COARSE_THRESHOLD_MARGIN
+        local_maxima = coarse_result == cv2.dilate(coarse_result, np.ones((3, 3), np.uint8))
+        candidate_ys, candidate_xs = np.nonzero(local_maxima & (coarse_result >= coarse_threshold))
+        if not candidate_ys.size:
+            return np.empty(0), np.empty(0)
+
+        if candidate_ys.size > PyramidMatchingStrategy.MAX_CANDIDATES:
+            best_ids = np.argpartition(
+                coarse_result[candidate_ys, candidate_xs], -PyramidMatchingStrategy.MAX_CANDIDATES
+            )[-PyramidMatchingStrategy.MAX_CANDIDATES :]
+            candidate_ys, candidate_xs = candidate_ys[best_ids], candidate_xs[best_ids]
+
+        # Refine each candidate at full resolution, in a small window around its upscaled position
+        padding = 2 * scale
+        max_y, max_x = image.shape[0] - h, image.shape[1] - w
+        match_result = np.full((max_y + 1, max_x + 1), -np.inf, dtype=np.float32)
+        for candidate_y, candidate_x in zip(candidate_ys, candidate_xs):
+            y0, x0 = max(candidate_y * scale - padding, 0), max(candidate_x * scale - padding, 0)
+            y1, x1 = min(candidate_y * scale + padding, max_y), min(candidate_x * scale + padding, max_x)
+            window_result = cv2.matchTemplate(image[y0 : y1 + h, x0 : x1 + w], template, method)
+            match_window = match_result[y0 : y1 + 1, x0 : x1 + 1]
+            np.maximum(match_window, window_result, out=match_window)
+
+        return TemplateMatchingStrategy.rectangles_from_match_result(match_result, template.shape, match_threshold)
+
+    @staticmethod
+    def find(image: np.ndarray, template: np.ndarray, **kwargs):
+        """Find the best rectangle match of the needle in the haystack"""
+
+        rectangles, weights = PyramidMatchingStrategy.find_all_rectangles(image, template, **kwargs)
+
+        # Check if there are any rectangles after grouping
+        if len(rectangles) == 0:
+            return np.array([], dtype=np.int32).reshape(0, 4)
+
+        # Return the single rectangle with the highest confidence
+        return rectangles[np.argmax(weights)]
+
+
+@dataclass(frozen=True)
+class NeedleStatistics:
+    """What `TM_CCOEFF_NORMED` needs to know about a needle: the mean of each channel and the norm of the
+    zero-mean needle. Cheap to keep around, so that they're computed only once per needle.
+    """
+
+    mean: np.ndarray
+    norm: float
+
+    @staticmethod
+    def from_template(template: np.ndarray) -> "NeedleStatistics":
+        channels = template.shape[2] if template.ndim == 3 else 1
+        template_pixels = template.reshape(-1, channels).astype(np.float64)
+        template_mean = template_pixels.mean(axis=0)
+        return NeedleStatistics(
+            mean=template_mean.astype(np.float32), norm=float(np.sqrt(np.sum((template_pixels - template_mean) ** 2)))
+        )
+
+
+class HaystackStatistics:
+    """Integral images of a haystack, built on first use and shared by all the needles matched against it.
+    The window statistics derived from them are cached per needle size and searched region of the haystack.
+    """
+
+    def __init__(self, image: np.ndarray):
+        self.image = image
+        # Needles of the same frame may be matched concurrently, see `VisionExecutor`
+        self._lock = threading.Lock()
+        self._integrals: tuple[np.ndarray, np.ndarray] | None = None
+        self._window_statistics: dict[tuple, tuple[np.ndarray, np.ndarray]] = {}
+
+    def window_statistics(
+        self, h: int, w: int, offset: tuple[int, int] = (0, 0), size: tuple[int, int] | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Per-channel sums of every (h, w) window of the haystack, and the square root of its sum of
+        squared deviations over all channels. Only the windows inside the region of the given (height, width) `size`
+        starting at the (x, y) `offset` are considered, i.e., the windows of the haystack crop.
+        """
+        size = tuple(size or self.image.shape[:2])
+        key = (h, w, tuple(offset), size)
+        with self._lock:
+            if key not in self._window_statistics:
+                if self._integrals is None:
+                    image_sum, image_sqsum = cv2.integral2(self.image, sdepth=cv2.CV_32S, sqdepth=cv2.CV_64F)
+                    if image_sqsum.ndim == 3:
+                        # Only the sum over all channels of the squares is needed
+                        image_sqsum = cv2.transform(image_sqsum, np.ones((1, image_sqsum.shape[2])))
+                    self._integrals = (image_sum, image_sqsum)
+
+                # The integral images of a crop are a crop of the integral images, up to a constant that cancels out
+                (x, y), (height, width) = offset, size
+                image_sum, image_sqsum = (
+                    integral[y : y + height + 1, x : x + width + 1] for integral in self._integrals
+                )
+                self._window_statistics[key] = HaystackStatistics._compute_window_statistics(
+                    image_sum, image_sqsum, h, w
+                )
+
+            return self._window_statistics[key]
+
+    @staticmethod
+    def _compute_window_statistics(
+        image_sum: np.ndarray, image_sqsum: np.ndarray, h: int, w: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Same computation as `cv2.matchTemplate`, relying on OpenCV arithmetic since it's much faster on
+        these large arrays than NumPy.
+        """
+
+        def window_totals(integral: np.ndarray) -> np.ndarray:
+            return cv2.add(
+                cv2.subtract(integral[h:, w:], integral[:-h, w:]), cv2.subtract(integral[:-h, :-w], integral[h:, :-w])
+            )
+
+        window_sum = window_totals(image_sum)
+        window_sum2 = window_totals(image_sqsum)
+
+        channels = window_sum.shape[2] if window_sum.ndim == 3 else 1
+        window_sum_float = window_sum.astype(np.float64)
+        window_mean2 = cv2.transform(
+            cv2.multiply(window_sum_float, window_sum_float), np.full((1, channels), 1 / (h * w))
+        )
+
+        deviation2 = cv2.subtract(window_sum2, window_mean2.reshape(window_sum2.shape))
+        # Avoid rounding errors on flat windows, in which case nothing can be matched
+        deviation2[deviation2 <= np.minimum(0.5, 10 * np.finfo(np.float32).eps * window_sum2)] = 0
+
+        # The window sums are integers small enough to be exact in single precision.
+        # Always keep a channel dimension, even for gray images
+        window_sum = window_sum.astype(np.float32).reshape(*window_sum2.shape, channels)
+        return window_sum, cv2.sqrt(deviation2).astype(np.float32)
+
+
+class NormalizedTemplateMatchingStrategy:
+    """Same results as `TemplateMatchingStrategy` for `TM_CCOEFF_NORMED`, but relying on precomputed statistics.
+    The needle statistics (`needle_statistics`) and the haystack integral images (`haystack_statistics`, and the
+    `haystack_offset` of the searched crop in it) can be given, so that the normalization part of the matching is
+    shared by all the needles searched on the same frame. Other methods fall back to `TemplateMatchingStrategy`.
+    """
+
+    @staticmethod
+    def find_all_rectangles(image: np.ndarray, template: np.ndarray, **kwargs):
+
+        match_threshold = kwargs.get("threshold", 0.5)
+
+        match_result = NormalizedTemplateMatchingStrategy._match_template(image, template, **kwargs)
+        if not match_result.size:
+            return np.empty(0), np.empty(0)
+
+        return TemplateMatchingStrategy.rectangles_from_match_result(match_result, template.shape, match_threshold)
+
+    @staticmethod
+    def find(image: np.ndarray, template: np.ndarray, **kwargs):
+        """Find the best rectangle match of the needle in the haystack"""
+
+        rectangles, weights = NormalizedTemplateMatchingStrategy.find_all_rectangles(image, template, **kwargs)
+
+        # Check if there are any rectangles after grouping
+        if len(rectangles) == 0:
+            return np.array([], dtype=np.int32).reshape(0, 4)
+
+        # Return the single rectangle with the highest confidence
+        return rectangles[np.argmax(weights)]
+
+    @staticmethod
+    def _match_template(image: np.ndarray, template: np.ndarray, **kwargs) -> np.ndarray:
+        """Single needle version of `BatchTemplateMatchingStrategy.match_templates`"""
+        needle_statistics = kwargs.pop("needle_statistics", None)
+        return BatchTemplateMatchingStrategy.match_templates(
+            image, [template], needle_statistics=None if needle_statistics is None else [needle_statistics], **kwargs
+        )[0]
+
+
+class BatchTemplateMatchingStrategy:
+    """Match a whole set of needles against a single haystack in one call.
+
+    For `TM_CCOEFF_NORMED`, the integral images of the haystack are computed only once, and needles of equal size
+    share the same window statistics, so that each of them only costs a plain cross-correlation.
+    The statistics of the needles and the haystack can also be given (see `NormalizedTemplateMatchingStrategy`),
+    to share them across calls. Any other method falls back to one `cv2.matchTemplate` per needle.
+    """
+
+    @staticmethod
+    def match_templates(image: np.ndarray, templates: list[np.ndarray], **kwargs) -> list[np.ndarray]:
+        """Return the `cv2.matchTemplate` result map of every template, in the same order"""
+
+        method = kwargs.get("cv_method", cv2.TM_CCOEFF_NORMED)
+
+        if method != cv2.TM_CCOEFF_NORMED:
+            return VisionExecutor.map(
+                lambda template: (
+                    cv2.matchTemplate(image, template, method)
+                    if template.shape[0] <= image.shape[0] and template.shape[1] <= image.shape[1]
+                    else np.empty((0, 0), dtype=np.float32)
+                ),
+                templates,
+            )
+
+        needle_statistics = kwargs.get("needle_statistics")
+        if needle_statistics is None:
+            needle_statistics = [NeedleStatistics.from_template(template) for template in templates]
+        haystack_offset = kwargs.get("haystack_offset", (0, 0))
+        haystack_statistics = kwargs.get("haystack_statistics")
+        shared_shapes = None
+        if haystack_statistics is None:
+            haystack_statistics = HaystackStatistics(image)
+            # Window statistics that only one needle would use aren't worth it, OpenCV computes them faster on its own
+            shape_counts = Counter(template.shape[:2] for template in templates)
+            shared_shapes = {shape for shape, count in shape_counts.items() if count > 1}
+
+        def match_template(needle: tuple[np.ndarray, NeedleStatistics]) -> np.ndarray:
+            template, template_statistics = needle
+            h, w = template.shape[:2]
+            if h > image.shape[0] or w > image.shape[1]:
+                # The needle doesn't fit in the haystack, nothing can be found
+                return np.empty((0, 0), dtype=np.float32)
+
+            if shared_shapes is not None and (h, w) not in shared_shapes:
+                return cv2.matchTemplate(image, template, method)
+
+            window_sum, window_deviation = haystack_statistics.window_statistics(h, w, haystack_offset, image.shape[:2])
+            return BatchTemplateMatchingStrategy._normalized_correlation(
+                image, template, template_statistics, window_sum, window_deviation
+            )
+
+        # The needles are independent, they can be matched concurrently
+        return VisionExecutor.map(match_template, list(zip(templates, needle_statistics)))
+
+    @staticmethod
+    def find_all_rectangles(
+        image: np.ndarray, templates: list[np.ndarray], **kwargs
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """Return the grouped rectangles and weights of every template, in the same order"""
+
+        match_threshold = kwargs.get("threshold", 0.5)
+
+        return [
+            TemplateMatchingStrategy.rectangles_from_match_result(match_result, template.shape, match_threshold)
+            for match_result, template in zip(
+                BatchTemplateMatchingStrategy.match_templates(image, templates, **kwargs), templates
+            )
+        ]
+
+    @staticmethod
+    def find(image: np.ndarray, templates: list[np.ndarray], **kwargs) -> np.ndarray:
+        """Return the best (x,y,w,h) match of the first template found, in the given order, like
+        `TemplateMatchingStrategy.find` on each template. Templates are matched one by one, up to the first one found.
+        Returns an empty array if none of them is found.
+        """
+
+        match_threshold = kwargs.get("threshold", 0.5)
+        needle_statistics = kwargs.get("needle_statistics") or [None] * len(templates)
+
+        for template, template_statistics in zip(templates, needle_statistics):
+            match_result = BatchTemplateMatchingStrategy.match_templates(
+                image,
+                [template],
+                **{**kwargs, "needle_statistics": None if template_statistics is None else [template_statistics]},
+            )[0]
+            rectangles, weights = TemplateMatchingStrategy.rectangles_from_match_result(
+                match_result, template.shape, match_threshold
+            )
+            if len(rectangles):
+                # The rectangle with the highest weight
+                return rectangles[np.argmax(weights)]
+
+        return np.array([], dtype=np.int32).reshape(0, 4)
+
+    @staticmethod
+    def _normalized_correlation(
+        image: np.ndarray,
+        template: np.ndarray,
+        needle_statistics: NeedleStatistics,
+        window_sum: np.ndarray,
+        window_deviation: np.ndarray,
+    ) -> np.ndarray:
+        """`TM_CCOEFF_NORMED` given the precomputed statistics of the needle and the haystack windows"""
+
+        if needle_statistics.norm < np.finfo(np.float64).eps:
+            # Same convention as OpenCV for a flat template
+            return np.ones(window_deviation.shape, dtype=np.float32)
+
+        # Correlation with the zero-mean template, without having to convert the haystack to float
+        window_correction = cv2.transform(window_sum, needle_statistics.mean.reshape(1, -1))
+        numerator = cv2.subtract(
+            cv2.matchTemplate(image, template, cv2.TM_CCORR), window_correction.reshape(window_deviation.shape)
+        )
+
+        # OpenCV division yields 0 for flat windows, as expected
+        match_result = cv2.divide(numerator, window_deviation, scale=1 / needle_statistics.norm)
+
+        # Same rounding safeguards as OpenCV, only a handful of positions should reach them
+        out_of_range = np.abs(match_result) >= 1
+        match_result[out_of_range] = np.where(
+            np.abs(match_result[out_of_range]) < 1.125, np.sign(match_result[out_of_range]), 0
+        )
+
+        return match_result
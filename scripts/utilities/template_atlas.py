@@ -0,0 +1,155 @@
+"""Loading of the needle images used by `Vision`.
+
+Needles are loaded on first use only. If a template atlas has been built (see `template_atlas_builder.py`), they're
+read from it: a single file with all the needles already decoded, memory-mapped so that only the needles in use are
+actually read from disk. Needles whose image file changed after building the atlas are read from the image file.
+
+Atlas layout: an 8-byte magic string, the length of the JSON header as a little-endian uint64, the JSON header itself,
+and the raw pixels of every needle, each one aligned to `ALIGNMENT` bytes. The header maps every needle name to the
+`shape`, `dtype` and `offset` (from the start of the pixels) of its pixels, and to the `size` and `mtime` of its image.
+"""
+
+import json
+import os
+import threading
+
+import cv2
+import numpy as np
+
+IMAGES_DIR = "images"
+ATLAS_PATH = os.path.join(IMAGES_DIR, "templates.atlas")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+class TemplateAtlas:
+    """Namespace-like class to load needle images, from the template atlas if available"""
+
+    MAGIC = b"7DSATLS1"
+    ALIGNMENT = 64
+
+    _lock = threading.Lock()
+    # Lazily opened: None if not opened yet, False if there's no (valid) atlas
+    _atlas: tuple[np.memmap, dict] | bool | None = None
+
+    @staticmethod
+    def load_template(needle_basename: str) -> np.ndarray | None:
+        """Load the needle image, given its path relative to the images directory.
+        Returns `None` if the image doesn't exist, just like `cv2.imread`.
+        """
+        needle_path = TemplateAtlas.get_path(needle_basename)
+
+        atlas = TemplateAtlas._get_atlas()
+        if atlas:
+            atlas_data, header = atlas
+            entry = header.get(TemplateAtlas.get_key(needle_basename))
+            if entry is not None and TemplateAtlas._is_up_to_date(entry, needle_path):
+                num_bytes = int(np.prod(entry["shape"])) * np.dtype(entry["dtype"]).itemsize
+                needle_data = atlas_data[entry["offset"] : entry["offset"] + num_bytes]
+                # A plain array viewing the memory-mapped pixels, nothing is read until it's used
+                return np.asarray(needle_data).view(entry["dtype"]).reshape(entry["shape"])
+
+        return cv2.imread(needle_path)
+
+    @staticmethod
+    def get_path(needle_basename: str) -> str:
+        """Path of the needle image. Needle names use backslashes (Windows paths), any separator works on any platform"""
+        return os.path.join(IMAGES_DIR, *needle_basename.replace("\\", "/").split("/"))
+
+    @staticmethod
+    def get_key(needle_basename: str) -> str:
+        """Needle names are case-insensitive and use forward slashes, like on Windows but on any platform"""
+        return needle_basename.replace("\\", "/").lower()
+
+    @staticmethod
+    def build(atlas_path: str = ATLAS_PATH) -> int:
+        """Decode all the images in the images directory and pack them into a template atlas.
+        Returns the number of packed needles.
+        """
+        header = {}
+        needle_imgs = []
+        offset = 0
+        for dirpath, _, filenames in os.walk(IMAGES_DIR):
+            for filename in sorted(filenames):
+                if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+
+                image_path = os.path.join(dirpath, filename)
+                needle_img = cv2.imread(image_path)
+                if needle_img is None:
+                    continue
+
+                image_stat = os.stat(image_path)
+                header[TemplateAtlas.get_key(os.path.relpath(image_path, IMAGES_DIR))] = {
+                    "shape": needle_img.shape,
+                    "dtype": needle_img.dtype.str,
+                    "offset": offset,
+                    "size": image_stat.st_size,
+                    "mtime": image_stat.st_mtime_ns,
+                }
+                needle_imgs.append(needle_img)
+                offset += TemplateAtlas._aligned(needle_img.nbytes)
+
+        encoded_header = json.dumps(header).encode()
+        data_start = TemplateAtlas._data_start(len(encoded_header))
+
+        # Write to a temporary file first, so that a failed build never leaves a half-written atlas behind
+        temporary_path = atlas_path + ".tmp"
+        with open(temporary_path, "wb") as atlas_file:
+            atlas_file.write(TemplateAtlas.MAGIC)
+            atlas_file.write(len(encoded_header).to_bytes(8, "little"))
+            atlas_file.write(encoded_header)
+            atlas_file.write(b"\0" * (data_start - atlas_file.tell()))
+            for needle_img in needle_imgs:
+                atlas_file.write(np.ascontiguousarray(needle_img).tobytes())
+                atlas_file.write(b"\0" * (TemplateAtlas._aligned(needle_img.nbytes) - needle_img.nbytes))
+        os.replace(temporary_path, atlas_path)
+
+        with TemplateAtlas._lock:
+            # Re-open it on next use
+            TemplateAtlas._atlas = None
+
+        return len(needle_imgs)
+
+    @staticmethod
+    def _get_atlas() -> tuple[np.memmap, dict] | bool:
+        """Open the template atlas the first time it's needed"""
+        with TemplateAtlas._lock:
+            if TemplateAtlas._atlas is None:
+                TemplateAtlas._atlas = TemplateAtlas._open_atlas(ATLAS_PATH)
+            return TemplateAtlas._atlas
+
+    @staticmethod
+    def _open_atlas(atlas_path: str) -> tuple[np.memmap, dict] | bool:
+        if not os.path.isfile(atlas_path):
+            return False
+
+        try:
+            with open(atlas_path, "rb") as atlas_file:
+                if atlas_file.read(len(TemplateAtlas.MAGIC)) != TemplateAtlas.MAGIC:
+                    print(f"Ignoring '{atlas_path}', it's not a template atlas.")
+                    return False
+                header_length = int.from_bytes(atlas_file.read(8), "little")
+                header = json.loads(atlas_file.read(header_length))
+            data_start = TemplateAtlas._data_start(header_length)
+            return np.memmap(atlas_path, dtype=np.uint8, mode="r", offset=data_start), header
+        except (OSError, ValueError) as e:
+            print(f"Ignoring the template atlas, it cannot be read: {e}")
+            return False
+
+    @staticmethod
+    def _is_up_to_date(entry: dict, needle_path: str) -> bool:
+        """Whether the image file is still the one packed into the atlas"""
+        try:
+            image_stat = os.stat(needle_path)
+        except OSError:
+            return False
+        return image_stat.st_size == entry["size"] and image_stat.st_mtime_ns == entry["mtime"]
+
+    @staticmethod
+    def _data_start(header_length: int) -> int:
+        """Where the pixels start, right after the header"""
+        return TemplateAtlas._aligned(len(TemplateAtlas.MAGIC) + 8 + header_length)
+
+    @staticmethod
+    def _aligned(num_bytes: int) -> int:
+        return -(-num_bytes // TemplateAtlas.ALIGNMENT) * TemplateAtlas.ALIGNMENT
@@ -0,0 +1,90 @@
+"""Pacing of the state machine loops of the farmers and fighters.
+
+Instead of sleeping a fixed interval between ticks, a loop asks its `TickScheduler` to wait. Ticks come every
+`min_interval` while the screen or the state keep changing, and the interval grows by `backoff` on every tick where
+nothing changed, up to `max_interval` (or the deadline of the current state). While waiting, the screen is watched (see
+`FrameChangeDetector`), and any change wakes the loop up right away: the loop reacts as soon as the game is ready,
+and does almost nothing while the game sits on a static screen. Watching reuses the frames other threads captured in the
+meantime, without converting them.
+"""
+
+import time
+from typing import Hashable
+
+import numpy as np
+from utilities.capture_window import capture_frame
+from utilities.clock import Clock
+from utilities.frame_cache import FrameCache
+from utilities.frame_change import FrameChangeDetector
+from utilities.tracing import Tracer
+
+
+class TickScheduler:
+    """Decides when the next tick of a loop happens"""
+
+    # While waiting, the screen is checked this many times per interval
+    CHECKS_PER_INTERVAL = 4
+
+    def __init__(
+        self,
+        min_interval: float,
+        max_interval: float,
+        backoff: float = 1.5,
+        state_deadlines: dict[Hashable, float] | None = None,
+    ):
+        """Intervals are in seconds. `state_deadlines` caps the interval of the given states, for the states that need
+        to be re-evaluated regularly even if nothing changes on the screen (e.g., waiting on another thread).
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.state_deadlines = state_deadlines or {}
+
+        self._interval = min_interval
+        self._last_state: Hashable | None = None
+        self._last_frame: np.ndarray | None = None
+        # End of the previous wait, i.e., start of the current tick
+        self._tick_start_time: float | None = None
+
+    def wait(self, state: Hashable | None = None):
+        """Wait for the next tick, given the state the loop is in now"""
+        if self._tick_start_time is not None:
+            Tracer.record(f"tick:{state}", time.perf_counter() - self._tick_start_time)
+        with Tracer.span("sleep:tick"):
+            self._wait(state)
+        self._tick_start_time = time.perf_counter()
+
+    def _wait(self, state: Hashable | None):
+        frame = FrameCache.get_latest_frame()
+
+        # React fast to whatever just changed, slow down while nothing does
+        if state != self._last_state or self._has_changed(frame, self._last_frame):
+            self._interval = self.min_interval
+        else:
+            self._interval = min(self._interval * self.backoff, self.max_interval)
+        self._last_state, self._last_frame = state, frame
+
+        timeout = min(self._interval, self.state_deadlines.get(state, self.max_interval))
+        deadline = Clock.now() + timeout
+        if frame is None or timeout <= self.min_interval:
+            # Nothing to watch, or no time to
+            Clock.sleep(timeout)
+            return
+
+        check_interval = max(self.min_interval, timeout / self.CHECKS_PER_INTERVAL)
+        while (remaining := deadline - Clock.now()) > 0:
+            Clock.sleep(min(check_interval, remaining))
+            # Any frame captured since the previous check will do
+            if self._has_changed(capture_frame(max_age=check_interval)[0].raw_image, frame):
+                return
+
+    def reset(self):
+        """Make the next tick come fast, e.g., after acting on the game"""
+        self._interval = self.min_interval
+        self._last_state = self._last_frame = None
+
+    @staticmethod
+    def _has_changed(frame: np.ndarray | None, previous_frame: np.ndarray | None) -> bool:
+        return (
+            frame is not None and previous_frame is not None and FrameChangeDetector.has_changed(frame, previous_frame)
+        )
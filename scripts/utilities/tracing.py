@@ -0,0 +1,158 @@
+"""Lightweight latency tracing, to know where the time of a tick or a turn goes.
+
+Spans time the main steps from capture to click (`capture_window`, `Vision.find`, the model predictions, `pick_cards`,
+`play_cards`, every input action and the sleeps in between), and the time spent in each state of the farmers and
+fighters, e.g., the duration of a whole turn in `FightingStates.MY_TURN`. Durations are aggregated into log-scale
+histograms, so that recording a span only costs a couple of microseconds and a constant amount of memory, and the
+percentiles of every span are printed when the farmer exits.
+
+Spans time the code on the wall clock, even when replaying a recording, to know what it costs, whereas the time spent
+in each state follows the `Clock`, like the farmers do.
+"""
+
+import functools
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Hashable
+
+from utilities.clock import Clock
+
+
+class LatencyHistogram:
+    """Durations in buckets growing by `2 ** (1 / BUCKETS_PER_OCTAVE)`, precise enough for percentiles"""
+
+    BUCKETS_PER_OCTAVE = 4
+    # Durations shorter than this (in seconds) all go in the first bucket
+    MIN_DURATION = 1e-6
+
+    def __init__(self):
+        self.buckets: dict[int, int] = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration: float):
+        bucket = int(math.log2(max(duration, self.MIN_DURATION) / self.MIN_DURATION) * self.BUCKETS_PER_OCTAVE)
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def percentile(self, percentile: float) -> float:
+        """Approximate duration below which `percentile`% of the durations are (middle of its bucket)"""
+        rank = percentile / 100 * self.count
+        cumulative_count = 0
+        for bucket in sorted(self.buckets):
+            cumulative_count += self.buckets[bucket]
+            if cumulative_count >= rank:
+                return min(self.MIN_DURATION * 2 ** ((bucket + 0.5) / self.BUCKETS_PER_OCTAVE), self.max)
+        return self.max
+
+
+class Tracer:
+    """Namespace-like class that aggregates the durations of the traced spans"""
+
+    # Tracing costs way less than 1% of a tick, but it can be disabled altogether
+    enabled = True
+
+    _lock = threading.Lock()
+    _histograms: dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+    # Owner (e.g., a farmer or a fighter) -> (current state, since when)
+    _states: dict[Hashable, tuple[Hashable, float]] = {}
+
+    @staticmethod
+    def record(name: str, duration: float):
+        """Add the duration (in seconds) of the given span"""
+        if not Tracer.enabled:
+            return
+        with Tracer._lock:
+            Tracer._histograms[name].add(duration)
+
+    @staticmethod
+    def span(name: str) -> "Span":
+        """Context manager timing the code in it, e.g., `with Tracer.span("determine_card_merge"):`"""
+        return Span(name)
+
+    @staticmethod
+    def traced(name: str | None = None) -> Callable:
+        """Decorator timing every call of the function, under its qualified name unless `name` is given"""
+
+        def decorator(function: Callable) -> Callable:
+            span_name = name or function.__qualname__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not Tracer.enabled:
+                    return function(*args, **kwargs)
+                start_time = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    Tracer.record(span_name, time.perf_counter() - start_time)
+
+            return wrapper
+
+        return decorator
+
+    @staticmethod
+    def set_state(owner: Hashable, state: Hashable):
+        """Record how long `owner` (e.g., a farmer or fighter) stayed in its previous state, when it changes state"""
+        now = Clock.now()
+        with Tracer._lock:
+            previous_state, start_time = Tracer._states.get(owner, (None, now))
+            if previous_state == state:
+                return
+            Tracer._states[owner] = (state, now)
+        if previous_state is not None:
+            Tracer.record(f"state:{previous_state}", now - start_time)
+
+    @staticmethod
+    def stats() -> str:
+        """Latency percentiles of every span, in milliseconds"""
+        with Tracer._lock:
+            histograms = {name: histogram for name, histogram in Tracer._histograms.items() if histogram.count}
+        if not histograms:
+            return "Tracer: no spans recorded."
+
+        name_width = max(len(name) for name in histograms)
+        lines = [
+            f"{'Latency (ms)':<{name_width}} {'count':>7} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} "
+            f"{'total (s)':>10}"
+        ]
+        for name, histogram in sorted(histograms.items()):
+            durations = [
+                histogram.total / histogram.count,
+                histogram.percentile(50),
+                histogram.percentile(90),
+                histogram.percentile(99),
+                histogram.max,
+            ]
+            lines.append(
+                f"{name:<{name_width}} {histogram.count:>7} "
+                + " ".join(f"{1000 * duration:>9.2f}" for duration in durations)
+                + f" {histogram.total:>10.1f}"
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def reset():
+        with Tracer._lock:
+            Tracer._histograms.clear()
+
+
+class Span:
+    """Times the code within a `with` block, see `Tracer.span`"""
+
+    __slots__ = ("name", "start_time")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "Span":
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        Tracer.record(self.name, time.perf_counter() - self.start_time)
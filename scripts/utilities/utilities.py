@@ -1,3 +1,5 @@
+import contextlib
+import functools
 import glob
 import os
 import random
@@ -9,30 +11,32 @@ from typing import Callable, Union
 import cv2
 import dill as pickle
 import numpy as np
-import pyautogui
 import utilities.vision_images as vio
-import win32api
-import win32con
-import win32gui
-import win32ui
 from sklearn.linear_model import LogisticRegression
 from sklearn.neighbors import KNeighborsClassifier
+from utilities.actuator import Actuator
 from utilities.capture_window import capture_window
+from utilities.card_cache import CardCache
 from utilities.card_data import Card, CardRanks, CardTypes
+from utilities.card_identity import CardIdentifier
 from utilities.coordinates import Coordinates
+from utilities.hand_analyzer import HandAnalyzer, get_card_interior_image
+from utilities.merge_oracle import MergeOracle
 from utilities.models import (
     AmplifyCardPredictor,
-    CardMergePredictor,
-    CardTypePredictor,
     GroundCardPredictor,
     HAMCardPredictor,
     ThorCardPredictor,
 )
 from utilities.vision import Vision
+from utilities.vision_executor import VisionExecutor
 
 
 def get_window_size():
     """Get the size of the 7DS window"""
+    # The Windows-only modules are only imported when talking to the game, so that replays work on any platform
+    import win32gui
+
     hwnd_target = win32gui.FindWindow(None, r"7DS")
     window_rect = win32gui.GetWindowRect(hwnd_target)
     w = window_rect[2] - window_rect[0]
@@ -52,6 +56,8 @@ def draw_rectangles(
 
     # Expand to 2D if 1-dimensional
     rectangles = rectangles[None, ...] if rectangles.ndim == 1 else rectangles
+    # Captured frames are shared among threads, draw on a copy
+    haystack_img = haystack_img.copy()
 
     for x, y, w, h in rectangles:
         # determine the box positions
@@ -156,8 +162,11 @@ def click_im(rectangle_or_point: Union[np.ndarray, tuple], window_location: list
     click(x, y, sleep_after_click)
 
 
+@Actuator.serialized
 def move_to_location(point: np.ndarray | tuple, window_location: list[float]):
     """Move the cursor to a location without clicking on it"""
+    import pyautogui
+
     (x, y) = (point[0] + window_location[0], point[1] + window_location[1])
     pyautogui.moveTo(x, y)
     time.sleep(0.1)
@@ -171,29 +180,92 @@ def find(vision_image: Vision, screenshot: np.ndarray | None, threshold=0.7, met
     return bool(rectangle.size) if rectangle is not None else False
 
 
+def find_first(
+    candidates: list[Vision | tuple[Vision, float] | tuple[Vision, float, str | None]], screenshot: np.ndarray | None
+) -> tuple[int | None, np.ndarray]:
+    """Find the first of the candidates, given in order of priority, that shows up on the screenshot.
+    Each candidate is a `Vision`, a `(Vision, threshold)` tuple or a `(Vision, threshold, region)` tuple.
+    The cheapest candidates (small needle regions first) are searched first, and the search stops as soon as a hit is
+    confirmed, i.e., once all the candidates of higher priority are known to be missing.
+
+    Returns:
+        tuple[int | None, np.ndarray]: The index of the candidate found and its (x,y,w,h) rectangle,
+                                       or `None` and an empty rectangle if none of them is found.
+    """
+    not_found = None, np.array([], dtype=np.int32).reshape(0, 4)
+    if screenshot is None or not candidates:
+        return not_found
+
+    # Fill in the default threshold and region
+    searches = []
+    for candidate in candidates:
+        if isinstance(candidate, Vision):
+            candidate = (candidate, 0.7)
+        searches.append(candidate if len(candidate) == 3 else (*candidate, None))
+
+    # Ties keep the priority order
+    search_order = sorted(range(len(searches)), key=lambda i: searches[i][0].search_cost(screenshot, searches[i][2]))
+
+    def search(i: int) -> np.ndarray:
+        vision_image, threshold, region = searches[i]
+        rectangle = vision_image.find(screenshot, threshold=threshold, region=region)
+        return rectangle if rectangle is not None else not_found[1]
+
+    rectangles: list[np.ndarray | None] = [None] * len(searches)
+    first_unknown = 0
+    # The searches may run concurrently, closing the generator cancels the ones not needed anymore
+    searches_done = VisionExecutor.as_completed(search, search_order)
+    with contextlib.closing(searches_done):
+        for order_index, rectangle in searches_done:
+            rectangles[search_order[order_index]] = rectangle
+
+            # Go over the results in priority order, until reaching one we don't know yet
+            while first_unknown < len(rectangles) and rectangles[first_unknown] is not None:
+                if rectangles[first_unknown].size:
+                    return first_unknown, rectangles[first_unknown]
+                first_unknown += 1
+
+    return not_found
+
+
+def find_any(vision_images: list[Vision], screenshot: np.ndarray | None, threshold=0.7) -> bool:
+    """Whether any of the given needles shows up on the screenshot, searching them concurrently if possible"""
+    if screenshot is None:
+        return False
+
+    searches_done = VisionExecutor.as_completed(
+        lambda vision_image: find(vision_image, screenshot, threshold), vision_images
+    )
+    with contextlib.closing(searches_done):
+        return any(found for _, found in searches_done)
+
+
 def find_and_click(
     vision_image: Vision,
     screenshot: np.ndarray,
     window_location: list[float],
     threshold=0.7,
     point_coordinates: tuple[float, float] | None = None,
+    settle_time=0.5,  # In seconds
 ) -> bool:
     """Tries to find the given `vision_image` on the screenshot; if it is found, clicks on it.
     `point_coordinates` can be a tuple with the hardcoded coordinates to click on. TODO: This should be improved
+    Waits `settle_time` for the game to react, in the background if the `Actuator` is running.
+    Returns whether it clicked, i.e., `False` only if the needle isn't on the screen.
     """
     rectangle = vision_image.find(screenshot, threshold=threshold)
-    if rectangle.size:
-        if point_coordinates:
-            click_im(point_coordinates, window_location)
-        else:
-            # If point coordinates not provided, click on the rectangle center
-            click_im(rectangle, window_location)
-
-        print(f"Clicked on '{vision_image.image_name}'")
+    while rectangle.size:
+        # If point coordinates not provided, click on the rectangle center
+        click_point = point_coordinates if point_coordinates else rectangle
 
-        time.sleep(0.5)
+        if Actuator.perform(functools.partial(click_im, click_point, window_location), screenshot, settle_time):
+            print(f"Clicked on '{vision_image.image_name}'")
+            return True
 
-        return True
+        # The screenshot predates the game's reaction to a click of another thread, the needle may not be there anymore:
+        # look for it again on a frame captured once the game has reacted
+        screenshot, window_location = capture_window()
+        rectangle = vision_image.find(screenshot, threshold=threshold)
 
     return False
 
@@ -207,17 +279,17 @@ def click_and_sleep(
     sleep_time=1,  # In seconds
 ) -> bool:
     """First click, then sleep for 1 sec"""
-    if find_and_click(vision_image, screenshot, window_location, threshold, point_coordinates):
-        time.sleep(sleep_time)
-        return True
-    return False
+    return find_and_click(
+        vision_image, screenshot, window_location, threshold, point_coordinates, settle_time=0.5 + sleep_time
+    )
 
 
 def find_floor_coordinates(screenshot: np.ndarray, window_location):
     """Given a screenshot of the DB screen, find the coordinates of the available floor"""
     rectangle = vio.available_floor.find(screenshot, threshold=0.8)
     if rectangle.size:
-        w, _ = get_window_size()
+        # Measured on the captured frames, instead of asking the window for its size every time
+        w, _ = Coordinates.get_window_size()
 
         x = w // 2  # Click on the middle with of the image...
         y = rectangle[1]  # At the same height as the arrow
@@ -227,22 +299,36 @@ def find_floor_coordinates(screenshot: np.ndarray, window_location):
     return None
 
 
+@Actuator.serialized
 def click(x, y, sleep_after_click=0.01):
+    import pyautogui
+    import win32api
+    import win32con
+
     pyautogui.moveTo(x, y)
     win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN, 0, 0)
     time.sleep(sleep_after_click)
     win32api.mouse_event(win32con.MOUSEEVENTF_LEFTUP, 0, 0)
 
 
+@Actuator.serialized
 def rclick(x, y, sleep_after_click=0.01):
+    import pyautogui
+    import win32api
+    import win32con
+
     pyautogui.moveTo(x, y)
     win32api.mouse_event(win32con.MOUSEEVENTF_RIGHTDOWN, 0, 0)
     time.sleep(sleep_after_click)
     win32api.mouse_event(win32con.MOUSEEVENTF_RIGHTUP, 0, 0)
 
 
+@Actuator.serialized
 def click_and_drag(start_x, start_y, end_x, end_y, steps=100, sleep_after_click=0.01, drag_duration=0.5):
     """Move to the start position and press the left mouse button down"""
+    import win32api
+    import win32con
+
     win32api.SetCursorPos((start_x, start_y))
     win32api.mouse_event(win32con.MOUSEEVENTF_LEFTDOWN, 0, 0)
 
@@ -283,7 +369,10 @@ def drag_im(start_point, end_point, window_location, steps=100, sleep_after_clic
     )
 
 
+@Actuator.serialized
 def press_key(key: str):
+    import pyautogui
+
     pyautogui.press(key)
 
 
@@ -342,23 +431,6 @@ def capture_hand_image() -> np.ndarray:
     )
 
 
-def get_card_type_image(card: np.ndarray) -> np.ndarray:
-    """Extract the card type image from the card"""
-    w = card.shape[-2]
-    return crop_image(card, (40, 0), (w, 20))
-
-
-def get_card_interior_image(card_image: np.ndarray) -> np.ndarray:
-    """Get the inside of the card, without the border.
-    TODO: Very hardcoded, fix in the future for other resolution."""
-    border = 8
-    return crop_image(
-        card_image,
-        (border, border + 4),
-        (card_image.shape[1] - border, card_image.shape[0] - border - 12),
-    )
-
-
 def get_hand_cards() -> list[Card]:
     """Retrieve the current cards in the hand.
 
@@ -366,21 +438,12 @@ def get_hand_cards() -> list[Card]:
         list[Card]:   The hand of cards. It's a list of tuples; each tuple contains the card type,
                                             the `np.ndarray` card, as an image, and a tuple with the top-left coordinates of the card.
     """
-    hand_cards = capture_hand_image()
-    # display_image(hand_cards)
-
-    # Determine the width of each column
-    height, width = hand_cards.shape[:2]
-    column_width = width / 8  # Calculate the width of each column
-    column_width = int(column_width)
-
-    # Split the image into 8 equal columns -- TODO: Not the best way to do it, doesn't work well
-    house_of_cards = [
-        ([61 + i * column_width, 822, column_width, height], hand_cards[:, i * column_width : (i + 1) * column_width])
-        for i in range(8)
-    ]
-
-    return [Card(determine_card_type(card[-1]), *card, determine_card_rank(card[-1])) for card in house_of_cards]
+    screenshot, _ = capture_window()
+    # All the cards are read at once, see `HandAnalyzer`
+    hand_of_cards = HandAnalyzer.get_hand_cards(screenshot)
+    # Merges between these cards are predicted all at once, the first time they're needed
+    MergeOracle.set_hand([card.card_image for card in hand_of_cards])
+    return hand_of_cards
 
 
 def get_card_slot_region_image(screenshot: np.ndarray) -> np.ndarray:
@@ -394,19 +457,9 @@ def get_card_slot_region_image(screenshot: np.ndarray) -> np.ndarray:
 
 def determine_card_type(card: np.ndarray | None) -> CardTypes:
     """Predict the card type"""
-
-    # First, use the ground predictor. If it returns GROUND, no need to explore further
-    if card is None or GroundCardPredictor.is_ground_card(get_card_interior_image(card)):
+    if card is None:
         return CardTypes.GROUND
-
-    # If the above didn't return GROUND, explore it further. This logic allows for backwards compatibility (with Bird, for instance)
-    card_type_image = get_card_type_image(card)
-    card_type = CardTypePredictor.predict_card_type(card_type_image)
-    # If we predict GROUND, assume it's an ULTIMATE, therefore relying entirely on the GroundCardPredictor
-    if card_type == CardTypes.GROUND:
-        print("Detecting GROUND, but setting ULTIMATE instead. Is this correct?")
-        card_type = CardTypes.ULTIMATE
-    return card_type
+    return HandAnalyzer.determine_card_types([card])[0]
 
 
 def determine_card_merge(card_1: Card | None, card_2: Card | None) -> bool:
@@ -415,11 +468,8 @@ def determine_card_merge(card_1: Card | None, card_2: Card | None) -> bool:
     if card_1.card_type in [CardTypes.NONE, CardTypes.GROUND] or card_2.card_type in [CardTypes.NONE, CardTypes.GROUND]:
         return 0
 
-    card_1_interior = get_card_interior_image(card_1.card_image)
-    card_2_interior = get_card_interior_image(card_2.card_image)
-
     return (
-        CardMergePredictor.predict_card_merge(card_1_interior, card_2_interior)
+        MergeOracle.predict_merge(card_1.card_image, card_2.card_image)
         and card_1.card_rank == card_2.card_rank
         and card_1.card_rank != CardRanks.GOLD
     )
@@ -443,23 +493,18 @@ def determine_card_rank(card: np.ndarray) -> CardRanks:
 def determine_db_floor(screenshot: np.ndarray, threshold=0.9) -> int:
     """Determine the Demonic Beast floor"""
     # sourcery skip: assign-if-exp, reintroduce-else
-    floor_img_region = crop_image(
-        screenshot,
-        Coordinates.get_coordinates("floor_top_left"),
-        Coordinates.get_coordinates("floor_bottom_right"),
-    )
+    # NOTE: The floor images are only searched in the "db_floor" region of the screenshot
 
-    # display_image(floor_img_region)
-    # screenshot_testing(floor_img_region, vio.floor1, threshold=threshold)
+    # screenshot_testing(screenshot, vio.floor1, threshold=threshold)
 
     # Default
     db_floor = -1
 
-    if find(vio.floor2, floor_img_region, threshold=threshold):
+    if find(vio.floor2, screenshot, threshold=threshold):
         db_floor = 2
-    elif find(vio.floor3, floor_img_region, threshold=threshold):
+    elif find(vio.floor3, screenshot, threshold=threshold):
         db_floor = 3
-    elif find(vio.floor1, floor_img_region, threshold=threshold):
+    elif find(vio.floor1, screenshot, threshold=threshold):
         db_floor = 1
 
     print(f"We're gonna fight floor {db_floor}.")
@@ -467,6 +512,7 @@ def determine_db_floor(screenshot: np.ndarray, threshold=0.9) -> int:
     return db_floor
 
 
+@CardCache.cached
 def is_amplify_card(card: Card) -> bool:
     """Identify if a card is amplify or Thor"""
     if card.card_image is None:
@@ -476,6 +522,7 @@ def is_amplify_card(card: Card) -> bool:
     return AmplifyCardPredictor.is_amplify_card(card_interior)
 
 
+@CardCache.cached
 def is_hard_hitting_card(card: Card) -> bool:
     """Identify if a card is a card-hitting card"""
     if card.card_image is None:
@@ -485,6 +532,7 @@ def is_hard_hitting_card(card: Card) -> bool:
     return HAMCardPredictor.is_HAM_card(card_interior)
 
 
+@CardCache.cached
 def is_Thor_card(card: Card) -> bool:
     """Identify Thor cards"""
     if card.card_image is None:
@@ -495,11 +543,7 @@ def is_Thor_card(card: Card) -> bool:
 
 def is_Meli_card(card: Card) -> bool:
     """Identify a Traitor Meli card"""
-    return not is_ground_card(card) and (
-        find(vio.meli_ult, card.card_image)
-        or find(vio.meli_aoe, card.card_image)
-        or find(vio.meli_ampli, card.card_image)
-    )
+    return not is_ground_card(card) and CardIdentifier.is_unit(card, "meli")
 
 
 def is_ground_card(card: Card) -> bool:
@@ -521,22 +565,12 @@ def is_ground_region(screenshot: np.ndarray, rectangle: tuple[float, float, floa
 
 def is_stance_cancel_card(card: Card) -> bool:
     """Return whether the card is Stance Cancel"""
-    if card.card_image is None:
-        return False
-    return find(vio.freyja_st, card.card_image) or find(vio.margaret_st, card.card_image)
+    return CardIdentifier.has_flag(card, "stance_cancel")
 
 
 def is_hard_hitting_snake_card(card: Card) -> bool:
     """Return whether a card can be used as hard-hitting on Snake (excluding ultimates)"""
-    if card.card_image is None:
-        return False
-    card_image = card.card_image
-    return (
-        find(vio.mael_aoe, card_image)
-        or find(vio.mael_st, card_image)
-        or find(vio.freyja_st, card_image)
-        or find(vio.freyja_aoe, card_image)
-    )
+    return CardIdentifier.has_flag(card, "hard_hitting_snake")
 
 
 def display_image(image: np.ndarray, title: str = "Image"):
@@ -577,8 +611,11 @@ def save_model(model: KNeighborsClassifier | LogisticRegression, filename: str):
     print(f"Model saved in '{model_path}'")
 
 
+@Actuator.serialized
 def type_word(word: str):
     """Types a word to the screen; useful to re-introduce the password if needed"""
+    import pyautogui
+
     # To simulate human typing, just for fun
     delays = [random.uniform(0.1, 0.2) for _ in word]
     for char, delay in zip(word, delays):
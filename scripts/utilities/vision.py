@@ -1,33 +1,113 @@
+import functools
+import itertools
 import os
+from enum import Enum, auto
+from typing import Any, Callable
 
 import cv2
 import numpy as np
 from termcolor import cprint
+from utilities.coordinates import Coordinates
+from utilities.frame import Frame
+from utilities.frame_cache import FrameCache
+from utilities.frame_change import FrameChangeDetector
 from utilities.pattern_match_strategies import (
+    BatchTemplateMatchingStrategy,
+    HaystackStatistics,
     IMatchingStrategy,
-    TemplateMatchingStrategy,
+    NeedleStatistics,
+    NormalizedTemplateMatchingStrategy,
 )
+from utilities.template_atlas import TemplateAtlas
+from utilities.tracing import Tracer
+
+
+class ColorMode(Enum):
+    """The color space in which a needle is matched. Frames are converted only once, and shared by all the needles
+    matched in the same color mode. Gray is enough for needles with a distinctive luminance (e.g., buttons), and it's a
+    third of the data to match.
+    """
+
+    BGR = auto()
+    GRAY = auto()
+    # Gray at half the resolution, for large needles with little detail
+    HALF_GRAY = auto()
+
+    @property
+    def scale(self) -> int:
+        """How many pixels of the original image each pixel of the converted one spans, per axis"""
+        return 2 if self is ColorMode.HALF_GRAY else 1
+
+    def convert(self, image: np.ndarray) -> np.ndarray:
+        """Convert a BGR (or already gray) image to this color mode"""
+        if self is ColorMode.BGR:
+            return image
+
+        gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        if self is ColorMode.HALF_GRAY:
+            return cv2.resize(gray_image, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+        return gray_image
 
 
 class Vision:
     """Class to host a single image template to match"""
 
-    def __init__(self, needle_basename, matching_strategy: IMatchingStrategy = TemplateMatchingStrategy):
-        """Receives the needle image to search on a haystack, and the matching algorithm to use"""
+    # Unlike `id()`, never reused by a new instance, so that cached matches can't be mixed up
+    _cache_ids = itertools.count()
 
-        needle_path = os.path.join("images", needle_basename)
+    def __init__(
+        self,
+        needle_basename,
+        matching_strategy: IMatchingStrategy = NormalizedTemplateMatchingStrategy,
+        region: str | None = None,
+        color_mode: ColorMode = ColorMode.BGR,
+        reuse_unchanged: bool = False,
+    ):
+        """Receives the needle image to search on a haystack, and the matching algorithm to use.
+        If `region` is given (see `Coordinates.get_region`), only that part of a screenshot is searched.
+        A cheaper `color_mode` can be given for needles that don't need to be matched in full color.
+        With `reuse_unchanged`, a search isn't done again on a new frame if the searched region didn't change (see
+        `FrameChangeDetector`), for the needles polled while waiting on a static screen.
+        """
 
         # Save the pattern matching strategy as an attribute
         self.matching_strategy = matching_strategy
+        self.color_mode = color_mode
+        self.reuse_unchanged = reuse_unchanged
+
+        # The region of the window where the needle can appear
+        self.region = region
+        self._cache_id = next(Vision._cache_ids)
 
         # Save the name of the needle image
-        self._image_name = os.path.basename(needle_basename).split(".")[0]
+        self._image_name = os.path.basename(TemplateAtlas.get_path(needle_basename)).split(".")[0]
 
-        # Store the needle image
-        self.needle_img = cv2.imread(needle_path)
-        if self.needle_img is None:
-            cprint(f"No image can be found for '{needle_basename}'", "yellow")
-            return
+        # The needle image is only loaded the first time it's needed
+        self._needle_basename = needle_basename
+        # What depends on the size of the game window, per scale
+        self._window_scale_cache: dict[tuple[str, float], Any] = {}
+
+    @functools.cached_property
+    def needle_img(self) -> np.ndarray | None:
+        """The needle image, loaded on first use"""
+        needle_img = TemplateAtlas.load_template(self._needle_basename)
+        if needle_img is None:
+            cprint(f"No image can be found for '{self._needle_basename}'", "yellow")
+        return needle_img
+
+    @property
+    def search_needle_img(self) -> np.ndarray:
+        """The needle image in the color mode it's matched, at the scale of the game window"""
+        return self._at_window_scale(
+            "search_needle_img", lambda: self.color_mode.convert(Coordinates.scale_template(self.needle_img))
+        )
+
+    @property
+    def needle_statistics(self) -> NeedleStatistics:
+        """Computed once per window scale, instead of on every match"""
+        return self._at_window_scale(
+            "needle_statistics", lambda: NeedleStatistics.from_template(self.search_needle_img)
+        )
 
     @property
     def image_name(self) -> str:
@@ -38,29 +118,192 @@ class Vision:
             raise NotImplementedError(f"Cannot compare Vision instance with {type(other)}")
         return self.image_name == other.image_name
 
-    def find(self, haystack_img, threshold=0.5, method=cv2.TM_CCOEFF_NORMED) -> np.ndarray:
+    @Tracer.traced()
+    def find(self, haystack_img, threshold=0.5, method=cv2.TM_CCOEFF_NORMED, region: str | None = None) -> np.ndarray:
         """Run the defined pattern matching strategy.
+        If given, `region` is searched instead of the default region of the needle.
 
         Returns:
             np.ndarray: 1-D numpy array of shape (4,) with the (x,y,w,h) coordinates of the found rectangle.
                         Or `[]` if not found.
         """
+        region = region or self.region
+        return self._get_or_compute(
+            haystack_img,
+            ("find", self._cache_id, threshold, method, region),
+            region,
+            lambda: self._find(haystack_img, threshold=threshold, method=method, region=region),
+        )
+
+    def find_all_rectangles(
+        self, haystack_img, threshold=0.5, method=cv2.TM_CCOEFF_NORMED, region: str | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Find all the rectangles corresponding to the needle image.
+        If given, `region` is searched instead of the default region of the needle.
+        """
+        region = region or self.region
+        return self._get_or_compute(
+            haystack_img,
+            ("find_all_rectangles", self._cache_id, threshold, method, region),
+            region,
+            lambda: self._find_all_rectangles(haystack_img, threshold=threshold, method=method, region=region),
+        )
+
+    def search_cost(self, haystack_img: np.ndarray, region: str | None = None) -> int:
+        """Rough estimate of how expensive finding the needle is, i.e., how many pixel values are searched"""
+        if self.needle_img is None:
+            return 0
+        return self._search_cost(haystack_img, [self.search_needle_img], region)
+
+    def _find(self, haystack_img, threshold=0.5, method=cv2.TM_CCOEFF_NORMED, region: str | None = None) -> np.ndarray:
+        """The actual pattern matching behind `find`, without caching"""
         if self.needle_img is None:
             return None
 
-        return self.matching_strategy.find(haystack_img, self.needle_img, threshold=threshold, cv_method=method)
+        search_img, offset, haystack_statistics = self._prepare_haystack(haystack_img, [self.search_needle_img], region)
+        rectangle = self.matching_strategy.find(
+            search_img,
+            self.search_needle_img,
+            threshold=threshold,
+            cv_method=method,
+            needle_statistics=self.needle_statistics,
+            haystack_statistics=haystack_statistics,
+            haystack_offset=offset,
+        )
 
-    def find_all_rectangles(
-        self, haystack_img, threshold=0.5, method=cv2.TM_CCOEFF_NORMED
+        return self._to_haystack_coordinates(rectangle, offset)
+
+    def _find_all_rectangles(
+        self, haystack_img, threshold=0.5, method=cv2.TM_CCOEFF_NORMED, region: str | None = None
     ) -> tuple[np.ndarray, np.ndarray]:
-        """Find all the rectangles corresponding to the needle image."""
+        """The actual pattern matching behind `find_all_rectangles`, without caching"""
         if self.needle_img is None:
             return None
 
-        return self.matching_strategy.find_all_rectangles(
-            haystack_img, self.needle_img, threshold=threshold, method=method
+        search_img, offset, haystack_statistics = self._prepare_haystack(haystack_img, [self.search_needle_img], region)
+        rectangles, weights = self.matching_strategy.find_all_rectangles(
+            search_img,
+            self.search_needle_img,
+            threshold=threshold,
+            method=method,
+            needle_statistics=self.needle_statistics,
+            haystack_statistics=haystack_statistics,
+            haystack_offset=offset,
         )
 
+        return self._to_haystack_coordinates(rectangles, offset), weights
+
+    def _at_window_scale(self, name: str, compute: Callable[[], Any]) -> Any:
+        """The result of `compute`, computed again when the game window is resized"""
+        key = (name, Coordinates.get_template_scale())
+        if (result := self._window_scale_cache.get(key)) is None:
+            result = self._window_scale_cache[key] = compute()
+        return result
+
+    def _get_or_compute(
+        self, haystack_img: np.ndarray, key: tuple, region: str | None, compute: Callable[[], Any]
+    ) -> Any:
+        """Compute a search result once per frame, and not even that if the searched region didn't change since the
+        same search was done on a previous frame (only with `reuse_unchanged`)
+        """
+        if not self.reuse_unchanged:
+            return FrameCache.get_or_compute(haystack_img, key, compute)
+
+        if region is None:
+            rectangle = None
+        else:
+            (x1, y1), (x2, y2) = Coordinates.get_region(region)
+            rectangle = (x1, y1, x2 - x1, y2 - y1)
+
+        return FrameCache.get_or_compute(
+            haystack_img, key, lambda: FrameChangeDetector.reuse_if_unchanged(haystack_img, key, rectangle, compute)
+        )
+
+    def _prepare_haystack(
+        self, haystack_img: np.ndarray, needle_imgs: list[np.ndarray], region: str | None
+    ) -> tuple[np.ndarray, tuple[int, int], HaystackStatistics | None]:
+        """Convert the haystack to the color mode of the needles and crop it to the searched region.
+        Returns the image to search, its offset in the converted haystack, and the statistics of the converted haystack.
+        """
+        search_img = self._convert_haystack(haystack_img, self.color_mode)
+        haystack_statistics = self._get_haystack_statistics(haystack_img, search_img, self.color_mode)
+        search_img, offset = self._crop_to_region(search_img, needle_imgs, region)
+        return search_img, offset, haystack_statistics
+
+    def _search_cost(self, haystack_img: np.ndarray, needle_imgs: list[np.ndarray], region: str | None) -> int:
+        """Number of pixel values searched for each needle"""
+        scale = self.color_mode.scale
+        num_channels = 3 if self.color_mode is ColorMode.BGR else 1
+        # No need to convert the haystack just to know its size
+        search_shape = (haystack_img.shape[0] // scale, haystack_img.shape[1] // scale)
+        search_img, _ = self._crop_to_region(np.broadcast_to(np.uint8(0), search_shape), needle_imgs, region)
+        return search_img.shape[0] * search_img.shape[1] * num_channels
+
+    @staticmethod
+    def _convert_haystack(haystack_img: np.ndarray, color_mode: ColorMode) -> np.ndarray:
+        """Convert the haystack to the given color mode, only once per captured frame"""
+        if color_mode is ColorMode.BGR:
+            return haystack_img
+
+        # The frame converts itself straight from the captured buffer
+        gray_img = Frame.of(haystack_img).gray
+        if color_mode is ColorMode.GRAY:
+            return gray_img
+
+        # Half gray is just a downscaled gray, that other needles may have needed already
+        return FrameCache.get_or_compute(haystack_img, ("haystack", color_mode), lambda: color_mode.convert(gray_img))
+
+    @staticmethod
+    def _get_haystack_statistics(
+        haystack_img: np.ndarray, search_img: np.ndarray, color_mode: ColorMode
+    ) -> HaystackStatistics | None:
+        """The integral images of a captured frame, converted to `search_img`, shared by all the needles matched against
+        it. They're only built if the matching strategy makes use of them.
+        """
+        if not FrameCache.is_frame(haystack_img):
+            # Nothing to share them with
+            return None
+
+        return FrameCache.get_or_compute(
+            haystack_img, ("haystack_statistics", color_mode), lambda: HaystackStatistics(search_img)
+        )
+
+    def _crop_to_region(
+        self, haystack_img: np.ndarray, needle_imgs: list[np.ndarray], region: str | None = None
+    ) -> tuple[np.ndarray, tuple[int, int]]:
+        """Crop the (converted) haystack to the given region, or else the region of the needle, returning the crop and
+        its offset in the haystack. Haystacks that don't contain the region (e.g., a card image) are searched entirely.
+        """
+        region = region or self.region
+        if region is None:
+            return haystack_img, (0, 0)
+
+        scale = self.color_mode.scale
+        (x1, y1), (x2, y2) = ((x // scale, y // scale) for x, y in Coordinates.get_region(region))
+        if x1 >= haystack_img.shape[1] or y1 >= haystack_img.shape[0]:
+            return haystack_img, (0, 0)
+
+        region_img = haystack_img[y1:y2, x1:x2]
+        if any(
+            region_img.shape[0] < needle_img.shape[0] or region_img.shape[1] < needle_img.shape[1]
+            for needle_img in needle_imgs
+        ):
+            # The region got clipped by a smaller haystack, better search everywhere
+            return haystack_img, (0, 0)
+
+        return region_img, (x1, y1)
+
+    def _to_haystack_coordinates(self, rectangles: np.ndarray, offset: tuple[int, int]) -> np.ndarray:
+        """Bring the rectangles found in a region of the converted haystack back to the coordinates of the haystack"""
+        scale = self.color_mode.scale
+        if (offset == (0, 0) and scale == 1) or not len(rectangles):
+            return rectangles
+
+        translated_rectangles = np.array(rectangles, copy=True)
+        translated_rectangles[..., :2] += np.array(offset, dtype=translated_rectangles.dtype)
+        translated_rectangles *= scale
+        return translated_rectangles
+
 
 class MultiVision(Vision):
     """A class that will contain all OK buttons to be searched for in the screenshot"""
@@ -69,51 +312,109 @@ class MultiVision(Vision):
         self,
         *needle_basenames: str,
         image_name: str = None,
-        matching_strategy: IMatchingStrategy = TemplateMatchingStrategy,
+        matching_strategy: IMatchingStrategy = NormalizedTemplateMatchingStrategy,
+        batch_matching_strategy=BatchTemplateMatchingStrategy,
+        region: str | None = None,
+        color_mode: ColorMode = ColorMode.BGR,
+        reuse_unchanged: bool = False,
     ):
         """Receives the needle image to search on a haystack, and the matching algorithm to use"""
 
-        needle_paths = [os.path.join("images", needle_basename) for needle_basename in needle_basenames]
-
         # List with all OK image names
         self._image_names_list = [
-            os.path.basename(needle_basename).split(".")[0] for needle_basename in needle_basenames
+            os.path.basename(TemplateAtlas.get_path(needle_basename)).split(".")[0]
+            for needle_basename in needle_basenames
         ]
 
         # Save a single image name internally
         self._image_name = image_name
 
-        # Save the pattern matching strategy as an attribute
+        # Save the pattern matching strategies as attributes
         self.matching_strategy = matching_strategy
+        # To match all the needles against the same haystack in a single call
+        self.batch_matching_strategy = batch_matching_strategy
+        self.color_mode = color_mode
+        self.reuse_unchanged = reuse_unchanged
 
-        # Store the needle image
-        self.needle_imgs = [
-            cv2.imread(needle_path) for needle_path in needle_paths if cv2.imread(needle_path) is not None
+        # The region of the window where the needles can appear
+        self.region = region
+        self._cache_id = next(Vision._cache_ids)
+
+        # The needle images are only loaded the first time they're needed
+        self._needle_basenames = needle_basenames
+        # What depends on the size of the game window, per scale
+        self._window_scale_cache: dict[tuple[str, float], Any] = {}
+
+    @functools.cached_property
+    def needle_imgs(self) -> list[np.ndarray]:
+        """The needle images that can be found, loaded on first use"""
+        needle_imgs = [
+            needle_img
+            for needle_img in map(TemplateAtlas.load_template, self._needle_basenames)
+            if needle_img is not None
         ]
-        if not len(self.needle_imgs):
+        if not len(needle_imgs):
             raise ValueError("No image can be found for to create an MultiVision instance", "yellow")
+        return needle_imgs
 
-    def find(self, haystack_img, threshold=0.5, method=cv2.TM_CCOEFF_NORMED) -> np.ndarray:
-        """Run the defined pattern matching strategy.
+    @property
+    def search_needle_imgs(self) -> list[np.ndarray]:
+        """The needle images in the color mode they're matched, at the scale of the game window"""
+        return self._at_window_scale(
+            "search_needle_imgs",
+            lambda: [
+                self.color_mode.convert(Coordinates.scale_template(needle_img)) for needle_img in self.needle_imgs
+            ],
+        )
 
-        Returns:
-            np.ndarray: 1-D numpy array of shape (4,) with the (x,y,w,h) coordinates of the found rectangle.
-                        Or `[]` if not found.
-        """
-        for needle_img in self.needle_imgs:
-            found_best = self.matching_strategy.find(haystack_img, needle_img, threshold=threshold, cv_method=method)
-            if found_best.size:
-                return found_best
-        return found_best
+    @property
+    def needle_statistics(self) -> list[NeedleStatistics]:
+        """Computed once per window scale, instead of on every match"""
+        return self._at_window_scale(
+            "needle_statistics",
+            lambda: [NeedleStatistics.from_template(needle_img) for needle_img in self.search_needle_imgs],
+        )
 
-    def find_all_rectangles(
-        self, haystack_img, threshold=0.5, method=cv2.TM_CCOEFF_NORMED
+    def search_cost(self, haystack_img: np.ndarray, region: str | None = None) -> int:
+        """Rough estimate of how expensive finding any of the needles is, i.e., how many pixel values are searched"""
+        return self._search_cost(haystack_img, self.search_needle_imgs, region) * len(self.search_needle_imgs)
+
+    def _find(self, haystack_img, threshold=0.5, method=cv2.TM_CCOEFF_NORMED, region: str | None = None) -> np.ndarray:
+        """Return the best match of the first needle found, sharing the haystack statistics among the needles."""
+        search_img, offset, haystack_statistics = self._prepare_haystack(haystack_img, self.search_needle_imgs, region)
+        rectangle = self.batch_matching_strategy.find(
+            search_img,
+            self.search_needle_imgs,
+            threshold=threshold,
+            cv_method=method,
+            needle_statistics=self.needle_statistics,
+            haystack_statistics=haystack_statistics,
+            haystack_offset=offset,
+        )
+
+        return self._to_haystack_coordinates(rectangle, offset)
+
+    def _find_all_rectangles(
+        self, haystack_img, threshold=0.5, method=cv2.TM_CCOEFF_NORMED, region: str | None = None
     ) -> tuple[np.ndarray, np.ndarray]:
-        """Find all the rectangles corresponding to the needle image."""
-        for needle_img in self.needle_imgs:
-            all_rectangles, confidences = self.matching_strategy.find_all_rectangles(
-                haystack_img, needle_img, threshold=threshold, method=method
-            )
-            if len(all_rectangles) > 0:
-                return all_rectangles, confidences
-        return all_rectangles, confidences
+        """Find all the rectangles corresponding to the first needle image found."""
+        search_img, offset, haystack_statistics = self._prepare_haystack(haystack_img, self.search_needle_imgs, region)
+        all_found_rectangles = self.batch_matching_strategy.find_all_rectangles(
+            search_img,
+            self.search_needle_imgs,
+            threshold=threshold,
+            cv_method=method,
+            needle_statistics=self.needle_statistics,
+            haystack_statistics=haystack_statistics,
+            haystack_offset=offset,
+        )
+        all_rectangles, confidences = next(
+            (
+                (all_rectangles, confidences)
+                for all_rectangles, confidences in all_found_rectangles
+                if len(all_rectangles) > 0
+            ),
+            all_found_rectangles[-1],
+        )
+
+        return self._to_haystack_coordinates(all_rectangles, offset), confidences
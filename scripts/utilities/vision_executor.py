@@ -0,0 +1,87 @@
+"""Optional thread pool to run independent needle searches on the same frame concurrently.
+
+`cv2.matchTemplate` releases the GIL, so the needle searches of a frame can run on the idle cores of the machine while
+the bot thread waits for their results. Results are always gathered in the order the searches were given, so that
+fanning out never changes what is found.
+The pool is disabled on single-core machines, or with `VisionExecutor.configure(0)`, in which case every search runs
+sequentially on the calling thread. Searches started from a worker thread (e.g., the needles of a `MultiVision` that
+is itself being searched concurrently) also run inline, so that the pool never waits on itself.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterator, Sequence
+
+
+class VisionExecutor:
+    """Namespace-like class holding the thread pool shared by all the vision searches"""
+
+    # Leave a core for the bot thread itself, there's no point in more threads than needles on a frame anyway
+    MAX_WORKERS = min(4, (os.cpu_count() or 1) - 1)
+
+    _lock = threading.Lock()
+    _max_workers = MAX_WORKERS
+    _executor: ThreadPoolExecutor | None = None
+    # Flags the threads of the pool
+    _thread_state = threading.local()
+
+    @staticmethod
+    def configure(max_workers: int):
+        """Set the number of worker threads, 0 or 1 to run every search sequentially"""
+        with VisionExecutor._lock:
+            if VisionExecutor._executor is not None:
+                VisionExecutor._executor.shutdown(wait=False, cancel_futures=True)
+                VisionExecutor._executor = None
+            VisionExecutor._max_workers = max_workers
+
+    @staticmethod
+    def map(function: Callable[[Any], Any], items: Sequence[Any]) -> list[Any]:
+        """Apply the function to every item concurrently, and return the results in the order of the items"""
+        executor = VisionExecutor._get_executor()
+        if executor is None or len(items) < 2:
+            return [function(item) for item in items]
+
+        return list(executor.map(function, items))
+
+    @staticmethod
+    def as_completed(function: Callable[[Any], Any], items: Sequence[Any]) -> Iterator[tuple[int, Any]]:
+        """Apply the function to every item concurrently, yielding each `(index, result)` as soon as it's ready.
+        When run sequentially, the items are processed in order. The work still pending is cancelled when the
+        generator is closed, so that callers can stop as soon as they have what they need.
+        """
+        executor = VisionExecutor._get_executor()
+        if executor is None or len(items) < 2:
+            for i, item in enumerate(items):
+                yield i, function(item)
+            return
+
+        # Submitted in order, so that the first items are also the first to start
+        futures = {executor.submit(function, item): i for i, item in enumerate(items)}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    @staticmethod
+    def _get_executor() -> ThreadPoolExecutor | None:
+        """The thread pool, created on first use. `None` if the search has to run on the calling thread."""
+        if getattr(VisionExecutor._thread_state, "is_worker", False):
+            return None
+
+        with VisionExecutor._lock:
+            if VisionExecutor._max_workers < 2:
+                return None
+            if VisionExecutor._executor is None:
+                VisionExecutor._executor = ThreadPoolExecutor(
+                    max_workers=VisionExecutor._max_workers,
+                    thread_name_prefix="vision",
+                    initializer=VisionExecutor._mark_worker,
+                )
+            return VisionExecutor._executor
+
+    @staticmethod
+    def _mark_worker():
+        VisionExecutor._thread_state.is_worker = True
@@ -1,4 +1,5 @@
-from utilities.vision import MultiVision, Vision
+from utilities.pattern_match_strategies import PyramidMatchingStrategy
+from utilities.vision import ColorMode, MultiVision, Vision
 
 # TODO:
 
@@ -8,13 +9,13 @@ lock = Vision("lock.png")
 resume = Vision("resume.png")
 restore_stamina = Vision("stamuse.png")
 startbutton = Vision("start.png")
-skip = Vision("skip.png")
+skip = Vision("skip.png", color_mode=ColorMode.GRAY)
 dmg = Vision("dmg.png")
 reconnect = Vision("reconnect.png")
 restart = Vision("restart.png")
 result = Vision("result.png")
 mission = Vision("mission.png")
-reset = Vision("daily_reset.jpg")
+reset = Vision("daily_reset.jpg", matching_strategy=PyramidMatchingStrategy)
 random = Vision("random.png")
 main_menu_original = Vision("main_menu.png")
 main_menu = Vision("main_menu_transparent.png")
@@ -22,19 +23,19 @@ main_menu_exclamation = Vision("main_menu_exclamation.png")
 register_all = Vision("register_all.png")
 apply = Vision("apply.png")
 salvage = Vision("salvage.png")
-back = Vision("back.png")
+back = Vision("back.png", color_mode=ColorMode.GRAY)
 equipment = Vision("equipment.png")
 onslaught = Vision("onslaught.png")
 free_stage = Vision("free_stage.png")
 auto_repeat_on = Vision("auto_repeat_on.png")
 auto_repeat_off = Vision("auto_repeat_off.png")
-tavern = Vision("tavern.png")
+tavern = Vision("tavern.png", color_mode=ColorMode.HALF_GRAY)
 # equipment_full = Vision("equipment_full.png")
 loading_screen = Vision("loading.png")  # Not used
 high_grade_equipment = Vision("high_grade_equipment.png")
-empty_equipment = Vision("empty_equipment.png")
+empty_equipment = Vision("empty_equipment.png", matching_strategy=PyramidMatchingStrategy)
 empty_salvage = Vision("empty_salvage.png")
-empty_card_slot = Vision("empty_card_slot.png")
+empty_card_slot = Vision("empty_card_slot.png", region="card_slots")
 empty_card_slot_2 = Vision("empty_card_slot_2.png")
 world = Vision("world.png")
 bronze_card = Vision("bronze_card.png")
@@ -43,7 +44,9 @@ gold_card = Vision("gold_card.png")
 auto_off = Vision("autooff.png")
 pause = Vision("pause.png")
 forfeit = Vision("forfeit.png")
-tavern_loading_screen = Vision("tavern_loading_screen.png")
+tavern_loading_screen = Vision(
+    "tavern_loading_screen.png", matching_strategy=PyramidMatchingStrategy, reuse_unchanged=True
+)
 card_slot = Vision("card_slot.png")
 close = Vision("close.png")
 knighthood = Vision("knighthood.png")
@@ -52,9 +55,9 @@ check_in_reward = Vision("check_in_reward.png")
 check_in_complete = Vision("check_in_complete.png")
 battle_menu = Vision("battle_menu.jpg")
 cancel = Vision("cancel.png")
-skill_locked = Vision("skill_locked.png")
+skill_locked = Vision("skill_locked.png", region="battle_controls")
 victory = Vision("victory.png")
-password = Vision("password.png")
+password = Vision("password.png", matching_strategy=PyramidMatchingStrategy)
 global_server = Vision("global_server.png")
 yes = Vision("yes.png")
 start_quest = Vision("start_quest.png")
@@ -62,19 +65,19 @@ essette_shop = Vision("essette_shop.png")
 duplicate_connection = Vision("duplicate_connection.png")
 
 # Equipment farming
-auto_repeat_ended = Vision("equipment\\auto_repeat_ended.png")
+auto_repeat_ended = Vision("equipment\\auto_repeat_ended.png", reuse_unchanged=True)
 salvaging_results = Vision("equipment\\salvaging_results.png")
 new_tasks_unlocked = Vision("equipment\\new_tasks_unlocked.png")
 
 # Demonic beasts
-floor1 = Vision("demonic_beasts\\floor1.png")
-floor2 = Vision("demonic_beasts\\floor2.png")
-floor3 = Vision("demonic_beasts\\floor3.png")
-phase_1 = Vision("demonic_beasts\\phase_1.png")
-phase_2 = Vision("demonic_beasts\\phase_2.png")
-phase_3 = Vision("demonic_beasts\\phase_3.png")
-phase_3_dogs = Vision("dogs\\phase_3_dogs.png")
-phase_4 = Vision("demonic_beasts\\phase_4.png")
+floor1 = Vision("demonic_beasts\\floor1.png", region="db_floor")
+floor2 = Vision("demonic_beasts\\floor2.png", region="db_floor")
+floor3 = Vision("demonic_beasts\\floor3.png", region="db_floor")
+phase_1 = Vision("demonic_beasts\\phase_1.png", region="boss_status")
+phase_2 = Vision("demonic_beasts\\phase_2.png", region="boss_status")
+phase_3 = Vision("demonic_beasts\\phase_3.png", region="boss_status")
+phase_3_dogs = Vision("dogs\\phase_3_dogs.png", region="boss_status")
+phase_4 = Vision("demonic_beasts\\phase_4.png", region="boss_status")
 dead_unit = Vision("demonic_beasts\\dead_unit.png")
 db_victory = Vision("demonic_beasts\\db_victory.png")
 demonic_beast_battle = Vision("demonic_beasts\\demonic_beast_battle.png")
@@ -86,7 +89,7 @@ empty_party = Vision("demonic_beasts\\empty_party.png")
 save_party = Vision("demonic_beasts\\save_party.png")
 hraesvelgr_screen = Vision("demonic_beasts\\hraesvelgr_screen.png")
 skip_bird = Vision("demonic_beasts\\skip_masked.png")
-db_loading_screen = Vision("demonic_beasts\\loading_screen.png")
+db_loading_screen = Vision("demonic_beasts\\loading_screen.png", matching_strategy=PyramidMatchingStrategy)
 reset_demonic_beast = Vision("demonic_beasts\\reset_demonic_beast.png")
 my_turn = Vision("demonic_beasts\\my_turn.png")
 floor_3_cleared_db = MultiVision(
@@ -99,11 +102,11 @@ floor_3_cleared_db = MultiVision(
     image_name="floor_3_cleared_db",
 )
 available_floor = Vision("demonic_beasts\\available_floor.png")
-creature_destroyed = Vision("demonic_beasts\\creature_destroyed.png")
-defeat = Vision("demonic_beasts\\defeat.png")
+creature_destroyed = Vision("demonic_beasts\\creature_destroyed.png", matching_strategy=PyramidMatchingStrategy)
+defeat = Vision("demonic_beasts\\defeat.png", matching_strategy=PyramidMatchingStrategy)
 three_empty_slots = Vision("demonic_beasts\\three_slots.png")
 two_empty_slots = Vision("demonic_beasts\\two_slots.png")
-weekly_mission = Vision("demonic_beasts\\lazy_weekly_mission.png")
+weekly_mission = Vision("demonic_beasts\\lazy_weekly_mission.png", matching_strategy=PyramidMatchingStrategy)
 skollandhati = Vision("demonic_beasts\\skollandhati.png")
 guaranteed_reward = Vision("demonic_beasts\\guaranteed_reward.png")
 meli_aoe = Vision("demonic_beasts\\meli_aoe.png")
@@ -111,7 +114,7 @@ meli_ult = Vision("demonic_beasts\\meli_ult.png")
 meli_ampli = Vision("demonic_beasts\\meli_ampli.png")
 block_skill_debuf = Vision("demonic_beasts\\block_skill_debuff.png")
 evasion = Vision("demonic_beasts\\evasion.png")
-stance_active = Vision("demonic_beasts\\stance_active.png")
+stance_active = Vision("demonic_beasts\\stance_active.png", region="boss_status")
 immortality_buff = Vision("demonic_beasts\\immortality.png")
 thor_thunderstorm = Vision("demonic_beasts\\thor_thunderstorm.png")
 first_reward = Vision("demonic_beasts\\first_reward.png")
@@ -252,11 +255,13 @@ gray_demon = Vision("demons\\gray.jpg")
 crimson_demon = Vision("demons\\crimson.jpg")
 bell_demon = Vision("demons\\bell.jpg")
 og_demon = Vision("demons\\og.jpg")
-accept_invitation = Vision("demons\\accept.png")
+accept_invitation = Vision("demons\\accept.png", reuse_unchanged=True)
 real_time = Vision("demons\\RT.png")
 demon_hell_diff = Vision("demons\\hell.png")
-cancel_realtime = Vision("demons\\cancel.png")
-demons_loading_screen = Vision("demons\\demons_loading_screen.png")
+cancel_realtime = Vision("demons\\cancel.png", reuse_unchanged=True)
+demons_loading_screen = Vision(
+    "demons\\demons_loading_screen.png", matching_strategy=PyramidMatchingStrategy, reuse_unchanged=True
+)
 join_request = Vision("demons\\join_request.png")
 preparation_incomplete = Vision("demons\\preparation_incomplete.png")
 cancel_preparation = Vision("demons\\cancel_preparation.png")
@@ -275,12 +280,12 @@ shop = Vision("dailies\\shop.png")
 auto_clear = Vision("dailies\\auto_clear.png")
 strart_auto_clear = Vision("dailies\\start_auto_clear.png")
 quests = Vision("dailies\\quests.png")
-daily_pvp = Vision("dailies\\daily_pvp.png")
-daily_boss_battle = Vision("dailies\\daily_boss_battle.png")
-daily_fort_solgress = Vision("dailies\\daily_fort_solgress.png")
-daily_friendship_coins = Vision("dailies\\daily_friendship_coins.png")
-daily_patrol = Vision("dailies\\daily_patrol.png")
-daily_vanya_ale = Vision("dailies\\daily_vanya_ale.png")
+daily_pvp = Vision("dailies\\daily_pvp.png", matching_strategy=PyramidMatchingStrategy)
+daily_boss_battle = Vision("dailies\\daily_boss_battle.png", matching_strategy=PyramidMatchingStrategy)
+daily_fort_solgress = Vision("dailies\\daily_fort_solgress.png", matching_strategy=PyramidMatchingStrategy)
+daily_friendship_coins = Vision("dailies\\daily_friendship_coins.png", matching_strategy=PyramidMatchingStrategy)
+daily_patrol = Vision("dailies\\daily_patrol.png", matching_strategy=PyramidMatchingStrategy)
+daily_vanya_ale = Vision("dailies\\daily_vanya_ale.png", matching_strategy=PyramidMatchingStrategy)
 take_all_rewards = Vision("dailies\\take_all.png")
 tasks = Vision("dailies\\tasks.png")
 daily_tasks = Vision("dailies\\daily_tasks.png")
@@ -341,4 +346,5 @@ ok_main_button = MultiVision(
     "demons\\kicked_ok.png",
     "ok_buttons\\ok_maintenance.png",
     image_name="Ok button",
+    color_mode=ColorMode.GRAY,
 )